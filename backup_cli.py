@@ -15,15 +15,17 @@ from pathlib import Path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from backup_manager import BackupManager
+from file_scanner import DEFAULT_SCAN_WORKERS
+from parallel_compression import DEFAULT_COMPRESS_WORKERS
 from catalog_manager import CatalogManager
-from restore_manager import RestoreManager
+from restore_manager import RestoreManager, DEFAULT_RESTORE_WORKERS, RESTORE_MODES
 from utils import format_size, format_time
 
 class BackupCLI:
     def __init__(self):
         self.backup_manager = BackupManager()
         self.catalog_manager = CatalogManager()
-        self.restore_manager = RestoreManager()
+        self.restore_manager = RestoreManager(self.catalog_manager)
     
     def create_backup(self, args):
         """Criar um novo backup."""
@@ -59,8 +61,13 @@ class BackupCLI:
             print(f"Compactação: {args.compression}")
             print(f"Incluir subpastas: {'Sim' if args.include_subdirs else 'Não'}")
             print(f"Backup incremental: {'Sim' if getattr(args, 'incremental', False) else 'Não'}")
+            if args.differential:
+                print(f"Backup diferencial sobre: {args.differential}")
             print("-" * 60)
             
+            self.backup_manager.scan_workers = args.scan_workers
+            self.backup_manager.compress_workers = args.workers
+            
             # Executar backup
             backup_name = self.backup_manager.create_backup(
                 source_folders,
@@ -69,7 +76,9 @@ class BackupCLI:
                 args.include_subdirs,
                 progress_callback if args.verbose else None,
                 args.title,
-                args.incremental
+                args.incremental,
+                differential=bool(args.differential),
+                base_backup=args.differential
             )
             
             if backup_name:
@@ -145,33 +154,64 @@ class BackupCLI:
             print(f"Para: {args.destination}")
             print("-" * 60)
             
+            self.restore_manager.restore_workers = args.workers
+            
             # Executar restauração
             if args.files:
                 # Restaurar arquivos específicos
-                self.restore_manager.restore_files(
+                results = self.restore_manager.restore_files(
                     backup_info['path'],
                     args.files,
-                    args.destination
+                    args.destination,
+                    mode=args.mode
                 )
                 print(f"✓ {len(args.files)} arquivo(s) restaurado(s) com sucesso")
+            elif backup_info.get('base_backup'):
+                # Diferencial: restaurar junto com o backup completo base
+                print(f"Backup base: {backup_info['base_backup']}")
+                results = self.restore_manager.restore_point(args.backup_name, args.destination, mode=args.mode)
+                print(f"✓ Todos os arquivos ({results['total_restored']}) restaurados com sucesso")
             else:
                 # Restaurar todos os arquivos
                 contents = self.restore_manager.get_backup_contents(backup_info['path'])
                 file_names = [f['name'] for f in contents]
                 
-                self.restore_manager.restore_files(
+                results = self.restore_manager.restore_files(
                     backup_info['path'],
                     file_names,
-                    args.destination
+                    args.destination,
+                    mode=args.mode
                 )
                 print(f"✓ Todos os arquivos ({len(file_names)}) restaurados com sucesso")
             
+            if 'bytes_avoided' in results:
+                print(f"  {len(results['unchanged'])} arquivo(s) já idêntico(s) no destino - "
+                      f"{format_size(results['bytes_avoided'])} não regravados")
+            
+            if args.verify:
+                return self._verify_restored(backup_info['path'], results['restored'], args.destination)
+            
             return True
             
         except Exception as e:
             print(f"Erro durante restauração: {str(e)}")
             return False
     
+    def _verify_restored(self, backup_path, restored_files, destination):
+        """Conferir os arquivos restaurados e mostrar as divergências."""
+        print("Verificando arquivos restaurados...")
+        verification = self.restore_manager.verify_restore(backup_path, restored_files, destination)
+        
+        for mismatch in verification['mismatches']:
+            print(f"✗ Conteúdo diferente: {mismatch['file']}")
+        for missing in verification['missing']:
+            print(f"✗ Não encontrado: {missing}")
+        
+        print(f"✓ {len(verification['verified'])} arquivo(s) conferido(s) - "
+              f"{format_size(verification['bytes_verified'])} em {verification['elapsed']:.1f}s "
+              f"({format_size(verification['throughput'])}/s)")
+        return not verification['mismatches'] and not verification['missing']
+    
     def show_backup_info(self, args):
         """Mostrar informações detalhadas de um backup."""
         try:
@@ -187,6 +227,11 @@ class BackupCLI:
             print(f"Tamanho: {format_size(backup_info['size'])}")
             print(f"Tipo de compactação: {backup_info['compression']}")
             print(f"Número de arquivos: {backup_info['file_count']}")
+            if backup_info.get('base_backup'):
+                print(f"Backup base (diferencial): {backup_info['base_backup']}")
+            if 'logical_size' in backup_info:
+                print(f"Dados lógicos: {format_size(backup_info['logical_size'])}")
+                print(f"Dados gravados (deduplicados): {format_size(backup_info['physical_size'])}")
             print(f"Local: {backup_info['path']}")
             print(f"Pastas de origem:")
             for folder in backup_info.get('source_folders', []):
@@ -204,6 +249,53 @@ class BackupCLI:
             print(f"Erro ao obter informações: {str(e)}")
             return False
 
+    def search_files(self, args):
+        """Procurar em quais backups um arquivo está."""
+        try:
+            results = self.catalog_manager.search_files(args.query, limit=args.limit or None)
+            
+            if not results:
+                print(f"Nenhum arquivo encontrado para: {args.query}")
+                return True
+            
+            print(f"{'Backup':<30} {'Data':<20} Arquivo")
+            print("-" * 75)
+            for result in results:
+                print(f"{result['backup']:<30} {format_time(result['date']):<20} {result['path']}")
+            
+            if args.limit and len(results) == args.limit:
+                print(f"\n(mostrando os primeiros {args.limit} resultados; use --limit 0 para todos)")
+            return True
+            
+        except Exception as e:
+            print(f"Erro ao procurar arquivos: {str(e)}")
+            return False
+    
+    def synthesize_backup(self, args):
+        """Consolidar um backup completo e incrementais em um novo backup completo."""
+        try:
+            print(f"Backup base: {args.base}")
+            print(f"Incrementais: {', '.join(args.incrementals)}")
+            print("-" * 60)
+            
+            self.backup_manager.compress_workers = args.workers
+            backup_name = self.backup_manager.synthesize_full(args.base, args.incrementals, args.title or "")
+            if not backup_name:
+                print("✗ Falha ao criar backup completo sintético")
+                return False
+            
+            backup_info = self.catalog_manager.get_backup_info(backup_name)
+            print(f"✓ Backup completo sintético criado: {backup_name}")
+            if backup_info:
+                print(f"  Arquivo: {backup_info['filename']}")
+                print(f"  Tamanho: {format_size(backup_info['size'])}")
+                print(f"  Arquivos: {backup_info['file_count']}")
+            return True
+            
+        except Exception as e:
+            print(f"Erro ao consolidar backups: {str(e)}")
+            return False
+
 def main():
     parser = argparse.ArgumentParser(
         description="Desktop Backup Manager - Interface de Linha de Comando",
@@ -217,12 +309,19 @@ Exemplos de uso:
   # Criar backup com múltiplas pastas
   python backup_cli.py backup --title "Backup_Completo" --source "C:\\Users\\User\\Documents" "C:\\Users\\User\\Pictures" --destination "D:\\Backups" --compression tar.gz
   
+  # Consolidar backup completo + incrementais sem reler as pastas de origem
+  python backup_cli.py synthesize "Documentos_2025_20250121_143000" "incremental_Documentos_2025_20250122_143000"
+  
   # Listar backups
   python backup_cli.py list
   
   # Mostrar informações de um backup
   python backup_cli.py info "Documentos_2025_20250121_143000"
   
+  # Procurar em quais backups um arquivo está (trecho do caminho ou padrão glob)
+  python backup_cli.py search "relatorio_anual"
+  python backup_cli.py search "*/Fotos/*.jpg"
+  
   # Restaurar backup completo
   python backup_cli.py restore "Documentos_2025_20250121_143000" --destination "C:\\Restore"
   
@@ -241,9 +340,12 @@ Para agendamento no Windows:
     backup_parser.add_argument('--title', required=True, help='Título do backup (ex: Documentos_2025)')
     backup_parser.add_argument('--source', nargs='+', required=True, help='Pasta(s) de origem para backup')
     backup_parser.add_argument('--destination', required=True, help='Pasta de destino')
-    backup_parser.add_argument('--compression', choices=['zip', 'tar.gz', '7z'], default='zip', help='Tipo de compactação (padrão: zip)')
+    backup_parser.add_argument('--compression', choices=['zip', 'tar.gz', '7z', 'dedup'], default='zip', help='Tipo de compactação (padrão: zip)')
     backup_parser.add_argument('--no-subdirs', action='store_true', help='Não incluir subpastas')
     backup_parser.add_argument('--incremental', '-i', action='store_true', help='Backup incremental (apenas arquivos novos ou modificados)')
+    backup_parser.add_argument('--differential', metavar='BACKUP_BASE', help='Backup diferencial: arquivos alterados desde o backup completo indicado')
+    backup_parser.add_argument('--scan-workers', type=int, default=DEFAULT_SCAN_WORKERS, help=f'Threads para listar pastas em paralelo (padrão: {DEFAULT_SCAN_WORKERS})')
+    backup_parser.add_argument('--workers', type=int, default=DEFAULT_COMPRESS_WORKERS, help=f'Threads de compactação (padrão: {DEFAULT_COMPRESS_WORKERS})')
     backup_parser.add_argument('--verbose', '-v', action='store_true', help='Mostrar progresso detalhado')
     
     # Comando list
@@ -260,6 +362,21 @@ Para agendamento no Windows:
     restore_parser.add_argument('backup_name', help='Nome do backup')
     restore_parser.add_argument('--destination', required=True, help='Pasta de destino para restauração')
     restore_parser.add_argument('--files', nargs='+', help='Arquivos específicos para restaurar (opcional)')
+    restore_parser.add_argument('--workers', type=int, default=DEFAULT_RESTORE_WORKERS, help=f'Threads de extração para backups ZIP (padrão: {DEFAULT_RESTORE_WORKERS})')
+    restore_parser.add_argument('--mode', choices=RESTORE_MODES, default='skip', help='Arquivos já existentes no destino: manter (skip), substituir (overwrite) ou substituir só os diferentes do backup (delta)')
+    restore_parser.add_argument('--verify', action='store_true', help='Conferir o conteúdo dos arquivos restaurados com o backup')
+    
+    # Comando search
+    search_parser = subparsers.add_parser('search', help='Procurar arquivos em todos os backups')
+    search_parser.add_argument('query', help='Trecho do caminho do arquivo ou padrão glob (*, ?, [...])')
+    search_parser.add_argument('--limit', type=int, default=100, help='Máximo de resultados, 0 para todos (padrão: 100)')
+    
+    # Comando synthesize
+    synthesize_parser = subparsers.add_parser('synthesize', help='Consolidar backup completo e incrementais em um novo backup completo')
+    synthesize_parser.add_argument('base', help='Nome do backup completo base')
+    synthesize_parser.add_argument('incrementals', nargs='+', help='Backups incrementais/diferenciais posteriores')
+    synthesize_parser.add_argument('--title', help='Título do novo backup')
+    synthesize_parser.add_argument('--workers', type=int, default=DEFAULT_COMPRESS_WORKERS, help=f'Threads de compactação (padrão: {DEFAULT_COMPRESS_WORKERS})')
     
     args = parser.parse_args()
     
@@ -283,6 +400,10 @@ Para agendamento no Windows:
         success = cli.show_backup_info(args)
     elif args.command == 'restore':
         success = cli.restore_backup(args)
+    elif args.command == 'search':
+        success = cli.search_files(args)
+    elif args.command == 'synthesize':
+        success = cli.synthesize_backup(args)
     
     return 0 if success else 1
 
@@ -4,6 +4,7 @@ Handles the creation and management of compressed backups.
 """
 
 import os
+import stat
 import zipfile
 import tarfile
 import json
@@ -11,6 +12,9 @@ from pathlib import Path
 from datetime import datetime
 import threading
 import shutil
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 try:
     import py7zr
     SEVENZ_AVAILABLE = True
@@ -21,40 +25,96 @@ except ImportError:
     print("Warning: py7zr not available. 7z compression disabled.")
 
 from catalog_manager import CatalogManager
-from utils import get_file_size, calculate_directory_size, format_size
+from file_state_index import FileStateIndex
+from file_scanner import FileRecord, ParallelScanner, ScanPipeline, DEFAULT_SCAN_WORKERS
+from parallel_compression import ParallelZipWriter, ParallelGzipWriter, DEFAULT_COMPRESS_WORKERS
+from tar_index import TarIndex, IndexEntry, DEFAULT_MEMBER_SIZE, index_path_for, open_tar_stream
+from dedup_store import (DedupStore, iter_chunks, save_manifest, load_manifest, 
+                         MANIFEST_SUFFIX, MANIFEST_VERSION)
+from listing_cache import listing_entry
+from utils import get_file_size, calculate_directory_size, get_archive_name, ContentHasher
 from open_files_handler import OpenFilesHandler, create_backup_report
 from user_manager import user_manager
 
+class _HashingReader:
+    """
+    Read-only file wrapper feeding the data read through it to a ContentHasher.
+    
+    tarfile copies exactly the size announced in the header, and a file that
+    shrank since the scan (or failed to read) would leave a truncated member
+    in the stream; the missing bytes are returned as zeros instead and
+    ``error`` is set.
+    """
+    
+    def __init__(self, fileobj, hasher):
+        self._fileobj = fileobj
+        self._hasher = hasher
+        self.error = None
+    
+    def read(self, size=-1):
+        data = b''
+        if self.error is None:
+            try:
+                data = self._fileobj.read(size)
+            except OSError as e:
+                self.error = e
+            self._hasher.update(data)
+            if size > 0 and len(data) < size and self.error is None:
+                self.error = OSError("file shrank while being read")
+        if size > 0 and len(data) < size:
+            data += bytes(size - len(data))
+        return data
+
 class BackupManager:
-    def __init__(self):
+    def __init__(self, scan_workers=DEFAULT_SCAN_WORKERS, compress_workers=DEFAULT_COMPRESS_WORKERS):
         self.catalog_manager = CatalogManager()
+        self.scan_workers = scan_workers
+        self.compress_workers = compress_workers
         self.cancel_flag = threading.Event()
+        self.skipped_files = []
+        # Member listing of the archive being written, cached once it is cataloged
+        self._listing = None
+        # Archive name -> content hash of the data written, for the catalog
+        self._content_hashes = {}
         self.open_files_handler = OpenFilesHandler()
     
     def create_backup(self, source_folders, destination_path, compression_type="zip", 
-                     include_subdirs=True, progress_callback=None, backup_title="", incremental=False):
+                     include_subdirs=True, progress_callback=None, backup_title="", incremental=False,
+                     differential=False, base_backup=None):
         """
         Create a compressed backup of the specified folders.
         
         Args:
             source_folders: List of folder paths to backup
             destination_path: Destination directory for backup
-            compression_type: 'zip', 'tar.gz', or '7z'
+            compression_type: 'zip', 'tar.gz', '7z' or 'dedup'
             include_subdirs: Whether to include subdirectories
             progress_callback: Function to call with progress updates
             backup_title: Custom title for the backup
-            incremental: Only backup files newer than last backup
+            incremental: Only backup files changed since the last backup
+            differential: Only backup files changed since the full backup base_backup
+            base_backup: Name of the full backup a differential backup is based on
         
         Returns:
             str: Backup filename if successful, None if failed
         """
         backup_path = None
+        state_index = None
         try:
             self.cancel_flag.clear()
+            self.skipped_files = []
+            self._listing = None
+            self._content_hashes = {}
+            
+            base_info = None
+            if differential:
+                if incremental:
+                    raise Exception("Backup não pode ser incremental e diferencial ao mesmo tempo")
+                base_info = self._get_base_backup(base_backup)
             
             # Generate backup name with timestamp and custom title
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            prefix = "incremental_" if incremental else ""
+            prefix = "incremental_" if incremental else "differential_" if differential else ""
             if backup_title:
                 # Sanitize title and create name
                 safe_title = backup_title.replace(" ", "_").replace("-", "_")
@@ -63,89 +123,81 @@ class BackupManager:
                 backup_name = f"{prefix}backup_{timestamp}"
             
             if compression_type == "zip":
-                backup_filename = f"{backup_name}.zip"
+                extension = ".zip"
             elif compression_type == "7z":
-                backup_filename = f"{backup_name}.7z"
+                extension = ".7z"
+            elif compression_type == "dedup":
+                extension = MANIFEST_SUFFIX
             else:
-                backup_filename = f"{backup_name}.tar.gz"
+                extension = ".tar.gz"
             
+            backup_name = self._unique_backup_name(backup_name, destination_path, extension)
+            backup_filename = f"{backup_name}{extension}"
             backup_path = os.path.join(destination_path, backup_filename)
             
-            # Calculate total size for progress tracking with detailed progress
             if progress_callback:
                 progress_callback(0, 100, "Coletando lista de arquivos...")
             
-            total_size = 0
-            file_list = []
-            processed_folders = 0
+            # Every run records file state; incremental runs diff against it
+            state_index = FileStateIndex.for_catalog(self.catalog_manager.catalog_dir)
+            state_index.begin_run()
             
-            # First pass: collect all files
-            for i, source_folder in enumerate(source_folders):
-                if self.cancel_flag.is_set():
-                    return None
-                
-                if progress_callback:
-                    progress_callback((i / len(source_folders)) * 30, 100, 
-                                    f"Analisando pasta: {os.path.basename(source_folder)}")
-                
-                # Get last backup timestamp for incremental mode
-                last_backup_time = None
-                if incremental:
-                    last_backup_time = self._get_last_backup_time(source_folders)
-                    if progress_callback and last_backup_time:
-                        progress_callback(0, 100, f"Modo incremental: desde {last_backup_time.strftime('%d/%m/%Y %H:%M')}")
-                
-                folder_files = self._get_files_to_backup(source_folder, include_subdirs, last_backup_time)
-                file_list.extend(folder_files)
-                processed_folders += 1
+            # Folders never recorded in the state index fall back to
+            # comparing modification times with the last backup date
+            last_backup_time = None
+            if incremental:
+                untracked_folders = [f for f in source_folders if not state_index.has_state(f)]
+                if untracked_folders:
+                    last_backup_time = self._get_last_backup_time(untracked_folders)
+                if progress_callback and last_backup_time:
+                    progress_callback(0, 100, f"Modo incremental: desde {last_backup_time.strftime('%d/%m/%Y %H:%M')}")
+            else:
+                untracked_folders = []
             
-            if progress_callback:
-                progress_callback(30, 100, f"Calculando tamanho de {len(file_list)} arquivos...")
+            # The scanner runs in the background and feeds the archive writer
+            # through a bounded queue, so compression starts right away and the
+            # total size estimate is refined while the walk is still running.
+            # The catalog still needs one record per file (file_list)
+            file_list = []
+            catalog_extra = {}
+            seen_paths = set()
+            files_to_backup = self._iter_files_to_backup(source_folders, include_subdirs, last_backup_time,
+                                                         state_index, incremental, untracked_folders,
+                                                         base_info, seen_paths)
             
-            # Second pass: calculate sizes with progress
-            for i, file_path in enumerate(file_list):
-                if self.cancel_flag.is_set():
-                    return None
+            with ScanPipeline(files_to_backup, cancel_event=self.cancel_flag) as scan:
+                records = self._collect_records(scan, file_list)
                 
-                try:
-                    total_size += get_file_size(file_path)
-                    
-                    # Update progress every 100 files or at the end
-                    if i % 100 == 0 or i == len(file_list) - 1:
-                        if progress_callback:
-                            progress_pct = 30 + ((i + 1) / len(file_list)) * 50  # 30-80%
-                            progress_callback(progress_pct, 100, 
-                                            f"Calculando tamanho: {i+1}/{len(file_list)} arquivos")
-                            
-                except (OSError, IOError) as e:
-                    # Log erro mas continua
-                    if progress_callback:
-                        progress_callback(30 + ((i + 1) / len(file_list)) * 50, 100, 
-                                        f"Erro no arquivo {os.path.basename(file_path)}: {str(e)}")
-                    continue
+                if compression_type == "zip":
+                    success = self._create_zip_backup(backup_path, records, source_folders, 
+                                                    scan, progress_callback)
+                elif compression_type == "7z":
+                    success = self._create_7z_backup(backup_path, records, source_folders, 
+                                                    scan, progress_callback)
+                elif compression_type == "dedup":
+                    success = self._create_dedup_backup(backup_path, records, source_folders, 
+                                                      scan, progress_callback, catalog_extra)
+                else:
+                    success = self._create_tar_backup(backup_path, records, source_folders, 
+                                                    scan, progress_callback)
             
-            if progress_callback:
-                progress_callback(80, 100, f"Tamanho total: {format_size(total_size)}")
-                
-            # Small delay to show final calculation result
-            import time
-            time.sleep(0.5)
+            if differential and success:
+                # Files of the base that no longer exist must not come back
+                # when the differential is restored on top of the base
+                catalog_extra['base_backup'] = base_info['name']
+                catalog_extra['deleted_files'] = sorted(
+                    self._get_archive_name(f['name'], source_folders)
+                    for f in base_info.get('files', []) if f['name'] not in seen_paths)
             
-            if not file_list:
-                message = "Nenhum arquivo novo encontrado para backup incremental" if incremental else "No files found to backup"
+            if success and not file_list and not catalog_extra.get('deleted_files'):
+                if incremental:
+                    message = "Nenhum arquivo novo encontrado para backup incremental"
+                elif differential:
+                    message = "Nenhum arquivo alterado desde o backup base"
+                else:
+                    message = "No files found to backup"
                 raise Exception(message)
             
-            # Create backup
-            if compression_type == "zip":
-                success = self._create_zip_backup(backup_path, file_list, source_folders, 
-                                                total_size, progress_callback)
-            elif compression_type == "7z":
-                success = self._create_7z_backup(backup_path, file_list, source_folders, 
-                                                total_size, progress_callback)
-            else:
-                success = self._create_tar_backup(backup_path, file_list, source_folders, 
-                                                total_size, progress_callback)
-            
             if success and not self.cancel_flag.is_set():
                 # Create catalog entry
                 catalog_entry = {
@@ -158,10 +210,22 @@ class BackupManager:
                     'source_folders': source_folders,
                     'file_count': len(file_list),
                     'incremental': incremental,
-                    'files': [{'name': f, 'size': get_file_size(f)} for f in file_list if os.path.exists(f)]
+                    'differential': differential,
+                    'files': self._catalog_files(file_list, source_folders)
                 }
+                catalog_entry.update(catalog_extra)
                 
                 self.catalog_manager.add_catalog_entry(catalog_entry)
+                self._cache_listing(backup_path)
+                # The hashes computed while writing spare the next incremental run a read
+                for file_info in catalog_entry['files']:
+                    if file_info.get('hash'):
+                        state_index.record_hash(self._get_source_folder(file_info['name'], source_folders),
+                                                file_info['name'], file_info['hash'])
+                # Unreadable files were not backed up - detect them again next run
+                for record in self.skipped_files:
+                    state_index.forget(self._get_source_folder(record.path, source_folders), record)
+                state_index.commit_run(source_folders, prune=include_subdirs)
                 
                 # Update user statistics
                 backup_size = get_file_size(backup_path)
@@ -173,89 +237,431 @@ class BackupManager:
                 return backup_name
             else:
                 # Cleanup failed backup
-                if os.path.exists(backup_path):
-                    os.remove(backup_path)
+                self._remove_backup_files(backup_path)
                 return None
                 
         except Exception as e:
             # Cleanup on error
             try:
-                if backup_path and os.path.exists(backup_path):
-                    os.remove(backup_path)
+                if backup_path:
+                    self._remove_backup_files(backup_path)
             except:
                 pass
             raise Exception(f"Backup failed: {str(e)}")
+        finally:
+            # Discards the recorded file state unless the backup was committed
+            if state_index is not None:
+                state_index.close()
     
-    def _get_files_to_backup(self, source_folder, include_subdirs, since_time=None):
-        """Get list of files to backup from source folder."""
-        files = []
+    def synthesize_full(self, base_name, incrementals, backup_title="", progress_callback=None):
+        """
+        Build a new full backup from a full backup and later incremental or
+        differential backups, using only the archives on the destination.
         
-        if not os.path.exists(source_folder):
-            return files
+        The source folders are not read. For every member the newest archive
+        wins; files a differential recorded as deleted are dropped. ZIP
+        members are copied without recompressing, dedup manifests are merged
+        without touching chunk data and TAR.GZ members are re-streamed into a
+        new indexed archive.
         
+        Args:
+            base_name: Name of the full backup to start from
+            incrementals: Names of later backups of the same format
+            backup_title: Custom title for the new backup
+            progress_callback: Function to call with progress updates
+        
+        Returns:
+            str: Name of the new full backup, None if cancelled
+        """
+        backup_path = None
         try:
-            if include_subdirs:
-                for root, dirs, filenames in os.walk(source_folder):
-                    for filename in filenames:
-                        file_path = os.path.join(root, filename)
-                        if os.path.isfile(file_path):
-                            if self._should_include_file(file_path, since_time):
-                                files.append(file_path)
+            self.cancel_flag.clear()
+            self._listing = None
+            
+            base_info = self._get_base_backup(base_name)
+            chain = [base_info]
+            for name in incrementals:
+                info = self.catalog_manager.get_backup_info(name)
+                if not info:
+                    raise Exception(f"Backup não encontrado: {name}")
+                chain.append(info)
+            chain.sort(key=lambda info: info['date'])
+            if chain[0] is not base_info:
+                raise Exception(f"Backup base deve ser anterior aos incrementais: {base_name}")
+            
+            compression = base_info['compression']
+            if any(info['compression'] != compression for info in chain):
+                raise Exception("Todos os backups devem usar o mesmo tipo de compactação")
+            if compression not in ('zip', 'tar.gz', 'dedup'):
+                raise Exception(f"Backup completo sintético não suportado para {compression}")
+            
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            if backup_title:
+                safe_title = backup_title.replace(" ", "_").replace("-", "_")
+                backup_name = f"synthetic_{safe_title}_{timestamp}"
+            else:
+                backup_name = f"synthetic_backup_{timestamp}"
+            
+            extension = MANIFEST_SUFFIX if compression == "dedup" else f".{compression}"
+            destination_path = os.path.dirname(base_info['path'])
+            backup_name = self._unique_backup_name(backup_name, destination_path, extension)
+            backup_filename = f"{backup_name}{extension}"
+            backup_path = os.path.join(destination_path, backup_filename)
+            
+            if progress_callback:
+                progress_callback(0, 100, "Lendo conteúdo dos backups...")
+            
+            # Walk from the newest archive back to the base; a member is taken
+            # from the first archive that has it (or dropped if deleted there)
+            plan = []
+            taken = set()
+            for info in reversed(chain):
+                names = set(self._list_archive_members(info['path'])) - taken
+                taken.update(names)
+                taken.update(info.get('deleted_files', []))
+                plan.append((info, names))
+            plan.reverse()
+            
+            catalog_extra = {}
+            if compression == "zip":
+                success = self._synthesize_zip(backup_path, plan, progress_callback)
+            elif compression == "dedup":
+                success = self._synthesize_dedup(backup_path, plan, progress_callback, catalog_extra)
             else:
-                for item in os.listdir(source_folder):
-                    item_path = os.path.join(source_folder, item)
-                    if os.path.isfile(item_path):
-                        if self._should_include_file(item_path, since_time):
-                            files.append(item_path)
-        except (OSError, IOError) as e:
-            raise Exception(f"Error accessing folder {source_folder}: {str(e)}")
+                success = self._synthesize_tar(backup_path, plan, progress_callback)
+            
+            if not success or self.cancel_flag.is_set():
+                self._remove_backup_files(backup_path)
+                return None
+            
+            # The listing describes the members actually written; a planned
+            # member the source archive did not deliver must not go unnoticed
+            written = {item['name'] for item in self._listing}
+            missing = sorted(set().union(*(names for info, names in plan)) - written)
+            if missing:
+                raise Exception(f"{len(missing)} member(s) could not be read from the source backups, "
+                                f"e.g. {missing[0]}")
+            
+            # Catalog file lists hold source paths; keep those of the written members
+            files = []
+            for info, names in plan:
+                for file_info in info.get('files', []):
+                    name = self._get_archive_name(file_info['name'], info.get('source_folders', []))
+                    if name in names and name in written:
+                        files.append(file_info)
+            
+            catalog_entry = {
+                'name': backup_name,
+                'filename': backup_filename,
+                'path': backup_path,
+                # Describes the source folders as of the newest merged backup
+                'date': chain[-1]['date'],
+                'size': get_file_size(backup_path),
+                'compression': compression,
+                'source_folders': base_info.get('source_folders', []),
+                'file_count': len(written),
+                'incremental': False,
+                'differential': False,
+                'synthesized_from': [info['name'] for info in chain],
+                'files': files
+            }
+            catalog_entry.update(catalog_extra)
+            
+            self.catalog_manager.add_catalog_entry(catalog_entry)
+            self._cache_listing(backup_path)
+            
+            if progress_callback:
+                progress_callback(100, 100, f"Backup completo sintético criado: {backup_filename}")
+            
+            return backup_name
+            
+        except Exception as e:
+            try:
+                if backup_path:
+                    self._remove_backup_files(backup_path)
+            except:
+                pass
+            raise Exception(f"Synthetic full backup failed: {str(e)}")
+    
+    def _unique_backup_name(self, backup_name, destination_path, extension):
+        """Add a counter to a backup name already used in the catalog or destination."""
+        candidate = backup_name
+        counter = 2
+        while (self.catalog_manager.get_backup_info(candidate) is not None or 
+               os.path.exists(os.path.join(destination_path, f"{candidate}{extension}"))):
+            candidate = f"{backup_name}_{counter}"
+            counter += 1
+        return candidate
+    
+    def _list_archive_members(self, backup_path):
+        """Return the file member names of a backup archive."""
+        if backup_path.endswith('.zip'):
+            with zipfile.ZipFile(backup_path, 'r') as zipf:
+                return [info.filename for info in zipf.infolist() if not info.is_dir()]
+        elif backup_path.endswith('.tar.gz'):
+            index = TarIndex.load(backup_path)
+            if index is not None:
+                return [entry.name for entry in index.entries]
+            with tarfile.open(backup_path, 'r:gz') as tarf:
+                return [member.name for member in tarf.getmembers() if member.isfile()]
+        elif backup_path.endswith(MANIFEST_SUFFIX):
+            return [entry['name'] for entry in load_manifest(backup_path)['files']]
+        raise Exception(f"Unsupported backup format: {backup_path}")
+    
+    def _report_synthetic(self, progress_callback, done, total, name):
+        if progress_callback:
+            progress = (done / total) * 100 if total > 0 else 0
+            progress_callback(progress, 100, f"Consolidando: {os.path.basename(name)}")
+    
+    def _synthesize_zip(self, backup_path, plan, progress_callback):
+        """Copy the chosen compressed ZIP members into a new archive."""
+        total = sum(len(names) for info, names in plan)
+        done = 0
         
+        with ParallelZipWriter(backup_path, workers=self.compress_workers) as zipw:
+            for info, names in plan:
+                with open(info['path'], 'rb') as source, zipfile.ZipFile(source, 'r') as zipf:
+                    # Read each source archive front to back
+                    members = sorted((member for member in zipf.infolist() if member.filename in names),
+                                     key=lambda member: member.header_offset)
+                    for member in members:
+                        if self.cancel_flag.is_set():
+                            return False
+                        
+                        mtime = time.mktime(member.date_time + (0, 0, -1))
+                        record = FileRecord(member.filename, member.file_size, int(mtime * 1e9), 
+                                            member.external_attr >> 16, 0, 0)
+                        zipw.add_raw(record, member.filename, member, source)
+                        
+                        done += 1
+                        self._report_synthetic(progress_callback, done, total, member.filename)
+        
+        self._listing = self._zip_listing(zipw)
+        return True
+    
+    def _synthesize_tar(self, backup_path, plan, progress_callback):
+        """Re-stream the chosen TAR members into a new indexed TAR.GZ."""
+        total = sum(len(names) for info, names in plan)
+        done = 0
+        index_entries = []
+        
+        with ParallelGzipWriter(backup_path, workers=self.compress_workers, compresslevel=6) as gz, \
+             tarfile.open(fileobj=gz, mode='w') as tarf:
+            for info, names in plan:
+                if not names:
+                    continue
+                
+                with open(info['path'], 'rb') as archive:
+                    index = TarIndex.load(info['path'])
+                    if index is not None:
+                        # Skip gzip members holding no chosen file
+                        members = index.iter_members(archive, names)
+                    else:
+                        stream = open_tar_stream(archive)
+                        members = ((member, stream) for member in stream 
+                                   if member.isfile() and member.name in names)
+                    
+                    for member, source in members:
+                        if self.cancel_flag.is_set():
+                            return False
+                        
+                        if gz.member_size >= DEFAULT_MEMBER_SIZE:
+                            gz.new_member()
+                        header_offset = gz.tell()
+                        
+                        tarf.addfile(member, source.extractfile(member))
+                        index_entries.append(IndexEntry(member.name, gz.member_index, header_offset, 
+                                                        member.size, member.mtime))
+                        
+                        done += 1
+                        self._report_synthetic(progress_callback, done, total, member.name)
+        
+        TarIndex(gz.members, index_entries).save(backup_path)
+        self._listing = self._tar_listing(index_entries)
+        return True
+    
+    def _synthesize_dedup(self, backup_path, plan, progress_callback, catalog_extra):
+        """Merge the chosen file entries of dedup manifests; chunks are shared."""
+        files = []
+        for info, names in plan:
+            for entry in load_manifest(info['path'])['files']:
+                if entry['name'] in names:
+                    files.append(entry)
+        
+        save_manifest(backup_path, {
+            'version': MANIFEST_VERSION,
+            'created': datetime.now().isoformat(),
+            'source_folders': plan[0][0].get('source_folders', []),
+            'files': files
+        })
+        
+        catalog_extra['logical_size'] = sum(entry['size'] for entry in files)
+        catalog_extra['physical_size'] = 0
+        self._listing = self._dedup_listing(files)
+        return True
+    
+    def _catalog_files(self, file_list, source_folders):
+        """Catalog file entries, with the content hashes recorded while writing."""
+        files = []
+        for record in file_list:
+            file_info = {'name': record.path, 'size': record.size, 'mtime_ns': record.mtime_ns}
+            content_hash = self._content_hashes.get(self._get_archive_name(record.path, source_folders))
+            if content_hash:
+                file_info['hash'] = content_hash
+            files.append(file_info)
         return files
     
-    def _create_zip_backup(self, backup_path, file_list, source_folders, total_size, progress_callback):
-        """Create ZIP backup."""
+    def _zip_listing(self, zipw):
+        return [listing_entry(arcname, file_size, compress_size, datetime(*date_time))
+                for arcname, file_size, compress_size, date_time, content_hash in zipw.entries]
+    
+    def _tar_listing(self, index_entries):
+        # TAR doesn't provide compressed size per file
+        return [listing_entry(entry.name, entry.size, entry.size, datetime.fromtimestamp(entry.mtime))
+                for entry in index_entries]
+    
+    def _dedup_listing(self, files):
+        # Chunks are shared between backups
+        return [listing_entry(entry['name'], entry['size'], entry['size'],
+                              datetime.fromtimestamp(entry['mtime_ns'] / 1e9))
+                for entry in files]
+    
+    def _cache_listing(self, backup_path):
+        """Cache the listing collected while writing, so opening the backup needs no scan."""
+        if self._listing is None:
+            return
+        try:
+            self.catalog_manager.listing_cache.put(backup_path, self._listing)
+        except OSError:
+            # Only a cache: the archive is scanned on first use instead
+            pass
+        self._listing = None
+    
+    def _remove_backup_files(self, backup_path):
+        """Remove a backup archive together with its sidecar index."""
+        for path in (backup_path, index_path_for(backup_path)):
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def _collect_records(self, records, file_list):
+        """Pass records through to the archive writer, keeping them for the catalog (one per file)."""
+        for record in records:
+            file_list.append(record)
+            yield record
+    
+    def _report_progress(self, progress_callback, processed_size, scan, message):
+        """Report archive progress against the scanner's running size estimate."""
+        if not progress_callback:
+            return
+        
+        total_size = scan.bytes_found
+        progress = (processed_size / total_size) * 100 if total_size > 0 else 0
+        if not scan.finished:
+            # Total still growing - never claim completion before the scan ends
+            progress = min(progress, 95)
+            message = f"{message} ({scan.files_found} arquivos encontrados)"
+        progress_callback(progress, 100, message)
+    
+    def _report_entry(self, written, processed_size, scan, progress_callback):
+        """Report a finished archive entry; returns the updated processed size."""
+        record, error = written
+        if error is None:
+            processed_size += record.size
+            self._report_progress(progress_callback, processed_size, scan, 
+                                f"Backing up: {os.path.basename(record.path)}")
+        else:
+            # Skip files that can't be read
+            self.skipped_files.append(record)
+            self._report_progress(progress_callback, processed_size, scan, 
+                                f"Skipped: {os.path.basename(record.path)} ({str(error)})")
+        return processed_size
+    
+    def _iter_files_to_backup(self, source_folders, include_subdirs, since_time=None, 
+                              state_index=None, incremental=False, untracked_folders=(),
+                              base_info=None, seen_paths=None):
+        """
+        Yield FileRecord entries to backup from all source folders.
+        
+        With a state index, every scanned file is recorded in it. In
+        incremental mode a file of a tracked folder is included only if the
+        index reports it new or changed; files of untracked folders use the
+        modification time filter. With base_info (differential mode) a file
+        is included if it changed since that backup, and every scanned path
+        is added to seen_paths.
+        """
+        base_files = None
+        if base_info is not None:
+            base_files = {f['name']: f for f in base_info.get('files', [])}
+            base_time = datetime.fromisoformat(base_info['date'])
+        
+        scanner = ParallelScanner(self.scan_workers)
+        for record in scanner.scan(source_folders, include_subdirs):
+            if state_index is not None:
+                source_folder = self._get_source_folder(record.path, source_folders)
+                changed = state_index.check(source_folder, record, detect_changes=incremental)
+            
+            if base_files is not None:
+                seen_paths.add(record.path)
+                include = self._changed_since_base(record, base_files.get(record.path), base_time)
+            elif state_index is None:
+                include = self._should_include_file(record, since_time)
+            else:
+                if not incremental:
+                    include = True
+                elif source_folder in untracked_folders:
+                    include = self._should_include_file(record, since_time)
+                else:
+                    include = changed
+            
+            if include:
+                yield record
+    
+    def _create_zip_backup(self, backup_path, records, source_folders, scan, progress_callback):
+        """Create ZIP backup, deflating entries in parallel worker threads."""
         try:
             processed_size = 0
             
-            with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=6) as zipf:
-                for file_path in file_list:
+            with ParallelZipWriter(backup_path, workers=self.compress_workers, compresslevel=6) as zipw:
+                for record in records:
                     if self.cancel_flag.is_set():
+                        zipw.abort()
                         return False
                     
-                    try:
-                        # Calculate relative path for archive
-                        arcname = self._get_archive_name(file_path, source_folders)
-                        
-                        # Add file to archive
-                        zipf.write(file_path, arcname)
-                        
-                        # Update progress
-                        file_size = get_file_size(file_path)
-                        processed_size += file_size
-                        
-                        if progress_callback and total_size > 0:
-                            progress = (processed_size / total_size) * 100
-                            progress_callback(progress, 100, f"Backing up: {os.path.basename(file_path)}")
+                    # Calculate relative path for archive
+                    arcname = self._get_archive_name(record.path, source_folders)
                     
-                    except (OSError, IOError) as e:
-                        # Skip files that can't be read
-                        if progress_callback:
-                            progress_callback(processed_size / total_size * 100, 100, 
-                                            f"Skipped: {os.path.basename(file_path)} ({str(e)})")
-                        continue
+                    # Queue file for compression; entries are written in order
+                    for written in zipw.add(record, arcname):
+                        processed_size = self._report_entry(written, processed_size, scan, progress_callback)
+                
+                for written in zipw.finish():
+                    processed_size = self._report_entry(written, processed_size, scan, progress_callback)
             
+            self._content_hashes = {arcname: content_hash 
+                                    for arcname, size, compress_size, date_time, content_hash in zipw.entries}
+            self._listing = self._zip_listing(zipw)
             return True
             
         except Exception as e:
             raise Exception(f"ZIP creation failed: {str(e)}")
     
-    def _create_tar_backup(self, backup_path, file_list, source_folders, total_size, progress_callback):
-        """Create TAR.GZ backup."""
+    def _create_tar_backup(self, backup_path, records, source_folders, scan, progress_callback):
+        """
+        Create TAR.GZ backup, gzip-compressing blocks in parallel worker threads.
+        
+        The archive is written as a series of independent gzip members that
+        start on file boundaries, and a sidecar index of member offsets is
+        saved next to it so single files can be restored without
+        decompressing the archive from the beginning.
+        """
         try:
             processed_size = 0
+            index_entries = []
             
-            with tarfile.open(backup_path, 'w:gz') as tarf:
-                for file_path in file_list:
+            with ParallelGzipWriter(backup_path, workers=self.compress_workers, compresslevel=6) as gz, \
+                 tarfile.open(fileobj=gz, mode='w') as tarf:
+                for record in records:
+                    file_path = record.path
                     if self.cancel_flag.is_set():
                         return False
                     
@@ -263,45 +669,71 @@ class BackupManager:
                         # Calculate relative path for archive
                         arcname = self._get_archive_name(file_path, source_folders)
                         
-                        # Add file to archive
-                        tarf.add(file_path, arcname=arcname, recursive=False)
+                        # Keep gzip members small enough to seek into cheaply
+                        if gz.member_size >= DEFAULT_MEMBER_SIZE:
+                            gz.new_member()
+                        header_offset = gz.tell()
+                        
+                        # Add file to archive, hashing its data as tarfile reads it;
+                        # the header comes from the scan instead of another stat
+                        tarinfo = self._tar_header(record, arcname)
+                        hasher = ContentHasher()
+                        with open(file_path, 'rb') as f:
+                            reader = _HashingReader(f, hasher)
+                            tarf.addfile(tarinfo, reader)
+                        if reader.error is not None:
+                            # The padded member stays in the stream but is not indexed
+                            raise reader.error
+                        self._content_hashes[arcname] = hasher.hexdigest()
+                        
+                        index_entries.append(IndexEntry(arcname, gz.member_index, header_offset, 
+                                                        tarinfo.size, tarinfo.mtime))
                         
                         # Update progress
-                        file_size = get_file_size(file_path)
-                        processed_size += file_size
+                        processed_size += record.size
                         
-                        if progress_callback and total_size > 0:
-                            progress = (processed_size / total_size) * 100
-                            progress_callback(progress, 100, f"Backing up: {os.path.basename(file_path)}")
+                        self._report_progress(progress_callback, processed_size, scan, 
+                                            f"Backing up: {os.path.basename(file_path)}")
                     
                     except (OSError, IOError) as e:
                         # Skip files that can't be read
-                        if progress_callback:
-                            progress_callback(processed_size / total_size * 100, 100, 
+                        self.skipped_files.append(record)
+                        self._report_progress(progress_callback, processed_size, scan, 
                                             f"Skipped: {os.path.basename(file_path)} ({str(e)})")
                         continue
             
+            TarIndex(gz.members, index_entries).save(backup_path)
+            self._listing = self._tar_listing(index_entries)
             return True
             
         except Exception as e:
             raise Exception(f"TAR creation failed: {str(e)}")
     
-    def _create_7z_backup(self, backup_path, file_list, source_folders, total_size, progress_callback):
+    @staticmethod
+    def _tar_header(record, arcname):
+        """TarInfo of a scanned regular file (the scanner follows symlinks, like ZIP)."""
+        tarinfo = tarfile.TarInfo(arcname)
+        tarinfo.size = record.size
+        tarinfo.mtime = record.mtime
+        tarinfo.mode = stat.S_IMODE(record.mode)
+        return tarinfo
+    
+    def _create_7z_backup(self, backup_path, records, source_folders, scan, progress_callback):
         """Create 7Z backup with maximum compression."""
         if not SEVENZ_AVAILABLE:
             raise Exception("Compressão 7Z não disponível. Biblioteca py7zr não encontrada.")
         
-        print(f"Iniciando backup 7Z: {len(file_list)} arquivos para {backup_path}")
+        print(f"Iniciando backup 7Z para {backup_path}")
         
         try:
             processed_size = 0
             files_added = 0
             
             print(f"Criando arquivo 7Z: {backup_path}")
-            print(f"Arquivos para processar: {len(file_list)}")
             
             with py7zr.SevenZipFile(backup_path, 'w') as szf:
-                for file_path in file_list:
+                for record in records:
+                    file_path = record.path
                     if self.cancel_flag.is_set():
                         print("Backup cancelado pelo usuário")
                         return False
@@ -316,19 +748,16 @@ class BackupManager:
                         files_added += 1
                         
                         # Update progress
-                        file_size = get_file_size(file_path)
-                        processed_size += file_size
+                        processed_size += record.size
                         
-                        if progress_callback and total_size > 0:
-                            progress = 80 + (processed_size / total_size) * 20  # 80-100%
-                            progress_callback(progress, 100, f"Comprimindo: {os.path.basename(file_path)}")
+                        self._report_progress(progress_callback, processed_size, scan, 
+                                            f"Comprimindo: {os.path.basename(file_path)}")
                     
                     except (OSError, IOError) as e:
                         print(f"Erro ao adicionar {file_path}: {e}")
                         # Skip files that can't be read
-                        if progress_callback:
-                            progress = 80 + (processed_size / total_size) * 20
-                            progress_callback(progress, 100, 
+                        self.skipped_files.append(record)
+                        self._report_progress(progress_callback, processed_size, scan, 
                                             f"Pulado: {os.path.basename(file_path)} ({str(e)})")
                         continue
             
@@ -339,19 +768,166 @@ class BackupManager:
         except Exception as e:
             raise Exception(f"7Z creation failed: {str(e)}")
     
-    def _get_archive_name(self, file_path, source_folders):
-        """Generate archive name for file maintaining folder structure."""
-        # Find which source folder this file belongs to
+    def _create_dedup_backup(self, backup_path, records, source_folders, scan, progress_callback, catalog_extra):
+        """
+        Create a deduplicated backup.
+        
+        Files are split into content-defined chunks that are stored once in
+        the destination's chunk store; the backup itself is a manifest listing
+        the chunks of every file. Files unchanged since the previous dedup
+        backup of these folders reuse its chunk list without being read.
+        Logical (file) and physical (newly stored) bytes go to catalog_extra.
+        """
+        try:
+            destination_path = os.path.dirname(backup_path)
+            store = DedupStore.for_destination(destination_path)
+            previous_files = self._load_previous_dedup_files(source_folders, destination_path)
+            
+            processed_size = 0
+            logical_size = 0
+            physical_size = 0
+            files = []
+            pending = deque()  # (chunk_ids, index, future) in submission order
+            
+            with ThreadPoolExecutor(max_workers=self.compress_workers, thread_name_prefix='dedup') as pool:
+                for record in records:
+                    file_path = record.path
+                    if self.cancel_flag.is_set():
+                        return False
+                    
+                    arcname = self._get_archive_name(file_path, source_folders)
+                    entry = {
+                        'name': arcname,
+                        'source': file_path,
+                        'size': record.size,
+                        'mtime_ns': record.mtime_ns,
+                        'ctime_ns': record.ctime_ns,
+                        'inode': record.inode,
+                        'mode': record.mode,
+                        'chunks': []
+                    }
+                    
+                    # Reuse the chunks only if the file was not touched at all: a
+                    # rewrite that restores the mtime still changes ctime (or inode)
+                    previous = previous_files.get(file_path)
+                    if previous and all(previous.get(field) == entry[field]
+                                        for field in ('size', 'mtime_ns', 'ctime_ns', 'inode')):
+                        entry['chunks'] = previous['chunks']
+                        if previous.get('hash'):
+                            entry['hash'] = previous['hash']
+                    else:
+                        try:
+                            size = 0
+                            hasher = ContentHasher()
+                            with open(file_path, 'rb') as f:
+                                for chunk in iter_chunks(f):
+                                    size += len(chunk)
+                                    hasher.update(chunk)
+                                    entry['chunks'].append(None)
+                                    future = pool.submit(store.put_chunk, chunk)
+                                    pending.append((entry['chunks'], len(entry['chunks']) - 1, future))
+                                    
+                                    # Bound the number of chunks held in memory
+                                    while len(pending) > self.compress_workers * 2:
+                                        physical_size += self._resolve_chunk(pending.popleft())
+                            entry['size'] = size
+                            entry['hash'] = hasher.hexdigest()
+                        
+                        except (OSError, IOError) as e:
+                            # Skip files that can't be read
+                            self.skipped_files.append(record)
+                            self._report_progress(progress_callback, processed_size, scan, 
+                                                f"Skipped: {os.path.basename(file_path)} ({str(e)})")
+                            continue
+                    
+                    files.append(entry)
+                    logical_size += entry['size']
+                    processed_size += record.size
+                    self._report_progress(progress_callback, processed_size, scan, 
+                                        f"Backing up: {os.path.basename(file_path)}")
+                
+                while pending:
+                    physical_size += self._resolve_chunk(pending.popleft())
+            
+            # The chunks must be on disk before a manifest refers to them
+            store.sync()
+            save_manifest(backup_path, {
+                'version': MANIFEST_VERSION,
+                'created': datetime.now().isoformat(),
+                'source_folders': source_folders,
+                'files': files
+            })
+            
+            catalog_extra['logical_size'] = logical_size
+            catalog_extra['physical_size'] = physical_size
+            self._content_hashes = {entry['name']: entry['hash'] for entry in files if entry.get('hash')}
+            self._listing = self._dedup_listing(files)
+            return True
+            
+        except Exception as e:
+            raise Exception(f"Dedup backup failed: {str(e)}")
+    
+    def _resolve_chunk(self, pending_chunk):
+        """Store the ID of a finished chunk in its file entry; returns bytes written."""
+        chunk_ids, index, future = pending_chunk
+        chunk_id, written = future.result()
+        chunk_ids[index] = chunk_id
+        return written
+    
+    def _load_previous_dedup_files(self, source_folders, destination_path):
+        """Map source path -> file entry of the newest dedup backup of these folders in the same store."""
+        try:
+            destination = str(Path(destination_path).resolve())
+            
+            # Catalog entries are sorted newest first
+            for entry in self.catalog_manager.get_entries_by_source(source_folders):
+                if entry.get('compression') != 'dedup' or not os.path.exists(entry['path']):
+                    continue
+                if str(Path(entry['path']).parent.resolve()) != destination:
+                    continue
+                manifest = load_manifest(entry['path'])
+                return {f['source']: f for f in manifest['files']}
+        except Exception as e:
+            print(f"Erro ao carregar backup dedup anterior: {e}")
+        
+        return {}
+    
+    def _get_base_backup(self, base_backup):
+        """Return the catalog entry of the full backup a differential is based on."""
+        if not base_backup:
+            raise Exception("Backup diferencial requer um backup base")
+        
+        base_info = self.catalog_manager.get_backup_info(base_backup)
+        if not base_info:
+            raise Exception(f"Backup base não encontrado: {base_backup}")
+        if base_info.get('incremental') or base_info.get('differential'):
+            raise Exception(f"Backup base deve ser um backup completo: {base_backup}")
+        return base_info
+    
+    def _changed_since_base(self, record, base_file, base_time):
+        """Verificar se arquivo mudou desde o backup base."""
+        if base_file is None:
+            return True
+        if base_file['size'] != record.size:
+            return True
+        if 'mtime_ns' in base_file:
+            # A changed inode status time after the base also catches copies
+            # that preserve the modification time
+            return (base_file['mtime_ns'] != record.mtime_ns or 
+                    datetime.fromtimestamp(record.ctime_ns / 1e9) > base_time)
+        # Catalog entries written before mtime_ns was recorded
+        return self._should_include_file(record, base_time)
+    
+    def _get_source_folder(self, file_path, source_folders):
+        """Return the source folder a scanned file belongs to."""
         for source_folder in source_folders:
             if file_path.startswith(source_folder):
-                # Get relative path from source folder
-                rel_path = os.path.relpath(file_path, source_folder)
-                # Prefix with source folder name to avoid conflicts
-                folder_name = os.path.basename(source_folder.rstrip(os.sep))
-                return os.path.join(folder_name, rel_path).replace(os.sep, '/')
-        
-        # Fallback: use just the filename
-        return os.path.basename(file_path)
+                return source_folder
+        return os.path.dirname(file_path)
+    
+    def _get_archive_name(self, file_path, source_folders):
+        """Generate archive name for file maintaining folder structure."""
+        return get_archive_name(file_path, source_folders)
     
     def cancel_backup(self):
         """Cancel the current backup operation."""
@@ -360,48 +936,32 @@ class BackupManager:
     def _get_last_backup_time(self, source_folders):
         """Obter timestamp do último backup para as pastas especificadas."""
         try:
-            catalog = self.catalog_manager.get_catalog_entries()
-            if not catalog:
-                return None
-            
-            # Procurar pelo backup mais recente das mesmas pastas
+            # Procurar pelo backup mais recente das mesmas pastas (ou subconjunto)
             last_backup_time = None
-            source_folders_set = set(str(Path(f).resolve()) for f in source_folders)
-            
-            for entry in catalog:
-                entry_folders = entry.get('source_folders', [])
-                entry_folders_set = set(str(Path(f).resolve()) for f in entry_folders)
-                
-                # Se as pastas são as mesmas ou subconjunto
-                if source_folders_set.intersection(entry_folders_set):
-                    backup_date = entry.get('date')
-                    if backup_date:
-                        try:
-                            backup_time = datetime.fromisoformat(backup_date)
-                            if not last_backup_time or backup_time > last_backup_time:
-                                last_backup_time = backup_time
-                        except:
-                            continue
+            for entry in self.catalog_manager.get_entries_by_source(source_folders):
+                backup_date = entry.get('date')
+                if backup_date:
+                    try:
+                        backup_time = datetime.fromisoformat(backup_date)
+                        if not last_backup_time or backup_time > last_backup_time:
+                            last_backup_time = backup_time
+                    except:
+                        continue
             
             return last_backup_time
         except Exception as e:
             print(f"Erro ao obter última data de backup: {e}")
             return None
     
-    def _should_include_file(self, file_path, since_time):
+    def _should_include_file(self, record, since_time):
         """Verificar se arquivo deve ser incluído baseado na data de modificação."""
-        try:
-            # Se não há filtro de tempo, incluir sempre
-            if since_time is None:
-                return True
-            
-            # Verificar data de modificação do arquivo
-            file_mtime = datetime.fromtimestamp(os.path.getmtime(file_path))
-            return file_mtime > since_time
-            
-        except (OSError, IOError):
-            # Se não conseguir acessar o arquivo, incluir por segurança
+        # Se não há filtro de tempo, incluir sempre
+        if since_time is None:
             return True
+        
+        # Data de modificação já coletada pelo scanner
+        file_mtime = datetime.fromtimestamp(record.mtime)
+        return file_mtime > since_time
     
     def verify_backup(self, backup_path):
         """Verify the integrity of a backup file."""
@@ -416,6 +976,10 @@ class BackupManager:
                     # We'll try to read the member list
                     members = tarf.getmembers()
                     return len(members) > 0
+            elif backup_path.endswith(MANIFEST_SUFFIX):
+                # Every chunk referenced by the manifest must be in the store
+                manifest = load_manifest(backup_path)
+                return not DedupStore.for_manifest(backup_path).missing_chunks(manifest)
             else:
                 return False
                 
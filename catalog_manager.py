@@ -4,12 +4,101 @@ Manages backup catalogs and metadata storage.
 """
 
 import json
+import logging
 import os
+import sqlite3
+import threading
 from pathlib import Path
 from datetime import datetime
-import shutil
 
-from utils import ensure_directory_exists, get_file_size
+from utils import ensure_directory_exists, get_file_size, replace_file_durably, get_archive_name, get_source_path
+from file_list import FileList, write_file_list, FILE_LIST_SUFFIX
+from presence_checker import PresenceChecker, STATUS_MISSING
+from listing_cache import ListingCache
+
+CATALOG_VERSION = '2.0'
+
+logger = logging.getLogger(__name__)
+
+# Writes between checkpoints of the write-ahead log into the database
+COMPACT_INTERVAL = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS catalog_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS backups (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    backup_id TEXT,
+    date TEXT NOT NULL,
+    path TEXT NOT NULL,
+    compression TEXT,
+    size INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS backups_date ON backups (date);
+CREATE TABLE IF NOT EXISTS backup_sources (
+    backup INTEGER NOT NULL REFERENCES backups (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    folder TEXT NOT NULL,
+    folder_key TEXT NOT NULL,
+    PRIMARY KEY (backup, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS backup_sources_folder ON backup_sources (folder_key);
+CREATE TABLE IF NOT EXISTS paths (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS backup_paths (
+    backup INTEGER NOT NULL REFERENCES backups (id) ON DELETE CASCADE,
+    path INTEGER NOT NULL REFERENCES paths (id),
+    PRIMARY KEY (backup, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS backup_paths_path ON backup_paths (path);
+CREATE TRIGGER IF NOT EXISTS backup_paths_release AFTER DELETE ON backup_paths
+WHEN NOT EXISTS (SELECT 1 FROM backup_paths WHERE path = old.path) BEGIN
+    DELETE FROM paths WHERE id = old.path;
+END;
+CREATE TABLE IF NOT EXISTS path_index_pending (
+    backup INTEGER PRIMARY KEY REFERENCES backups (id) ON DELETE CASCADE
+);
+"""
+
+# Trigram full-text index over the distinct paths, kept in sync by triggers.
+# Needs SQLite 3.34+ built with FTS5; without it searches scan paths.
+_PATH_SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS path_search USING fts5(
+    path, content='paths', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS paths_insert AFTER INSERT ON paths BEGIN
+    INSERT INTO path_search (rowid, path) VALUES (new.id, new.path);
+END;
+CREATE TRIGGER IF NOT EXISTS paths_delete AFTER DELETE ON paths BEGIN
+    INSERT INTO path_search (path_search, rowid, path) VALUES ('delete', old.id, old.path);
+END;
+"""
+
+# Trigram queries need at least this many characters to use the index
+_MIN_TRIGRAM_QUERY = 3
+
+# Paths indexed per transaction; the catalog lock is released in between
+_PATH_INDEX_BATCH = 2000
+
+# Entry fields kept in their own columns/tables; everything else is stored
+# as JSON in backups.data
+_COLUMN_FIELDS = ('name', 'id', 'date', 'path', 'compression', 'size', 'source_folders', 'files')
+
+
+def _folder_key(folder):
+    """Normalized form of a source folder used for lookups."""
+    return str(Path(folder).resolve())
+
+
+def _is_glob(query):
+    return any(char in query for char in '*?[')
+
 
 class CatalogManager:
     def __init__(self, catalog_dir=None):
@@ -23,49 +112,381 @@ class CatalogManager:
         # Ensure catalog directory exists
         ensure_directory_exists(str(self.catalog_dir))
         
-        self.catalog_file = self.catalog_dir / "backup_catalog.json"
+        self.catalog_file = self.catalog_dir / "backup_catalog.db"
+        self.snapshot_file = self.catalog_dir / "backup_catalog.db.bak"
+        # Per-backup file lists live outside the database, loaded on demand
+        self.file_lists_dir = self.catalog_dir / "file_lists"
+        self.legacy_catalog_file = self.catalog_dir / "backup_catalog.json"
         self.settings_file = self.catalog_dir / "settings.json"
         
+        # SQLite removes the write-ahead log when the last connection closes
+        # cleanly; one left over means a crash (or another open process)
+        unclean_shutdown = Path(str(self.catalog_file) + '-wal').exists()
+        
+        # One connection shared by the GUI, web and backup threads
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.catalog_file), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        
+        # Entries (without files) cached until the database changes: another
+        # process's commit changes PRAGMA data_version, our own writes bump
+        # the generation counter
+        self._generation = 0
+        self._writes_since_compaction = 0
+        self._compaction_thread = None
+        # Serializes writers of the snapshot file
+        self._snapshot_lock = threading.Lock()
+        self._cache_key = None
+        self._cached_entries = []
+        self._cached_by_name = {}
+        # Paths of new backups are indexed by a background thread
+        self._index_thread = None
+        self._index_requested = False
+        self._closing = False
+        
+        # Backup files may sit on slow network destinations
+        self.presence = PresenceChecker()
+        # Member listings of the archives, so opening a backup needs no scan
+        self.listing_cache = ListingCache.for_catalog(self.catalog_dir)
+        
         # Initialize catalog if it doesn't exist
-        self._initialize_catalog()
-    
-    def _initialize_catalog(self):
-        """Initialize the catalog file if it doesn't exist."""
-        if not self.catalog_file.exists():
-            initial_catalog = {
-                'version': '1.0',
-                'created': datetime.now().isoformat(),
-                'backups': []
-            }
-            self._save_catalog(initial_catalog)
+        self._initialize_catalog(unclean_shutdown)
     
-    def _load_catalog(self):
-        """Load catalog from file."""
+    def _initialize_catalog(self, unclean_shutdown=False):
+        """Create the catalog tables and migrate a JSON catalog if present."""
+        with self._lock:
+            try:
+                # Every commit is appended to the write-ahead log and synced;
+                # after a crash SQLite replays the log on the next open
+                self._conn.execute('PRAGMA journal_mode=WAL')
+                self._conn.execute('PRAGMA synchronous=FULL')
+                self._conn.execute('PRAGMA foreign_keys=ON')
+            except sqlite3.DatabaseError as e:
+                self._raise_corrupted(str(e))
+            if unclean_shutdown:
+                # Only worth reading the whole database after a crash
+                self.check_integrity()
+            
+            self._conn.executescript(_SCHEMA)
+            try:
+                self._conn.executescript(_PATH_SEARCH_SCHEMA)
+                self._path_search = True
+            except sqlite3.OperationalError:
+                self._path_search = False
+            ensure_directory_exists(str(self.file_lists_dir))
+            with self._conn:
+                self._conn.execute("INSERT OR IGNORE INTO catalog_meta VALUES ('version', ?)", (CATALOG_VERSION,))
+                self._conn.execute("INSERT OR IGNORE INTO catalog_meta VALUES ('created', ?)",
+                                   (datetime.now().isoformat(),))
+            
+            if self.legacy_catalog_file.exists():
+                self._migrate_json_catalog()
+            
+            if not self._conn.execute("SELECT 1 FROM catalog_meta WHERE key = 'path_index'").fetchone():
+                self._build_path_index()
+        
+        # Finish indexing interrupted by a crash (or never started)
+        self._schedule_path_index()
+    
+    def _migrate_json_catalog(self):
+        """Import the entries of a JSON catalog (version 1.0) once."""
         try:
-            with open(self.catalog_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            # Return empty catalog if file doesn't exist or is corrupted
-            return {
-                'version': '1.0',
-                'created': datetime.now().isoformat(),
-                'backups': []
-            }
+            with open(self.legacy_catalog_file, 'r', encoding='utf-8') as f:
+                catalog = json.load(f)
+        except json.JSONDecodeError as e:
+            # Keep the file for manual recovery instead of dropping its entries
+            raise Exception(f"Failed to migrate catalog {self.legacy_catalog_file}: {str(e)}")
+        
+        with self._conn:
+            if catalog.get('created'):
+                self._conn.execute("UPDATE catalog_meta SET value = ? WHERE key = 'created'",
+                                   (catalog['created'],))
+            for backup in catalog.get('backups', []):
+                if self._get_rowid(backup['name']) is None:
+                    self._insert_entry(backup)
+        
+        os.replace(self.legacy_catalog_file, self.legacy_catalog_file.with_suffix('.json.migrated'))
+    
+    def _build_path_index(self):
+        """Queue the file lists of catalogs created before the path index existed."""
+        with self._conn:
+            self._conn.execute('INSERT OR IGNORE INTO path_index_pending SELECT id FROM backups')
+            self._conn.execute("INSERT INTO catalog_meta VALUES ('path_index', '1')")
+    
+    def _schedule_path_index(self):
+        """Index the queued backups on the background thread, starting it if needed."""
+        with self._lock:
+            self._index_requested = True
+            if self._index_thread is None:
+                self._index_thread = threading.Thread(target=self._index_in_background,
+                                                      name='catalog-path-index', daemon=True)
+                self._index_thread.start()
+    
+    def _index_in_background(self):
+        while True:
+            with self._lock:
+                if not self._index_requested:
+                    self._index_thread = None
+                    return
+                self._index_requested = False
+            try:
+                self._index_pending_paths()
+            except Exception:
+                logger.exception("Failed to index backup paths")
+    
+    def close(self):
+        """Stop the background work and close the database."""
+        self._closing = True
+        self._wait_for_path_index()
+        if self._compaction_thread is not None:
+            self._compaction_thread.join()
+        with self._lock:
+            self._conn.close()
+    
+    def _wait_for_path_index(self):
+        """Block until the backups queued so far are searchable."""
+        thread = self._index_thread
+        if thread is not None:
+            thread.join()
+    
+    def _index_pending_paths(self):
+        """
+        Index the paths of every backup queued in path_index_pending.
+        
+        Runs on the background thread, in short transactions, so backups
+        are cataloged without waiting for it and other threads keep using
+        the catalog meanwhile; a backup stays queued until all its paths are
+        in. Failures are logged and retried on the next open.
+        """
+        with self._lock:
+            pending = [row['backup'] for row in self._conn.execute('SELECT backup FROM path_index_pending')]
+        
+        for rowid in pending:
+            if self._closing:
+                return
+            try:
+                self._index_paths(rowid)
+            except Exception:
+                logger.exception("Failed to index the paths of backup %s", rowid)
+    
+    def _index_paths(self, rowid):
+        """Link a backup to the member paths in its file list."""
+        with self._lock, self._conn:
+            row = self._conn.execute('SELECT backup_id FROM backups WHERE id = ?', (rowid,)).fetchone()
+            if row is None:
+                return
+            source_folders = [source['folder'] for source in self._conn.execute(
+                'SELECT folder FROM backup_sources WHERE backup = ? ORDER BY position', (rowid,))]
+            # Drop what an interrupted run left behind
+            self._conn.execute('DELETE FROM backup_paths WHERE backup = ?', (rowid,))
+        
+        file_list_path = self._file_list_path(row['backup_id'])
+        if file_list_path.exists():
+            file_list = FileList(str(file_list_path))
+            try:
+                batch = []
+                for name in file_list.names():
+                    # Search by the path inside the archive, as restore expects
+                    batch.append(get_archive_name(name, source_folders))
+                    if len(batch) >= _PATH_INDEX_BATCH:
+                        if not self._insert_paths(rowid, batch):
+                            return
+                        batch = []
+                if not self._insert_paths(rowid, batch):
+                    return
+            finally:
+                file_list.close()
+        
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM path_index_pending WHERE backup = ?', (rowid,))
     
-    def _save_catalog(self, catalog_data):
-        """Save catalog to file."""
+    def _file_list_path(self, backup_id):
+        return self.file_lists_dir / f"{backup_id}{FILE_LIST_SUFFIX}"
+    
+    def _remove_file_lists(self, backup_ids):
+        for backup_id in backup_ids:
+            try:
+                os.remove(self._file_list_path(backup_id))
+            except OSError:
+                # Already gone, or still mapped by a reader on Windows
+                pass
+    
+    def _get_rowid(self, backup_name):
+        row = self._conn.execute('SELECT id FROM backups WHERE name = ?', (backup_name,)).fetchone()
+        return row['id'] if row else None
+    
+    def _insert_entry(self, backup):
+        """Insert a catalog entry (inside a transaction); returns its row id."""
+        backup_id = backup.get('id') or self._generate_backup_id()
+        data = self._entry_data(backup)
+        cursor = self._conn.execute(
+            'INSERT INTO backups (name, backup_id, date, path, compression, size, data) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (backup['name'], backup_id, backup['date'], backup['path'],
+             backup.get('compression'), backup.get('size', 0), json.dumps(data, ensure_ascii=False)))
+        rowid = cursor.lastrowid
+        
+        self._insert_sources(rowid, backup.get('source_folders', []))
+        if 'files' in backup:
+            write_file_list(self._file_list_path(backup_id), backup['files'])
+            # Indexed by _index_pending_paths once the entry is committed
+            self._conn.execute('INSERT INTO path_index_pending VALUES (?)', (rowid,))
+        return rowid
+    
+    def _entry_data(self, backup):
+        """Fields stored as JSON; the catalog only keeps the file count."""
+        data = {key: value for key, value in backup.items() if key not in _COLUMN_FIELDS}
+        if 'files' in backup and 'file_count' not in data:
+            data['file_count'] = len(backup['files'])
+        return data
+    
+    def _insert_sources(self, rowid, source_folders):
+        self._conn.executemany(
+            'INSERT INTO backup_sources (backup, position, folder, folder_key) VALUES (?, ?, ?, ?)',
+            ((rowid, position, folder, _folder_key(folder))
+             for position, folder in enumerate(source_folders)))
+    
+    def _insert_paths(self, rowid, names):
+        """Link a backup to paths (each stored once) in one transaction; False if the backup is gone."""
+        with self._lock, self._conn:
+            if self._closing:
+                # Stays queued; resumed on the next open
+                return False
+            if not self._conn.execute('SELECT 1 FROM path_index_pending WHERE backup = ?', (rowid,)).fetchone():
+                return False
+            self._conn.executemany('INSERT OR IGNORE INTO paths (path) VALUES (?)', ((name,) for name in names))
+            self._conn.executemany('INSERT OR IGNORE INTO backup_paths (backup, path) '
+                                   'SELECT ?, id FROM paths WHERE path = ?', ((rowid, name) for name in names))
+        return True
+    
+    def _row_to_entry(self, row, source_folders):
+        """Build a catalog entry dictionary (without files) from a backups row."""
+        entry = json.loads(row['data'])
+        entry.update({
+            'id': row['backup_id'],
+            'name': row['name'],
+            'date': row['date'],
+            'path': row['path'],
+            'compression': row['compression'],
+            'size': row['size'],
+            'source_folders': source_folders
+        })
+        return entry
+    
+    def _load_entries(self, where='', params=()):
+        """Load catalog entries (without files), newest first."""
+        rows = self._conn.execute(f'SELECT * FROM backups {where} ORDER BY date DESC, id', params).fetchall()
+        
+        sources = {}
+        for source in self._conn.execute('SELECT backup, folder FROM backup_sources ORDER BY backup, position'):
+            sources.setdefault(source['backup'], []).append(source['folder'])
+        
+        return [self._row_to_entry(row, sources.get(row['id'], [])) for row in rows]
+    
+    def _load_full_entry(self, rowid):
+        """Load a complete catalog entry, including its file list."""
+        row = self._conn.execute('SELECT * FROM backups WHERE id = ?', (rowid,)).fetchone()
+        source_folders = [source['folder'] for source in self._conn.execute(
+            'SELECT folder FROM backup_sources WHERE backup = ? ORDER BY position', (rowid,))]
+        return self._with_files(self._row_to_entry(row, source_folders))
+    
+    def _with_files(self, entry):
+        """Attach the file list to an entry; it is memory-mapped only when read."""
+        file_list_path = self._file_list_path(entry['id'])
+        entry['files'] = FileList(str(file_list_path)) if file_list_path.exists() else []
+        return entry
+    
+    def _cached_catalog(self):
+        """Return (entries newest first, entries by name) from the cache."""
+        with self._lock:
+            key = (self._conn.execute('PRAGMA data_version').fetchone()[0], self._generation)
+            if key != self._cache_key:
+                self._cached_entries = self._load_entries()
+                self._cached_by_name = {entry['name']: entry for entry in self._cached_entries}
+                self._cache_key = key
+            return self._cached_entries, self._cached_by_name
+    
+    def _invalidate_cache(self):
+        """Called after every write through this connection."""
+        self._generation += 1
+        self._writes_since_compaction += 1
+    
+    def _raise_corrupted(self, detail):
+        # Never fall back to an empty catalog: the entries would be lost
+        raise Exception(f"Catalog database {self.catalog_file} is corrupted ({detail}). "
+                        f"Last snapshot: {self.snapshot_file}")
+    
+    def check_integrity(self, full=False):
+        """
+        Verify the catalog database, raising if it is corrupted.
+        
+        Reads the whole database, so it runs on open only after an unclean
+        shutdown; call it explicitly to check on demand.
+        
+        Args:
+            full: Run integrity_check (also verifies indexes) instead of quick_check
+        """
+        with self._lock:
+            try:
+                check = self._conn.execute('PRAGMA integrity_check' if full else 'PRAGMA quick_check').fetchone()[0]
+            except sqlite3.DatabaseError as e:
+                check = str(e)
+        if check != 'ok':
+            self._raise_corrupted(check)
+    
+    def _maybe_compact(self):
+        """
+        Compact the catalog in the background every COMPACT_INTERVAL writes.
+        
+        The entry being written is already committed, so a failed compaction
+        is only logged; the next interval tries again.
+        """
+        with self._lock:
+            if self._writes_since_compaction < COMPACT_INTERVAL:
+                return
+            if self._compaction_thread is not None and self._compaction_thread.is_alive():
+                return
+            self._writes_since_compaction = 0
+            self._compaction_thread = threading.Thread(target=self._compact_in_background, daemon=True)
+            self._compaction_thread.start()
+    
+    def _compact_in_background(self):
         try:
-            # Create backup of existing catalog
-            if self.catalog_file.exists():
-                backup_file = self.catalog_file.with_suffix('.json.bak')
-                shutil.copy2(self.catalog_file, backup_file)
-            
-            # Save new catalog
-            with open(self.catalog_file, 'w', encoding='utf-8') as f:
-                json.dump(catalog_data, f, indent=2, ensure_ascii=False)
-                
+            self.compact_catalog()
+        except Exception:
+            logger.exception("Catalog compaction failed")
+    
+    def compact_catalog(self):
+        """
+        Fold the write-ahead log into the database and refresh the snapshot.
+        
+        The snapshot (backup_catalog.db.bak) is a consistent copy of the
+        catalog written to a temporary file, synced and renamed into place.
+        It is read through its own connection, so other threads keep using
+        the catalog while it is copied.
+        """
+        try:
+            with self._lock:
+                self._conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+                self._writes_since_compaction = 0
+            
+            with self._snapshot_lock:
+                temp_path = self.snapshot_file.with_name(self.snapshot_file.name + '.tmp')
+                source = sqlite3.connect(str(self.catalog_file))
+                try:
+                    snapshot = sqlite3.connect(str(temp_path))
+                    try:
+                        # Copied in one step, i.e. one read transaction: consistent
+                        # even while this process keeps writing
+                        source.backup(snapshot)
+                    finally:
+                        snapshot.close()
+                finally:
+                    source.close()
+                replace_file_durably(temp_path, self.snapshot_file)
+        
         except Exception as e:
-            raise Exception(f"Failed to save catalog: {str(e)}")
+            raise Exception(f"Failed to compact catalog: {str(e)}")
     
     def add_catalog_entry(self, backup_info):
         """
@@ -75,8 +496,6 @@ class CatalogManager:
             backup_info: Dictionary containing backup information
         """
         try:
-            catalog = self._load_catalog()
-            
             # Validate backup info
             required_fields = ['name', 'filename', 'path', 'date', 'size', 'compression']
             for field in required_fields:
@@ -97,26 +516,31 @@ class CatalogManager:
             backup_entry['size'] = actual_size
             
             # Add to catalog
-            catalog['backups'].append(backup_entry)
-            
-            # Sort by date (newest first)
-            catalog['backups'].sort(key=lambda x: x['date'], reverse=True)
-            
-            # Save catalog
-            self._save_catalog(catalog)
-            
+            with self._lock, self._conn:
+                if self._get_rowid(backup_entry['name']) is not None:
+                    raise Exception(f"Backup already exists in catalog: {backup_entry['name']}")
+                self._insert_entry(backup_entry)
+                self._invalidate_cache()
+            self.presence.record(backup_entry['path'], True)
+            self._schedule_path_index()
+            self._maybe_compact()
+        
         except Exception as e:
             raise Exception(f"Failed to add catalog entry: {str(e)}")
     
     def get_catalog_entries(self):
         """Get all catalog entries."""
         try:
-            catalog = self._load_catalog()
+            backups, _ = self._cached_catalog()
             entries = []
             
-            for backup in catalog['backups']:
-                # Verify backup file still exists
-                if os.path.exists(backup['path']):
+            # Existence is checked concurrently and cached; entries not yet
+            # checked are reported as 'unknown' and refreshed in the background
+            statuses = self.presence.statuses(backup['path'] for backup in backups)
+            
+            for backup in backups:
+                status = statuses[backup['path']]
+                if status != STATUS_MISSING:
                     entries.append({
                         'id': backup.get('id', ''),
                         'name': backup['name'],
@@ -127,17 +551,43 @@ class CatalogManager:
                         'compression': backup['compression'],
                         'file_count': backup.get('file_count', 0),
                         'location': os.path.dirname(backup['path']),
-                        'source_folders': backup.get('source_folders', [])
+                        'source_folders': list(backup.get('source_folders', [])),
+                        'logical_size': backup.get('logical_size', backup['size']),
+                        'physical_size': backup.get('physical_size', backup['size']),
+                        'status': status
                     })
                 else:
                     # Mark as missing but keep in catalog
                     entry = backup.copy()
-                    entry['status'] = 'missing'
+                    entry['source_folders'] = list(backup.get('source_folders', []))
+                    entry['status'] = STATUS_MISSING
                     entry['location'] = f"MISSING: {os.path.dirname(backup['path'])}"
                     entries.append(entry)
             
             return entries
-            
+        
+        except Exception as e:
+            raise Exception(f"Failed to get catalog entries: {str(e)}")
+    
+    def get_entries_by_source(self, source_folders):
+        """
+        Get the catalog entries (without files) of backups that include any
+        of the given source folders, newest first.
+        
+        Args:
+            source_folders: List of source folder paths
+        """
+        try:
+            keys = sorted({_folder_key(folder) for folder in source_folders})
+            if not keys:
+                return []
+            
+            placeholders = ', '.join('?' * len(keys))
+            with self._lock:
+                return self._load_entries(
+                    f'WHERE id IN (SELECT backup FROM backup_sources WHERE folder_key IN ({placeholders}))',
+                    keys)
+        
         except Exception as e:
             raise Exception(f"Failed to get catalog entries: {str(e)}")
     
@@ -148,7 +598,7 @@ class CatalogManager:
             backup_list = []
             
             for entry in entries:
-                if entry.get('status') != 'missing':
+                if entry.get('status') != STATUS_MISSING:
                     backup_list.append({
                         'name': entry['name'],
                         'filename': entry['filename'],
@@ -158,7 +608,7 @@ class CatalogManager:
                     })
             
             return backup_list
-            
+        
         except Exception as e:
             raise Exception(f"Failed to get backup list: {str(e)}")
     
@@ -170,21 +620,71 @@ class CatalogManager:
             backup_name: Name of the backup to delete
         """
         try:
-            catalog = self._load_catalog()
-            
-            # Find and remove the backup entry
-            original_count = len(catalog['backups'])
-            catalog['backups'] = [b for b in catalog['backups'] if b['name'] != backup_name]
-            
-            if len(catalog['backups']) == original_count:
-                raise Exception(f"Backup not found: {backup_name}")
-            
-            # Save updated catalog
-            self._save_catalog(catalog)
-            
+            with self._lock, self._conn:
+                row = self._conn.execute('SELECT id, backup_id, path FROM backups WHERE name = ?',
+                                         (backup_name,)).fetchone()
+                if row is None:
+                    raise Exception(f"Backup not found: {backup_name}")
+                self._conn.execute('DELETE FROM backups WHERE id = ?', (row['id'],))
+                self._invalidate_cache()
+            
+            self._remove_file_lists([row['backup_id']])
+            self.presence.invalidate(row['path'])
+            self.listing_cache.discard(row['path'])
+            self._maybe_compact()
+        
         except Exception as e:
             raise Exception(f"Failed to delete catalog entry: {str(e)}")
     
+    def search_files(self, query, limit=100):
+        """
+        Find which backups contain files matching a query.
+        
+        Args:
+            query: Substring of the archive path (case-insensitive), or a
+                   glob pattern (*, ?, [...]) matched against the whole path
+            limit: Maximum number of matches returned (None for all)
+        
+        Returns:
+            list: Dicts with 'backup', 'date', 'path' (member name inside the
+                  archive, as restore_files expects) and 'source' (original
+                  path, None if unknown), newest backup first
+        """
+        try:
+            if not query:
+                return []
+            
+            if _is_glob(query):
+                if self._path_search:
+                    condition, params = 'p.id IN (SELECT rowid FROM path_search WHERE path GLOB ?)', [query]
+                else:
+                    condition, params = 'p.path GLOB ?', [query]
+            elif self._path_search and len(query) >= _MIN_TRIGRAM_QUERY:
+                # A quoted phrase matches as a substring with the trigram tokenizer
+                phrase = '"' + query.replace('"', '""') + '"'
+                condition, params = 'p.id IN (SELECT rowid FROM path_search WHERE path_search MATCH ?)', [phrase]
+            else:
+                escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                condition, params = "p.path LIKE ? ESCAPE '\\'", [f'%{escaped}%']
+            
+            sql = ('SELECT b.name, b.date, p.path FROM paths p JOIN backup_paths bp ON bp.path = p.id '
+                   f'JOIN backups b ON b.id = bp.backup WHERE {condition} ORDER BY b.date DESC, p.id')
+            if limit is not None:
+                sql += ' LIMIT ?'
+                params.append(int(limit))
+            
+            # Backups cataloged moments ago may still be being indexed
+            self._wait_for_path_index()
+            with self._lock:
+                rows = self._conn.execute(sql, params).fetchall()
+                _, by_name = self._cached_catalog()
+            return [{'backup': row['name'], 'date': row['date'], 'path': row['path'],
+                     'source': get_source_path(row['path'], by_name[row['name']].get('source_folders', []))}
+                    for row in rows]
+        
+        except Exception as e:
+            raise Exception(f"Failed to search files: {str(e)}")
+    
     def update_catalog_entry(self, backup_name, updates):
         """
         Update a catalog entry.
@@ -194,23 +694,34 @@ class CatalogManager:
             updates: Dictionary of fields to update
         """
         try:
-            catalog = self._load_catalog()
-            
-            # Find and update the backup entry
-            updated = False
-            for backup in catalog['backups']:
-                if backup['name'] == backup_name:
-                    backup.update(updates)
-                    backup['modified'] = datetime.now().isoformat()
-                    updated = True
-                    break
-            
-            if not updated:
-                raise Exception(f"Backup not found: {backup_name}")
-            
-            # Save updated catalog
-            self._save_catalog(catalog)
-            
+            with self._lock, self._conn:
+                rowid = self._get_rowid(backup_name)
+                if rowid is None:
+                    raise Exception(f"Backup not found: {backup_name}")
+                
+                backup = self._load_full_entry(rowid)
+                backup.update(updates)
+                backup['modified'] = datetime.now().isoformat()
+                
+                self._conn.execute(
+                    'UPDATE backups SET name = ?, date = ?, path = ?, compression = ?, size = ?, data = ? '
+                    'WHERE id = ?',
+                    (backup['name'], backup['date'], backup['path'], backup.get('compression'),
+                     backup.get('size', 0), json.dumps(self._entry_data(backup), ensure_ascii=False), rowid))
+                
+                if 'source_folders' in updates:
+                    self._conn.execute('DELETE FROM backup_sources WHERE backup = ?', (rowid,))
+                    self._insert_sources(rowid, backup['source_folders'])
+                if 'files' in updates:
+                    write_file_list(self._file_list_path(backup['id']), updates['files'])
+                if 'files' in updates or 'source_folders' in updates:
+                    # Member paths depend on both
+                    self._conn.execute('INSERT OR IGNORE INTO path_index_pending VALUES (?)', (rowid,))
+                self._invalidate_cache()
+            
+            self._schedule_path_index()
+            self._maybe_compact()
+        
         except Exception as e:
             raise Exception(f"Failed to update catalog entry: {str(e)}")
     
@@ -220,41 +731,84 @@ class CatalogManager:
         
         Args:
             backup_name: Name of the backup
-            
+        
         Returns:
             dict: Backup information or None if not found
         """
         try:
-            catalog = self._load_catalog()
-            
-            for backup in catalog['backups']:
-                if backup['name'] == backup_name:
-                    return backup
-            
+            _, by_name = self._cached_catalog()
+            backup = by_name.get(backup_name)
+            if backup is None:
+                return None
+            
+            # Callers may modify the result; the cached entry must stay intact
+            entry = dict(backup)
+            entry['source_folders'] = list(backup['source_folders'])
+            return self._with_files(entry)
+        
+        except Exception as e:
+            raise Exception(f"Failed to get backup info: {str(e)}")
+    
+    def get_backup_info_by_path(self, backup_path):
+        """
+        Get detailed information about the backup stored in a file.
+        
+        Args:
+            backup_path: Path of the backup file
+        
+        Returns:
+            dict: Backup information or None if the file is not cataloged
+        """
+        try:
+            backups, _ = self._cached_catalog()
+            target = os.path.abspath(backup_path)
+            for backup in backups:
+                if os.path.abspath(backup['path']) == target:
+                    return self.get_backup_info(backup['name'])
             return None
-            
+        
         except Exception as e:
             raise Exception(f"Failed to get backup info: {str(e)}")
     
     def cleanup_missing_backups(self):
         """Remove catalog entries for missing backup files."""
         try:
-            catalog = self._load_catalog()
-            
-            # Filter out backups with missing files
-            original_count = len(catalog['backups'])
-            catalog['backups'] = [b for b in catalog['backups'] if os.path.exists(b['path'])]
-            
-            removed_count = original_count - len(catalog['backups'])
-            
-            if removed_count > 0:
-                self._save_catalog(catalog)
-            
-            return removed_count
-            
+            backups, _ = self._cached_catalog()
+            
+            # Filter out backups with missing files (checked afresh, concurrently)
+            exists = self.presence.check_all([backup['path'] for backup in backups], max_age=0)
+            missing = [backup for backup in backups if not exists[backup['path']]]
+            
+            if missing:
+                with self._lock, self._conn:
+                    self._conn.executemany('DELETE FROM backups WHERE name = ?',
+                                           [(backup['name'],) for backup in missing])
+                    self._invalidate_cache()
+                self._remove_file_lists(backup['id'] for backup in missing)
+                for backup in missing:
+                    self.listing_cache.discard(backup['path'])
+                self._maybe_compact()
+            
+            return len(missing)
+        
         except Exception as e:
             raise Exception(f"Failed to cleanup missing backups: {str(e)}")
     
+    def _export_data(self):
+        """The whole catalog in the JSON (version 1.0) layout."""
+        with self._lock:
+            meta = dict(self._conn.execute('SELECT key, value FROM catalog_meta').fetchall())
+            rowids = [row['id'] for row in self._conn.execute('SELECT id FROM backups ORDER BY date DESC, id')]
+            backups = [self._load_full_entry(rowid) for rowid in rowids]
+            for backup in backups:
+                backup['files'] = list(backup['files'])
+        
+        return {
+            'version': meta.get('version', CATALOG_VERSION),
+            'created': meta.get('created'),
+            'backups': backups
+        }
+    
     def export_catalog(self, export_path):
         """
         Export catalog to a file.
@@ -263,19 +817,22 @@ class CatalogManager:
             export_path: Path to export the catalog to
         """
         try:
-            catalog = self._load_catalog()
+            catalog = self._export_data()
             
             # Create export data with additional metadata
             export_data = {
                 'export_date': datetime.now().isoformat(),
-                'catalog_version': catalog.get('version', '1.0'),
+                'catalog_version': catalog.get('version', CATALOG_VERSION),
                 'total_backups': len(catalog['backups']),
                 'catalog': catalog
             }
             
-            with open(export_path, 'w', encoding='utf-8') as f:
+            # Never leave a half-written export over an older one
+            temp_path = f"{export_path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
                 json.dump(export_data, f, indent=2, ensure_ascii=False)
-                
+            replace_file_durably(temp_path, export_path)
+        
         except Exception as e:
             raise Exception(f"Failed to export catalog: {str(e)}")
     
@@ -296,25 +853,23 @@ class CatalogManager:
             else:
                 imported_catalog = import_data
             
-            if merge:
-                # Merge with existing catalog
-                current_catalog = self._load_catalog()
+            with self._lock, self._conn:
+                if not merge:
+                    # Replace existing catalog
+                    replaced = [row['backup_id'] for row in self._conn.execute('SELECT backup_id FROM backups')]
+                    self._conn.execute('DELETE FROM backups')
+                    self._remove_file_lists(replaced)
                 
                 # Add imported backups, avoiding duplicates
-                existing_names = {b['name'] for b in current_catalog['backups']}
-                
                 for backup in imported_catalog.get('backups', []):
-                    if backup['name'] not in existing_names:
-                        current_catalog['backups'].append(backup)
-                
-                # Sort by date
-                current_catalog['backups'].sort(key=lambda x: x['date'], reverse=True)
-                
-                self._save_catalog(current_catalog)
-            else:
-                # Replace existing catalog
-                self._save_catalog(imported_catalog)
-                
+                    if self._get_rowid(backup['name']) is None:
+                        self._insert_entry(backup)
+                self._invalidate_cache()
+            
+            self._schedule_path_index()
+            # A bulk import is a good point to fold the log
+            self.compact_catalog()
+        
         except Exception as e:
             raise Exception(f"Failed to import catalog: {str(e)}")
     
@@ -326,31 +881,40 @@ class CatalogManager:
     def get_statistics(self):
         """Get catalog statistics."""
         try:
-            catalog = self._load_catalog()
+            backups, _ = self._cached_catalog()
+            
+            total_backups = len(backups)
+            exists = self.presence.check_all(b['path'] for b in backups)
+            available = [b for b in backups if exists[b['path']]]
+            total_size = sum(b['size'] for b in available)
             
-            total_backups = len(catalog['backups'])
-            total_size = sum(b['size'] for b in catalog['backups'] if os.path.exists(b['path']))
-            missing_backups = sum(1 for b in catalog['backups'] if not os.path.exists(b['path']))
+            # Deduplicated backups share chunks: logical is what was backed up,
+            # physical what each backup actually added to its store
+            logical_size = sum(b.get('logical_size', b['size']) for b in backups)
+            physical_size = sum(b.get('physical_size', b['size']) for b in backups)
+            missing_backups = total_backups - len(available)
             
             # Group by compression type
             compression_stats = {}
-            for backup in catalog['backups']:
-                comp_type = backup.get('compression', 'unknown')
+            for backup in backups:
+                comp_type = backup.get('compression') or 'unknown'
                 if comp_type not in compression_stats:
                     compression_stats[comp_type] = {'count': 0, 'size': 0}
                 compression_stats[comp_type]['count'] += 1
-                if os.path.exists(backup['path']):
-                    compression_stats[comp_type]['size'] += backup['size']
+            for backup in available:
+                compression_stats[backup.get('compression') or 'unknown']['size'] += backup['size']
             
             return {
                 'total_backups': total_backups,
                 'total_size': total_size,
+                'logical_size': logical_size,
+                'physical_size': physical_size,
                 'missing_backups': missing_backups,
                 'available_backups': total_backups - missing_backups,
                 'compression_stats': compression_stats,
                 'catalog_file': str(self.catalog_file),
                 'catalog_size': get_file_size(str(self.catalog_file)) if self.catalog_file.exists() else 0
             }
-            
+        
         except Exception as e:
             raise Exception(f"Failed to get statistics: {str(e)}")
@@ -0,0 +1,233 @@
+"""
+Deduplicated Store for Desktop Backup Application
+Content-defined chunking repository used by the 'dedup' backup format.
+"""
+
+import os
+import json
+import zlib
+import hashlib
+import threading
+from pathlib import Path
+
+from utils import replace_file_durably
+
+STORE_DIRNAME = 'dedup_store'
+MANIFEST_SUFFIX = '.dedup'
+MANIFEST_VERSION = 1
+
+# FastCDC-style chunk size limits
+MIN_CHUNK_SIZE = 256 * 1024
+AVG_CHUNK_SIZE = 1024 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Gear table: fixed pseudo-random value per byte. Changing it (or the
+# patterns below) moves every chunk boundary, so they must stay stable.
+_GEAR = [int.from_bytes(hashlib.blake2b(bytes([i]), digest_size=8).digest(), 'little')
+         for i in range(256)]
+
+# Each byte is reduced to one Gear bit with bytes.translate; a boundary is
+# where the last bits spell a fixed pattern. This is a rolling hash over a
+# 19-21 byte window evaluated entirely in C (translate + find), so chunking
+# runs at memory speed instead of one interpreter step per byte.
+_BIT_TABLE = bytes(b'01'[g & 1] for g in _GEAR)
+
+# Normalized chunking: a stricter (longer) pattern before the average size
+# and a looser one after it keeps chunk sizes close to AVG_CHUNK_SIZE
+_PATTERN_STRICT = b'110100111000101100101'
+_PATTERN_LOOSE = _PATTERN_STRICT[:19]
+
+
+def _find_cut(bits, start, end):
+    """Return the end offset of the chunk starting at ``start``, given the translated bits."""
+    if end - start <= MIN_CHUNK_SIZE:
+        return end
+
+    normal = min(start + AVG_CHUNK_SIZE, end)
+    limit = min(start + MAX_CHUNK_SIZE, end)
+
+    # Bytes below the minimum size are never examined (cut-point skipping)
+    found = bits.find(_PATTERN_STRICT, start + MIN_CHUNK_SIZE - len(_PATTERN_STRICT), normal)
+    if found >= 0:
+        return found + len(_PATTERN_STRICT)
+
+    found = bits.find(_PATTERN_LOOSE, normal - len(_PATTERN_LOOSE), limit)
+    if found >= 0:
+        return found + len(_PATTERN_LOOSE)
+    return limit
+
+
+def iter_chunks(fileobj):
+    """
+    Split a file into content-defined chunks with a rolling Gear hash.
+
+    Boundaries depend only on nearby content, so an insertion early in a
+    file only changes the chunks around it.
+
+    Args:
+        fileobj: File opened in binary mode
+
+    Yields:
+        bytes: Consecutive chunks of the file
+    """
+    buffer = b''
+    bits = b''
+    position = 0
+    eof = False
+    while True:
+        if not eof and len(buffer) - position < MAX_CHUNK_SIZE:
+            data = fileobj.read(MAX_CHUNK_SIZE)
+            if data:
+                buffer = buffer[position:] + data
+                bits = bits[position:] + data.translate(_BIT_TABLE)
+                position = 0
+            else:
+                eof = True
+            continue
+
+        if position >= len(buffer):
+            return
+
+        cut = _find_cut(bits, position, len(buffer))
+        yield buffer[position:cut]
+        position = cut
+
+
+def chunk_id_for(data):
+    """Content address of a chunk (BLAKE2b-256, hex)."""
+    return hashlib.blake2b(data, digest_size=32).hexdigest()
+
+
+class DedupStore:
+    """
+    Content-addressed chunk store kept next to the backup manifests.
+
+    Each chunk is stored once, zlib-compressed, under
+    ``<destination>/dedup_store/chunks/<first 2 hex digits>/<chunk id>``.
+    A backup is a JSON manifest (``<name>.dedup``) listing, per file, the
+    chunk IDs that rebuild it.
+    """
+
+    def __init__(self, root):
+        """
+        Args:
+            root: Store directory (usually <destination>/dedup_store)
+        """
+        self.root = Path(root)
+        self.chunks_dir = self.root / 'chunks'
+        # Directories with new entries not yet synced (see sync)
+        self._unsynced_dirs = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_destination(cls, destination_path):
+        """Store used by backups written to a destination directory."""
+        return cls(os.path.join(destination_path, STORE_DIRNAME))
+
+    @classmethod
+    def for_manifest(cls, manifest_path):
+        """Store holding the chunks referenced by a manifest."""
+        return cls.for_destination(os.path.dirname(os.path.abspath(manifest_path)))
+
+    def chunk_path(self, chunk_id):
+        return self.chunks_dir / chunk_id[:2] / chunk_id
+
+    def has_chunk(self, chunk_id):
+        return self.chunk_path(chunk_id).exists()
+
+    def put_chunk(self, data, level=6):
+        """
+        Store a chunk unless an identical one is already present.
+
+        Args:
+            data: Raw chunk bytes
+            level: zlib compression level for new chunks
+
+        Returns:
+            tuple: (chunk_id, bytes_written) - bytes_written is 0 for duplicates
+        """
+        chunk_id = chunk_id_for(data)
+        path = self.chunk_path(chunk_id)
+        try:
+            # A crash before the data reached the disk can leave an empty
+            # file under the final name (compressed chunks never are empty)
+            if path.stat().st_size > 0:
+                return chunk_id, 0
+        except FileNotFoundError:
+            pass
+
+        new_dirs = [directory for directory in (self.root, self.chunks_dir, path.parent)
+                    if not directory.exists()]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        compressed = zlib.compress(data, level)
+        # Write under a unique temp name, sync and rename, so concurrent
+        # writers and crashes never leave a partial chunk under its final name
+        temp_path = path.with_name(f"{chunk_id}.{os.getpid()}.{id(data)}.tmp")
+        with open(temp_path, 'wb') as f:
+            f.write(compressed)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+
+        with self._lock:
+            self._unsynced_dirs.add(path.parent)
+            self._unsynced_dirs.update(directory.parent for directory in new_dirs)
+        return chunk_id, len(compressed)
+
+    def sync(self):
+        """
+        Make the renames of the chunks stored so far durable.
+
+        Called once before writing a manifest that references them, instead
+        of syncing a directory per chunk.
+        """
+        with self._lock:
+            directories, self._unsynced_dirs = self._unsynced_dirs, set()
+        if os.name == 'nt':
+            return
+        # Deepest first, so a new directory is synced before its entry in the parent
+        for directory in sorted(directories, key=lambda d: len(d.parts), reverse=True):
+            dir_fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def get_chunk(self, chunk_id):
+        """Read and verify a chunk."""
+        try:
+            with open(self.chunk_path(chunk_id), 'rb') as f:
+                data = zlib.decompress(f.read())
+        except FileNotFoundError:
+            raise Exception(f"Chunk not found in store: {chunk_id}")
+
+        if chunk_id_for(data) != chunk_id:
+            raise Exception(f"Chunk is corrupted: {chunk_id}")
+        return data
+
+    def write_file(self, file_entry, target):
+        """Rebuild a file described by a manifest entry into a binary file object."""
+        for chunk_id in file_entry['chunks']:
+            target.write(self.get_chunk(chunk_id))
+
+    def missing_chunks(self, manifest):
+        """Return the chunk IDs referenced by a manifest but absent from the store."""
+        chunk_ids = {chunk_id for entry in manifest['files'] for chunk_id in entry['chunks']}
+        return [chunk_id for chunk_id in chunk_ids if not self.has_chunk(chunk_id)]
+
+
+def save_manifest(manifest_path, manifest):
+    """Write a backup manifest atomically and durably."""
+    temp_path = f"{manifest_path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+    replace_file_durably(temp_path, manifest_path)
+
+
+def load_manifest(manifest_path):
+    """Read a backup manifest."""
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise Exception(f"Unsupported dedup manifest version: {manifest.get('version')}")
+    return manifest
@@ -0,0 +1,245 @@
+"""
+File List for Desktop Backup Application
+Compact columnar per-backup file lists, memory-mapped on demand.
+"""
+
+import os
+import sys
+import mmap
+import struct
+from array import array
+from collections.abc import Sequence
+
+from utils import replace_file_durably
+
+FILE_LIST_MAGIC = b'BKFL'
+FILE_LIST_VERSION = 1
+FILE_LIST_SUFFIX = '.files'
+
+# Every this many names the prefix compression restarts, so any entry can
+# be decoded without reading the names before it
+RESTART_INTERVAL = 64
+
+# mtime_ns value stored for entries without a modification time
+NO_MTIME = -(1 << 63)
+
+HASH_SIZE = 32
+_FLAG_HASHES = 0x1
+
+# magic, version, flags, count, then offsets of the restart, name, size,
+# mtime and hash sections and of the end of the file
+_HEADER = struct.Struct('<4sHHQ6Q')
+
+
+def _varint(value):
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _read_varint(buffer, pos):
+    result = shift = 0
+    while True:
+        byte = buffer[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _little_endian(values):
+    """Bytes of an array in little-endian order."""
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def write_file_list(path, files):
+    """
+    Write a file list atomically and durably.
+
+    Layout (little-endian): header, restart offsets (u64), prefix-compressed
+    UTF-8 names, then one packed column each for size (u64), mtime_ns (i64)
+    and, if any entry has one, the 32-byte content hash.
+
+    Args:
+        path: Destination file
+        files: Iterable of dicts with 'name', 'size' and optional
+               'mtime_ns' and 'hash' (hex)
+    """
+    restarts = array('Q')
+    names = bytearray()
+    sizes = array('Q')
+    mtimes = array('q')
+    hashes = bytearray()
+    has_hashes = False
+    previous = b''
+
+    for index, file_info in enumerate(files):
+        name = file_info['name'].encode('utf-8', 'surrogateescape')
+        if index % RESTART_INTERVAL == 0:
+            restarts.append(len(names))
+            shared = 0
+        else:
+            shared = len(os.path.commonprefix([previous, name]))
+        names += _varint(shared) + _varint(len(name) - shared) + name[shared:]
+        previous = name
+
+        sizes.append(file_info.get('size', 0))
+        mtime_ns = file_info.get('mtime_ns')
+        mtimes.append(NO_MTIME if mtime_ns is None else mtime_ns)
+        content_hash = file_info.get('hash')
+        if content_hash:
+            has_hashes = True
+            hashes += bytes.fromhex(content_hash)
+        else:
+            hashes += bytes(HASH_SIZE)
+
+    count = len(sizes)
+    restart_offset = _HEADER.size
+    names_offset = restart_offset + len(restarts) * 8
+    # Keep the numeric columns 8-byte aligned for memoryview casts
+    padding = -(names_offset + len(names)) % 8
+    sizes_offset = names_offset + len(names) + padding
+    mtimes_offset = sizes_offset + count * 8
+    hashes_offset = mtimes_offset + count * 8
+    end_offset = hashes_offset + (len(hashes) if has_hashes else 0)
+
+    header = _HEADER.pack(FILE_LIST_MAGIC, FILE_LIST_VERSION, _FLAG_HASHES if has_hashes else 0, count,
+                          restart_offset, names_offset, sizes_offset, mtimes_offset, hashes_offset,
+                          end_offset)
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(header)
+        f.write(_little_endian(restarts))
+        f.write(names)
+        f.write(bytes(padding))
+        f.write(_little_endian(sizes))
+        f.write(_little_endian(mtimes))
+        if has_hashes:
+            f.write(hashes)
+    replace_file_durably(temp_path, path)
+
+
+class FileList(Sequence):
+    """
+    Read-only view of a file list written by write_file_list.
+
+    The file is only opened and memory-mapped on first access. Entries are
+    returned as dicts like the catalog's former 'files' list: 'name' and
+    'size', plus 'mtime_ns' and 'hash' when recorded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._mmap = None
+        self._count = None
+
+    def _open(self):
+        if self._mmap is not None:
+            return
+        with open(self.path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, flags, count, restart_offset, names_offset, sizes_offset,
+         mtimes_offset, hashes_offset, end_offset) = _HEADER.unpack_from(mm)
+        if magic != FILE_LIST_MAGIC or version != FILE_LIST_VERSION or end_offset != len(mm):
+            mm.close()
+            raise Exception(f"Invalid file list: {self.path}")
+
+        view = memoryview(mm)
+        self._restarts = self._column(view, restart_offset, names_offset - restart_offset, 'Q')
+        self._names = view[names_offset:sizes_offset]
+        self._sizes = self._column(view, sizes_offset, count * 8, 'Q')
+        self._mtimes = self._column(view, mtimes_offset, count * 8, 'q')
+        self._hashes = view[hashes_offset:end_offset] if flags & _FLAG_HASHES else None
+        self._view = view
+        self._mmap = mm
+        self._count = count
+
+    @staticmethod
+    def _column(view, offset, length, typecode):
+        column = view[offset:offset + length]
+        if sys.byteorder == 'big':
+            values = array(typecode, column.tobytes())
+            values.byteswap()
+            return values
+        return column.cast(typecode)
+
+    def close(self):
+        """Unmap the file (it is mapped again on the next access)."""
+        if self._mmap is None:
+            return
+        for name in ('_restarts', '_names', '_sizes', '_mtimes', '_hashes', '_view'):
+            column = getattr(self, name)
+            if isinstance(column, memoryview):
+                column.release()
+            setattr(self, name, None)
+        self._mmap.close()
+        self._mmap = None
+
+    def __len__(self):
+        if self._count is None:
+            self._open()
+        return self._count
+
+    def _entry(self, index, name):
+        entry = {'name': name, 'size': self._sizes[index]}
+        mtime_ns = self._mtimes[index]
+        if mtime_ns != NO_MTIME:
+            entry['mtime_ns'] = mtime_ns
+        if self._hashes is not None:
+            content_hash = bytes(self._hashes[index * HASH_SIZE:(index + 1) * HASH_SIZE])
+            if any(content_hash):
+                entry['hash'] = content_hash.hex()
+        return entry
+
+    def _iter_names(self, start_index=0):
+        """Decode names from the restart point at or before start_index."""
+        restart = start_index // RESTART_INTERVAL
+        if restart >= len(self._restarts):
+            return
+        pos = self._restarts[restart]
+        index = restart * RESTART_INTERVAL
+        names = self._names
+        previous = b''
+        while index < self._count:
+            shared, pos = _read_varint(names, pos)
+            length, pos = _read_varint(names, pos)
+            name = previous[:shared] + bytes(names[pos:pos + length])
+            pos += length
+            previous = name
+            if index >= start_index:
+                yield index, name.decode('utf-8', 'surrogateescape')
+            index += 1
+
+    def names(self):
+        """Iterate over the file names only."""
+        self._open()
+        for index, name in self._iter_names():
+            yield name
+
+    def __iter__(self):
+        self._open()
+        for index, name in self._iter_names():
+            yield self._entry(index, name)
+
+    def __getitem__(self, index):
+        self._open()
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('file list index out of range')
+        for position, name in self._iter_names(index):
+            return self._entry(position, name)
+
+    def __repr__(self):
+        return f"FileList({self.path!r})"
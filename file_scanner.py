@@ -0,0 +1,227 @@
+"""
+File Scanner for Desktop Backup Application
+Collects file metadata for backups with a parallel os.scandir walker.
+"""
+
+import os
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Directory listing is I/O bound, so use more threads than cores
+DEFAULT_SCAN_WORKERS = 8
+
+# Records buffered between the scanner and the archive writer
+DEFAULT_QUEUE_SIZE = 4096
+
+
+class FileRecord(namedtuple('FileRecord', ['path', 'size', 'mtime_ns', 'mode', 'inode', 'ctime_ns'])):
+    """
+    Metadata collected once per file during the scan.
+
+    Every later backup stage (size total, incremental filter, progress and
+    catalog) reads these fields instead of calling stat again.
+    """
+    __slots__ = ()
+
+    @property
+    def mtime(self):
+        """Modification time in seconds, as returned by os.path.getmtime."""
+        return self.mtime_ns / 1e9
+
+
+def _record_from_entry(entry):
+    """Build a FileRecord from an os.DirEntry (one stat call at most)."""
+    st = entry.stat()
+    return FileRecord(entry.path, st.st_size, st.st_mtime_ns, st.st_mode, st.st_ino, st.st_ctime_ns)
+
+
+def scan_directory(directory):
+    """
+    List a single directory.
+
+    Args:
+        directory: Path to the directory
+
+    Returns:
+        tuple: (files, subdirs) where files is a list of FileRecord and
+               subdirs a list of directory paths, both sorted by name
+    """
+    files = []
+    subdirs = []
+
+    with os.scandir(directory) as it:
+        for entry in it:
+            try:
+                # Like os.walk: symlinked directories are not followed
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.is_file():
+                    files.append(_record_from_entry(entry))
+            except OSError:
+                # Entry vanished or is not accessible - skip it
+                continue
+
+    files.sort(key=lambda record: record.path)
+    subdirs.sort()
+    return files, subdirs
+
+
+class ParallelScanner:
+    """
+    Thread-pool directory walker.
+
+    Directory listings are fetched by a pool of worker threads ahead of the
+    consumer, which hides per-directory latency on network shares. Records
+    are still yielded in a fixed depth-first order (each directory sorted by
+    name), so the same tree always produces the same archive layout.
+    """
+
+    def __init__(self, workers=DEFAULT_SCAN_WORKERS, lookahead=None):
+        """
+        Args:
+            workers: Number of threads listing directories concurrently
+            lookahead: How many upcoming directories may be listed ahead of
+                       the consumer (defaults to 4 per worker)
+        """
+        self.workers = max(1, int(workers))
+        self.lookahead = lookahead or self.workers * 4
+
+    def scan(self, source_folders, include_subdirs=True):
+        """
+        Scan source folders and yield a FileRecord for every file.
+
+        Args:
+            source_folders: List of root folders, scanned in the given order
+            include_subdirs: Whether to descend into subdirectories
+
+        Yields:
+            FileRecord: One record per regular file, in deterministic order
+        """
+        # Each stack item is [path, is_root, future]; the top of the stack is
+        # the next directory to visit, so that is where listings are prefetched
+        stack = [[folder, True, None] for folder in reversed(source_folders)
+                 if os.path.exists(folder)]
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='scan')
+
+        try:
+            while stack:
+                for item in stack[:-self.lookahead - 1:-1]:
+                    if item[2] is None:
+                        item[2] = pool.submit(scan_directory, item[0])
+
+                directory, is_root, future = stack.pop()
+                try:
+                    files, subdirs = future.result()
+                except OSError as e:
+                    if is_root:
+                        raise Exception(f"Error accessing folder {directory}: {str(e)}")
+                    # Unreadable subdirectories are ignored, as os.walk does
+                    continue
+
+                yield from files
+
+                if include_subdirs:
+                    stack.extend([subdir, False, None] for subdir in reversed(subdirs))
+        finally:
+            # Consumer stopped early (cancel/error): drop queued listings
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+class ScanPipeline:
+    """
+    Runs a scan in a background thread and hands records to a consumer
+    through a bounded queue.
+
+    The archive writer can start compressing while the walk is still running,
+    and at most ``queue_size`` records wait between the two. Consumers that
+    keep every record (the catalog file list, the archive's directory) still
+    need memory proportional to the file count.
+    ``files_found``/``bytes_found`` are a running estimate of the total that
+    is refined as the scan advances; ``finished`` turns True once it is exact.
+    """
+
+    _DONE = object()
+
+    def __init__(self, records, queue_size=DEFAULT_QUEUE_SIZE, cancel_event=None):
+        """
+        Args:
+            records: Iterable of FileRecord produced by the scanner
+            queue_size: Maximum number of records waiting for the consumer
+            cancel_event: Optional threading.Event that stops the scan
+        """
+        self._records = records
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._cancel_event = cancel_event
+        self._thread = None
+        self._error = None
+
+        self.files_found = 0
+        self.bytes_found = 0
+        self.finished = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def start(self):
+        """Start the producer thread."""
+        self._thread = threading.Thread(target=self._produce, name='scan-pipeline', daemon=True)
+        self._thread.start()
+
+    def _stopped(self):
+        return self._stop.is_set() or (self._cancel_event is not None and self._cancel_event.is_set())
+
+    def _put(self, item):
+        """Block until the consumer takes the item, unless the pipeline is stopped."""
+        while not self._stopped():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self):
+        try:
+            for record in self._records:
+                self.files_found += 1
+                self.bytes_found += record.size
+                if not self._put(record):
+                    return
+            self.finished = True
+        except Exception as e:
+            self._error = e
+        finally:
+            close = getattr(self._records, 'close', None)
+            if close:
+                close()
+            self._put(self._DONE)
+
+    def __iter__(self):
+        """Yield records as the scanner produces them."""
+        while True:
+            try:
+                item = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._stopped():
+                    return
+                continue
+
+            if item is self._DONE:
+                if self._error is not None:
+                    raise self._error
+                return
+            yield item
+
+    def close(self):
+        """Stop the producer and wait for it to exit."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,150 @@
+"""
+File State Index for Desktop Backup Application
+Persistent per-source-folder file metadata used to detect changed files.
+"""
+
+import os
+import time
+import sqlite3
+
+from utils import calculate_content_hash
+
+STATE_DB_FILENAME = 'file_state.db'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_state (
+    source_folder TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    ctime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    content_hash TEXT,
+    seen_run INTEGER NOT NULL,
+    PRIMARY KEY (source_folder, path)
+) WITHOUT ROWID
+"""
+
+
+class FileStateIndex:
+    """
+    Last known state (size, mtime, ctime, inode, content hash) of every file
+    backed up from a source folder.
+
+    A backup run records every scanned file through ``check``; the changes
+    are only made permanent by ``commit_run`` once the backup succeeded, so a
+    failed or cancelled run leaves the index describing the previous backup.
+    Incremental runs use it to skip files whose metadata is unchanged without
+    reading them, and to hash files whose metadata changed so touched but
+    identical files are skipped as well.
+    """
+
+    def __init__(self, db_path):
+        """
+        Args:
+            db_path: SQLite database file (usually next to the catalog)
+        """
+        self.db_path = str(db_path)
+        # Filled by the scan thread, committed by the backup thread
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+        self.run_id = None
+
+    @classmethod
+    def for_catalog(cls, catalog_dir):
+        """Index stored in a catalog directory."""
+        return cls(os.path.join(str(catalog_dir), STATE_DB_FILENAME))
+
+    @staticmethod
+    def normalize_folder(source_folder):
+        """Key under which a source folder's files are stored."""
+        return os.path.normcase(os.path.abspath(source_folder))
+
+    def has_state(self, source_folder):
+        """Whether a previous successful backup recorded this folder."""
+        row = self._conn.execute('SELECT 1 FROM file_state WHERE source_folder = ? LIMIT 1',
+                                 (self.normalize_folder(source_folder),)).fetchone()
+        return row is not None
+
+    def begin_run(self):
+        """Start recording a backup run."""
+        self._conn.rollback()
+        self.run_id = time.time_ns()
+
+    def check(self, source_folder, record, detect_changes=True):
+        """
+        Record a scanned file and tell whether it changed since the last run.
+
+        Args:
+            source_folder: Source folder the file was found in
+            record: FileRecord from the scanner
+            detect_changes: Hash files whose metadata changed to tell a real
+                            content change from a touch (incremental mode)
+
+        Returns:
+            bool: True if the file is new or its content changed
+        """
+        folder = self.normalize_folder(source_folder)
+        row = self._conn.execute(
+            'SELECT size, mtime_ns, ctime_ns, inode, content_hash FROM file_state '
+            'WHERE source_folder = ? AND path = ?', (folder, record.path)).fetchone()
+
+        changed = True
+        content_hash = None
+        if row is not None:
+            size, mtime_ns, ctime_ns, inode, content_hash = row
+            if (size, mtime_ns, ctime_ns, inode) == (record.size, record.mtime_ns, record.ctime_ns, record.inode):
+                # Metadata identical: unchanged, without reading the file
+                changed = False
+            elif not detect_changes:
+                content_hash = None
+            elif size != record.size:
+                content_hash = None
+            else:
+                previous_hash = content_hash
+                try:
+                    content_hash = calculate_content_hash(record.path)
+                except Exception:
+                    content_hash = None
+                changed = content_hash is None or content_hash != previous_hash
+
+        self._conn.execute(
+            'INSERT OR REPLACE INTO file_state '
+            '(source_folder, path, size, mtime_ns, ctime_ns, inode, content_hash, seen_run) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (folder, record.path, record.size, record.mtime_ns, record.ctime_ns, record.inode,
+             content_hash, self.run_id))
+        return changed
+
+    def record_hash(self, source_folder, path, content_hash):
+        """Store the content hash of a file computed while backing it up."""
+        self._conn.execute('UPDATE file_state SET content_hash = ? WHERE source_folder = ? AND path = ?',
+                           (content_hash, self.normalize_folder(source_folder), path))
+
+    def forget(self, source_folder, record):
+        """Drop a file from the index so the next run treats it as new."""
+        self._conn.execute('DELETE FROM file_state WHERE source_folder = ? AND path = ?',
+                           (self.normalize_folder(source_folder), record.path))
+
+    def commit_run(self, source_folders, prune=True):
+        """
+        Make the recorded run permanent.
+
+        Args:
+            source_folders: Folders scanned by the run
+            prune: Forget files of these folders not seen in this run
+                   (only valid when the whole tree was scanned)
+        """
+        if prune:
+            for source_folder in source_folders:
+                self._conn.execute('DELETE FROM file_state WHERE source_folder = ? AND seen_run != ?',
+                                   (self.normalize_folder(source_folder), self.run_id))
+        self._conn.commit()
+        self.run_id = None
+
+    def close(self):
+        """Close the database, discarding an uncommitted run."""
+        self._conn.rollback()
+        self._conn.close()
@@ -0,0 +1,157 @@
+"""
+Listing Cache for Desktop Backup Application
+Persistent cache of archive member listings, so backups open instantly.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from utils import ensure_directory_exists
+
+LISTING_CACHE_DIRNAME = 'listing_cache'
+LISTING_VERSION = 1
+
+# Listings kept decoded in memory, most recently used first
+MEMORY_LISTINGS = 8
+
+
+def _archive_key(archive_path):
+    """(absolute path, size, mtime_ns) identifying one version of an archive."""
+    path = os.path.abspath(archive_path)
+    st = os.stat(path)
+    return path, st.st_size, st.st_mtime_ns
+
+
+def listing_entry(name, size, compressed_size, modified):
+    """One member of a listing, in the form get_backup_contents returns."""
+    return {
+        'name': name,
+        'size': size,
+        'compressed_size': compressed_size,
+        'modified': modified,
+        'path': name
+    }
+
+
+def _to_contents(entries):
+    return [listing_entry(name, size, compressed_size, datetime.fromtimestamp(modified))
+            for name, size, compressed_size, modified in entries]
+
+
+class ListingCache:
+    """
+    Member listings of backup archives, as returned by
+    RestoreManager.get_backup_contents.
+
+    A listing is stored as a small JSON file per archive, keyed by the
+    archive's absolute path, size and modification time: an archive that is
+    rewritten or replaced simply misses the cache. The last few listings are
+    also kept decoded in memory, together with their sorted name index.
+    """
+
+    def __init__(self, cache_dir):
+        """
+        Args:
+            cache_dir: Directory holding the cached listings
+        """
+        self.cache_dir = str(cache_dir)
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # archive key -> (names, entries)
+
+    @classmethod
+    def for_catalog(cls, catalog_dir):
+        """Cache stored in a catalog directory."""
+        return cls(os.path.join(str(catalog_dir), LISTING_CACHE_DIRNAME))
+
+    def _cache_path(self, path):
+        digest = hashlib.blake2b(path.encode('utf-8', 'surrogateescape'), digest_size=16).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def _remember(self, key, index):
+        with self._lock:
+            self._memory[key] = index
+            self._memory.move_to_end(key, last=False)
+            while len(self._memory) > MEMORY_LISTINGS:
+                self._memory.popitem()
+        return index
+
+    def get(self, archive_path):
+        """
+        Return the cached listing of an archive.
+
+        Returns:
+            list: Member dicts sorted by name, or None if not cached or the
+                  archive changed since it was cached
+        """
+        index = self.get_index(archive_path)
+        return None if index is None else _to_contents(index[1])
+
+    def get_index(self, archive_path):
+        """
+        Return the cached listing of an archive as a sorted member index.
+
+        Returns:
+            tuple: (names, entries) - the sorted member names and matching
+                   (name, size, compressed_size, modified timestamp) tuples,
+                   or None if not cached or the archive changed. Shared
+                   with other callers: do not modify.
+        """
+        try:
+            key = _archive_key(archive_path)
+        except OSError:
+            return None
+
+        with self._lock:
+            index = self._memory.get(key)
+        if index is not None:
+            return self._remember(key, index)
+
+        try:
+            with open(self._cache_path(key[0]), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if data.get('version') != LISTING_VERSION or (data.get('path'), data.get('size'), data.get('mtime_ns')) != key:
+            return None
+
+        entries = [tuple(entry) for entry in data['entries']]
+        return self._remember(key, ([entry[0] for entry in entries], entries))
+
+    def put(self, archive_path, contents):
+        """
+        Store the listing of an archive in its current state.
+
+        Args:
+            archive_path: Archive the listing describes
+            contents: Dicts with 'name', 'size', 'compressed_size' and
+                      'modified' (datetime)
+        """
+        key = _archive_key(archive_path)
+        entries = sorted((item['name'], item['size'], item['compressed_size'], item['modified'].timestamp())
+                         for item in contents)
+
+        ensure_directory_exists(self.cache_dir)
+        cache_path = self._cache_path(key[0])
+        temp_path = f"{cache_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': LISTING_VERSION, 'path': key[0], 'size': key[1], 'mtime_ns': key[2],
+                       'entries': entries}, f, ensure_ascii=False, separators=(',', ':'))
+        # Atomic but not synced: a listing lost in a crash is simply rebuilt
+        os.replace(temp_path, cache_path)
+        self._remember(key, ([entry[0] for entry in entries], entries))
+
+    def discard(self, archive_path):
+        """Drop the cached listing of an archive (e.g. when it is deleted)."""
+        path = os.path.abspath(archive_path)
+        with self._lock:
+            for key in [key for key in self._memory if key[0] == path]:
+                del self._memory[key]
+        try:
+            os.remove(self._cache_path(path))
+        except OSError:
+            pass
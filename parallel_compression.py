@@ -0,0 +1,687 @@
+"""
+Parallel Compression for Desktop Backup Application
+Multi-threaded DEFLATE writers for the ZIP and TAR.GZ backup formats.
+"""
+
+import os
+import struct
+import time
+import zlib
+import functools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import CONTENT_HASH_CHUNK_SIZE, hash_content_chunk, combine_content_hashes
+
+# zlib releases the GIL while compressing, so threads scale across cores
+DEFAULT_COMPRESS_WORKERS = os.cpu_count() or 1
+
+# Files larger than this are split and compressed in several parallel chunks
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Each chunk is primed with this much of the preceding data (the DEFLATE window)
+DICTIONARY_SIZE = 32 * 1024
+
+# Uncompressed block size of the block-parallel gzip writer
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+# Already-compressed formats: deflating them costs CPU and saves nothing,
+# and stored members can be restored without decompression
+STORED_EXTENSIONS = frozenset({
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic',
+    '.mp3', '.aac', '.ogg', '.flac', '.m4a',
+    '.mp4', '.m4v', '.mov', '.mkv', '.avi', '.webm',
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar', '.zst',
+    '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.odp', '.jar', '.apk',
+})
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+ZIP64_LIMIT = (1 << 31) - 1
+ZIP_MAX_COUNT = 0xFFFF
+
+_LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')
+_CENTRAL_HEADER = struct.Struct('<4s4B4HL2L5H2L')
+_END_RECORD = struct.Struct('<4s4H2LH')
+_END_RECORD64 = struct.Struct('<4sQ2H2L4Q')
+_END_RECORD64_LOCATOR = struct.Struct('<4sLQL')
+
+
+def deflate_block(data, level=6, zdict=None, last=True):
+    """
+    Compress one block as raw DEFLATE data.
+
+    Blocks compressed with ``last=False`` end on a byte boundary (sync flush),
+    so consecutive blocks can be concatenated into a single valid stream.
+    Priming each block with the tail of the previous one keeps the
+    compression ratio close to single-threaded output.
+
+    Args:
+        data: Bytes to compress
+        level: zlib compression level
+        zdict: Optional preset dictionary (previous block's tail)
+        last: Whether this block terminates the stream
+
+    Returns:
+        bytes: Raw DEFLATE data
+    """
+    if zdict:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=zdict)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+def _gf2_matrix_times(matrix, vector):
+    result = 0
+    index = 0
+    while vector:
+        if vector & 1:
+            result ^= matrix[index]
+        vector >>= 1
+        index += 1
+    return result
+
+
+def _gf2_matrix_multiply(a, b):
+    return [_gf2_matrix_times(a, column) for column in b]
+
+
+@functools.lru_cache(maxsize=64)
+def _crc32_zeros_operator(length):
+    """Matrix that advances a CRC-32 register over ``length`` zero bytes."""
+    # Operator for a single zero bit, squared three times for one zero byte
+    operator = [0xEDB88320] + [1 << n for n in range(31)]
+    for _ in range(3):
+        operator = _gf2_matrix_multiply(operator, operator)
+
+    result = None
+    while length:
+        if length & 1:
+            result = operator if result is None else _gf2_matrix_multiply(operator, result)
+        length >>= 1
+        if length:
+            operator = _gf2_matrix_multiply(operator, operator)
+    return result
+
+
+def crc32_combine(crc1, crc2, length2):
+    """
+    Combine two CRC-32 values as zlib's crc32_combine does.
+
+    Args:
+        crc1: CRC-32 of the first block
+        crc2: CRC-32 of the second block
+        length2: Length in bytes of the second block
+
+    Returns:
+        int: CRC-32 of the two blocks concatenated
+    """
+    if length2 <= 0:
+        return crc1
+    return _gf2_matrix_times(_crc32_zeros_operator(length2), crc1) ^ crc2
+
+
+def _content_digests(data):
+    """Piece digests of a chunk starting on a CONTENT_HASH_CHUNK_SIZE boundary."""
+    view = memoryview(data)
+    return [hash_content_chunk(view[start:start + CONTENT_HASH_CHUNK_SIZE])
+            for start in range(0, len(view), CONTENT_HASH_CHUNK_SIZE)]
+
+
+def _compress_file_chunk(path, offset, length, level, single, store=False, digests=False):
+    """
+    Read and compress one chunk of a file (runs in a worker thread).
+
+    Returns:
+        tuple: (compress_type, crc, raw_size, data, content digests or None)
+    """
+    with open(path, 'rb') as f:
+        zdict = None
+        if offset and not store:
+            dict_start = max(0, offset - DICTIONARY_SIZE)
+            f.seek(dict_start)
+            zdict = f.read(offset - dict_start)
+        else:
+            f.seek(offset)
+        # The last chunk reads to EOF so files that grew since the scan are complete
+        data = f.read(length) if length is not None else f.read()
+
+    crc = zlib.crc32(data)
+    content_digests = _content_digests(data) if digests else None
+    if store:
+        return ZIP_STORED, crc, len(data), data, content_digests
+    last = length is None
+    compressed = deflate_block(data, level, zdict, last)
+
+    # Incompressible single-chunk entries are stored as-is
+    if single and len(compressed) >= len(data):
+        return ZIP_STORED, crc, len(data), data, content_digests
+    return ZIP_DEFLATED, crc, len(data), compressed, content_digests
+
+
+def _zip_date_time(mtime):
+    """ZIP timestamp of a POSIX timestamp, as in zipfile.ZipInfo.date_time."""
+    date_time = time.localtime(mtime)[:6]
+    if date_time[0] < 1980:
+        return (1980, 1, 1, 0, 0, 0)
+    elif date_time[0] > 2107:
+        return (2107, 12, 31, 23, 59, 58)
+    # DOS times have a 2-second resolution
+    return date_time[:5] + (date_time[5] // 2 * 2,)
+
+
+def _dos_datetime(mtime):
+    """Convert a POSIX timestamp to ZIP (DOS) date and time fields."""
+    date_time = _zip_date_time(mtime)
+    dosdate = (date_time[0] - 1980) << 9 | date_time[1] << 5 | date_time[2]
+    dostime = date_time[3] << 11 | date_time[4] << 5 | (date_time[5] // 2)
+    return dosdate, dostime
+
+
+class _ZipEntry:
+    """Bookkeeping for one archive member while it is being written."""
+    __slots__ = ('record', 'arcname', 'chunks', 'next_chunk', 'offset', 'zip64',
+                 'compress_type', 'crc', 'file_size', 'compress_size', 'failed', 'store',
+                 'digests')
+
+    def __init__(self, record, arcname, chunk_size):
+        self.record = record
+        self.arcname = arcname
+        self.chunks = max(1, -(-record.size // chunk_size))
+        self.next_chunk = 0
+        self.offset = None
+        self.zip64 = record.size * 1.05 > ZIP64_LIMIT
+        self.compress_type = ZIP_DEFLATED
+        self.crc = 0
+        self.file_size = 0
+        self.compress_size = 0
+        self.failed = False
+        self.store = os.path.splitext(arcname)[1].lower() in STORED_EXTENSIONS
+        self.digests = []
+
+    @property
+    def content_hash(self):
+        """Content hash (as calculate_content_hash) of the data written, if computed."""
+        if self.digests is None:
+            return None
+        return combine_content_hashes(self.digests or [hash_content_chunk(b'')])
+
+
+class ParallelZipWriter:
+    """
+    ZIP archive writer that deflates entries on a thread pool.
+
+    Worker threads read and compress files (large files in several chunks,
+    each primed with the previous chunk's tail), computing the content hash
+    of the data as they go; the calling thread is the
+    single writer that appends local headers and data in submission order
+    and finally emits the central directory. The result is a standard ZIP
+    (with ZIP64 extensions when needed) readable by the stdlib ``zipfile``.
+
+    Usage::
+
+        with ParallelZipWriter(path, workers=8) as zipw:
+            for record in records:
+                for record, error in zipw.add(record, arcname):
+                    ...  # entry written (error is None) or skipped
+            for record, error in zipw.finish():
+                ...
+    """
+
+    def __init__(self, path, workers=DEFAULT_COMPRESS_WORKERS, compresslevel=6,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Args:
+            path: Destination archive path
+            workers: Number of compression threads
+            compresslevel: zlib compression level
+            chunk_size: Size of the pieces large files are split into
+        """
+        self.workers = max(1, int(workers))
+        self.compresslevel = compresslevel
+        self.chunk_size = chunk_size
+        # Content hash pieces must not straddle two chunks
+        self.hash_content = chunk_size % CONTENT_HASH_CHUNK_SIZE == 0
+        self._max_inflight = self.workers * 2
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='zip')
+        self._fp = open(path, 'wb')
+        self._backlog = deque()   # entries with chunks not yet submitted
+        self._inflight = deque()  # (entry, chunk_index, future) in write order
+        self._central = []        # finished entries for the central directory
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def add(self, record, arcname):
+        """
+        Queue a file for compression.
+
+        Blocks while too much work is in flight, writing finished entries.
+
+        Args:
+            record: FileRecord of the file to add
+            arcname: Member name inside the archive
+
+        Returns:
+            list: (record, error) for every entry completed during the call
+        """
+        self._backlog.append(_ZipEntry(record, arcname, self.chunk_size))
+        completed = []
+
+        self._submit()
+        while self._backlog:
+            self._write_next(completed)
+            self._submit()
+
+        # Write whatever is already finished without waiting
+        while self._inflight and self._inflight[0][2].done():
+            self._write_next(completed)
+            self._submit()
+
+        return completed
+
+    def finish(self):
+        """
+        Wait for all queued entries and write them.
+
+        Returns:
+            list: (record, error) for every remaining entry
+        """
+        completed = []
+        while self._inflight or self._backlog:
+            self._submit()
+            self._write_next(completed)
+        return completed
+
+    def add_raw(self, record, arcname, info, source):
+        """
+        Copy a member of another ZIP archive without recompressing it.
+
+        Queued entries are written first, so members keep their order.
+
+        Args:
+            record: FileRecord-like metadata (size, mtime, mode) of the member
+            arcname: Member name inside this archive
+            info: zipfile.ZipInfo of the member in the source archive
+            source: Source archive opened in binary mode
+
+        Returns:
+            list: (record, error) for every entry completed during the call
+        """
+        if info.flag_bits & 0x1:
+            raise Exception(f"Encrypted ZIP members cannot be copied: {info.filename}")
+
+        completed = self.finish()
+
+        # The data follows the source's local header, whose extra field may
+        # differ from the central directory's
+        source.seek(info.header_offset)
+        header = _LOCAL_HEADER.unpack(source.read(_LOCAL_HEADER.size))
+        source.seek(header[-2] + header[-1], os.SEEK_CUR)
+
+        entry = _ZipEntry(record, arcname, self.chunk_size)
+        entry.compress_type = info.compress_type
+        entry.crc = info.CRC
+        entry.file_size = info.file_size
+        entry.compress_size = info.compress_size
+        entry.zip64 = info.file_size > ZIP64_LIMIT or info.compress_size > ZIP64_LIMIT
+        entry.digests = None
+        entry.offset = self._fp.tell()
+        self._fp.write(self._local_header(entry))
+
+        remaining = info.compress_size
+        while remaining:
+            data = source.read(min(remaining, DEFAULT_CHUNK_SIZE))
+            if not data:
+                raise Exception(f"Truncated ZIP member: {info.filename}")
+            self._fp.write(data)
+            remaining -= len(data)
+
+        self._central.append(entry)
+        completed.append((record, None))
+        return completed
+
+    @property
+    def entries(self):
+        """
+        (arcname, file_size, compress_size, date_time, content_hash) of every
+        member written so far; content_hash is None for members copied with
+        add_raw or when the chunk size does not allow hashing.
+        """
+        return [(entry.arcname, entry.file_size, entry.compress_size, _zip_date_time(entry.record.mtime),
+                 entry.content_hash)
+                for entry in self._central]
+
+    def _submit(self):
+        while self._backlog and len(self._inflight) < self._max_inflight:
+            entry = self._backlog[0]
+            index = entry.next_chunk
+            last = index == entry.chunks - 1
+            length = None if last else self.chunk_size
+            future = self._pool.submit(_compress_file_chunk, entry.record.path,
+                                       index * self.chunk_size, length,
+                                       self.compresslevel, entry.chunks == 1, entry.store,
+                                       self.hash_content)
+            self._inflight.append((entry, index, future))
+            entry.next_chunk += 1
+            if last:
+                self._backlog.popleft()
+
+    def _write_next(self, completed):
+        entry, index, future = self._inflight.popleft()
+        if entry.failed:
+            return
+
+        try:
+            compress_type, crc, raw_size, data, digests = future.result()
+        except OSError as e:
+            # Drop what was already written for this entry
+            if entry.offset is not None:
+                self._fp.seek(entry.offset)
+                self._fp.truncate()
+            entry.failed = True
+            completed.append((entry.record, e))
+            return
+
+        if index == 0:
+            entry.offset = self._fp.tell()
+            entry.compress_type = compress_type
+            if entry.chunks == 1:
+                entry.crc, entry.file_size, entry.compress_size = crc, raw_size, len(data)
+                entry.zip64 = entry.zip64 or raw_size > ZIP64_LIMIT or len(data) > ZIP64_LIMIT
+            self._fp.write(self._local_header(entry))
+        else:
+            entry.crc = crc32_combine(entry.crc, crc, raw_size)
+
+        if entry.chunks > 1:
+            if index == 0:
+                entry.crc = crc
+            entry.file_size += raw_size
+            entry.compress_size += len(data)
+
+        self._fp.write(data)
+
+        if digests is None or (index < entry.chunks - 1 and raw_size != self.chunk_size):
+            # Not hashed, or the file shrank and the pieces no longer line up
+            entry.digests = None
+        elif entry.digests is not None:
+            entry.digests.extend(digests)
+
+        if index == entry.chunks - 1:
+            if entry.chunks > 1:
+                self._patch_local_header(entry)
+            self._central.append(entry)
+            completed.append((entry.record, None))
+
+    def _flag_bits(self, entry):
+        try:
+            entry.arcname.encode('ascii')
+            return 0
+        except UnicodeEncodeError:
+            return 0x800
+
+    def _local_header(self, entry):
+        filename = entry.arcname.encode('utf-8')
+        dosdate, dostime = _dos_datetime(entry.record.mtime)
+        extra = b''
+        file_size, compress_size = entry.file_size, entry.compress_size
+        if entry.zip64:
+            extra = struct.pack('<HHQQ', 1, 16, file_size, compress_size)
+            file_size = compress_size = 0xFFFFFFFF
+        version = 45 if entry.zip64 else (20 if entry.compress_type == ZIP_DEFLATED else 10)
+        return _LOCAL_HEADER.pack(b'PK\x03\x04', version, 0, self._flag_bits(entry),
+                                  entry.compress_type, dostime, dosdate, entry.crc,
+                                  compress_size, file_size, len(filename), len(extra)) + filename + extra
+
+    def _patch_local_header(self, entry):
+        """Fill in CRC and sizes of a chunked entry once all chunks are written."""
+        if not entry.zip64 and (entry.file_size > ZIP64_LIMIT or entry.compress_size > ZIP64_LIMIT):
+            raise Exception(f"File grew beyond ZIP64 limit during backup: {entry.record.path}")
+
+        end = self._fp.tell()
+        self._fp.seek(entry.offset)
+        self._fp.write(self._local_header(entry))
+        self._fp.seek(end)
+
+    def _central_header(self, entry):
+        filename = entry.arcname.encode('utf-8')
+        dosdate, dostime = _dos_datetime(entry.record.mtime)
+        file_size, compress_size, offset = entry.file_size, entry.compress_size, entry.offset
+
+        extra_values = []
+        if file_size > ZIP64_LIMIT or entry.zip64:
+            extra_values.append(file_size)
+            file_size = 0xFFFFFFFF
+        if compress_size > ZIP64_LIMIT or entry.zip64:
+            extra_values.append(compress_size)
+            compress_size = 0xFFFFFFFF
+        if offset > ZIP64_LIMIT:
+            extra_values.append(offset)
+            offset = 0xFFFFFFFF
+
+        extra = b''
+        if extra_values:
+            extra = struct.pack(f'<HH{len(extra_values)}Q', 1, 8 * len(extra_values), *extra_values)
+            version = 45
+        else:
+            version = 20 if entry.compress_type == ZIP_DEFLATED else 10
+
+        create_system = 0 if os.name == 'nt' else 3
+        external_attr = (entry.record.mode & 0xFFFF) << 16
+        return _CENTRAL_HEADER.pack(b'PK\x01\x02', version, create_system, version, 0,
+                                    self._flag_bits(entry), entry.compress_type, dostime, dosdate,
+                                    entry.crc, compress_size, file_size, len(filename), len(extra),
+                                    0, 0, 0, external_attr, offset) + filename + extra
+
+    def _write_end_records(self):
+        start_dir = self._fp.tell()
+        for entry in self._central:
+            self._fp.write(self._central_header(entry))
+        end_dir = self._fp.tell()
+
+        count = len(self._central)
+        size_dir = end_dir - start_dir
+        if count > ZIP_MAX_COUNT or start_dir > ZIP64_LIMIT or size_dir > ZIP64_LIMIT:
+            self._fp.write(_END_RECORD64.pack(b'PK\x06\x06', 44, 45, 45, 0, 0,
+                                              count, count, size_dir, start_dir))
+            self._fp.write(_END_RECORD64_LOCATOR.pack(b'PK\x06\x07', 0, end_dir, 1))
+            count = min(count, ZIP_MAX_COUNT)
+            size_dir = min(size_dir, 0xFFFFFFFF)
+            start_dir = min(start_dir, 0xFFFFFFFF)
+
+        self._fp.write(_END_RECORD.pack(b'PK\x05\x06', 0, 0, count, count, size_dir, start_dir, 0))
+
+    def close(self):
+        """Write any remaining entries and the central directory."""
+        if self._closed:
+            return
+        try:
+            self.finish()
+            self._write_end_records()
+        finally:
+            self._closed = True
+            self._pool.shutdown(wait=True)
+            self._fp.close()
+
+    def abort(self):
+        """Stop compressing and close the (incomplete) archive."""
+        if self._closed:
+            return
+        self._closed = True
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._fp.close()
+
+
+def _compress_gzip_block(data, level, zdict, last):
+    """Compress one gzip block (runs in a worker thread)."""
+    return zlib.crc32(data), len(data), deflate_block(data, level, zdict, last)
+
+
+class ParallelGzipWriter:
+    """
+    Write-only file object producing a gzip file, compressed pigz-style.
+
+    Data written is cut into fixed-size blocks that are deflated in parallel,
+    each primed with the last 32 KiB of the previous block. The blocks are
+    concatenated in order into a gzip member whose CRC is combined from the
+    per-block CRCs, so any gzip reader (including ``tarfile`` in 'r:gz'
+    mode) can read the result.
+
+    ``new_member()`` closes the current gzip member and starts an independent
+    one; ``members`` then maps each member to its compressed and uncompressed
+    start offsets, which lets readers seek into the middle of the file.
+
+    Usage::
+
+        with ParallelGzipWriter(path, workers=8) as gz:
+            with tarfile.open(fileobj=gz, mode='w') as tarf:
+                tarf.add(...)
+    """
+
+    mode = 'wb'
+
+    def __init__(self, path, workers=DEFAULT_COMPRESS_WORKERS, compresslevel=6,
+                 block_size=DEFAULT_BLOCK_SIZE):
+        """
+        Args:
+            path: Destination file path
+            workers: Number of compression threads
+            compresslevel: zlib compression level
+            block_size: Uncompressed size of each parallel block
+        """
+        self.name = path
+        self.workers = max(1, int(workers))
+        self.compresslevel = compresslevel
+        self.block_size = block_size
+        self._max_inflight = self.workers * 2
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='gzip')
+        self._fp = open(path, 'wb')
+        self._buffer = bytearray()
+        self._tail = b''
+        self._inflight = deque()
+        self._offset = 0   # uncompressed bytes accepted so far
+        self._crc = 0
+        self._size = 0     # uncompressed bytes of the current member written out
+        self._member_starts = [0]
+        self._member_offsets = []
+        self.closed = False
+
+        self._write_header()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def _write_header(self):
+        self._member_offsets.append(self._fp.tell())
+        xfl = 2 if self.compresslevel == 9 else (4 if self.compresslevel == 1 else 0)
+        self._fp.write(b'\x1f\x8b\x08\x00' + struct.pack('<L', int(time.time())) +
+                       bytes([xfl, 255]))
+
+    def write(self, data):
+        """Buffer data, handing full blocks to the compression threads."""
+        if self.closed:
+            raise ValueError("write to closed file")
+
+        self._buffer += data
+        self._offset += len(data)
+        while len(self._buffer) >= self.block_size:
+            block = bytes(self._buffer[:self.block_size])
+            del self._buffer[:self.block_size]
+            self._submit(block, last=False)
+        return len(data)
+
+    def tell(self):
+        """Position in the uncompressed stream."""
+        return self._offset
+
+    @property
+    def member_size(self):
+        """Uncompressed bytes written to the current gzip member so far."""
+        return self._offset - self._member_starts[-1]
+
+    @property
+    def member_index(self):
+        """Index of the gzip member currently being written."""
+        return len(self._member_starts) - 1
+
+    @property
+    def members(self):
+        """List of (compressed_offset, uncompressed_offset), one per gzip member."""
+        return list(zip(self._member_offsets, self._member_starts))
+
+    def new_member(self):
+        """
+        End the current gzip member and start a new, independent one.
+
+        Returns:
+            int: Index of the member that subsequent writes go to
+        """
+        if self.member_size:
+            self._submit(bytes(self._buffer), last=True)
+            self._buffer = bytearray()
+            self._member_starts.append(self._offset)
+        return self.member_index
+
+    def _submit(self, block, last, final=False):
+        future = self._pool.submit(_compress_gzip_block, block, self.compresslevel,
+                                   self._tail, last)
+        self._inflight.append((future, last, final))
+        # A new member cannot reference data of the previous one
+        self._tail = b'' if last else block[-DICTIONARY_SIZE:]
+        while len(self._inflight) > self._max_inflight:
+            self._write_next()
+
+    def _write_next(self):
+        future, last, final = self._inflight.popleft()
+        crc, raw_size, data = future.result()
+        self._crc = crc32_combine(self._crc, crc, raw_size)
+        self._size += raw_size
+        self._fp.write(data)
+
+        if last:
+            self._fp.write(struct.pack('<LL', self._crc, self._size & 0xFFFFFFFF))
+            self._crc = 0
+            self._size = 0
+            if not final:
+                self._write_header()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        """Compress the remaining data and write the gzip trailer."""
+        if self.closed:
+            return
+        try:
+            self._submit(bytes(self._buffer), last=True, final=True)
+            self._buffer = bytearray()
+            while self._inflight:
+                self._write_next()
+        finally:
+            self.closed = True
+            self._pool.shutdown(wait=True)
+            self._fp.close()
+
+    def abort(self):
+        """Stop compressing and close the (incomplete) file."""
+        if self.closed:
+            return
+        self.closed = True
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._fp.close()
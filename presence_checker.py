@@ -0,0 +1,135 @@
+"""
+Presence Checker for Desktop Backup Application
+Concurrent, cached existence checks for backup files on slow destinations.
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Stat calls on network shares mostly wait on I/O
+DEFAULT_PRESENCE_WORKERS = 16
+
+# How long a check result is trusted before it is refreshed
+DEFAULT_PRESENCE_TTL = 30.0
+
+STATUS_AVAILABLE = 'available'
+STATUS_MISSING = 'missing'
+STATUS_UNKNOWN = 'unknown'
+
+
+class PresenceChecker:
+    """
+    Tracks whether backup files exist, checking many paths at once.
+
+    Results are cached for ``ttl`` seconds. ``statuses`` never waits longer
+    than asked: stale paths are re-checked on the thread pool in the
+    background and keep their last known status until the check finishes,
+    so a listing of thousands of backups on a slow share returns at once.
+    """
+
+    def __init__(self, workers=DEFAULT_PRESENCE_WORKERS, ttl=DEFAULT_PRESENCE_TTL):
+        """
+        Args:
+            workers: Number of threads calling os.path.exists concurrently
+            ttl: Seconds a result stays fresh
+        """
+        self.ttl = ttl
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix='presence')
+        self._lock = threading.Lock()
+        self._results = {}  # path -> (exists, checked_at)
+        self._pending = {}  # path -> future of a running check
+
+    def _check(self, path):
+        exists = os.path.exists(path)
+        with self._lock:
+            self._results[path] = (exists, time.monotonic())
+            self._pending.pop(path, None)
+        return exists
+
+    def _refresh(self, paths, max_age):
+        """Start checks for paths without a result younger than max_age; returns path -> future."""
+        now = time.monotonic()
+        futures = {}
+        with self._lock:
+            for path in paths:
+                result = self._results.get(path)
+                if result is not None and now - result[1] <= max_age:
+                    continue
+                future = self._pending.get(path)
+                if future is None:
+                    future = self._pool.submit(self._check, path)
+                    self._pending[path] = future
+                futures[path] = future
+        return futures
+
+    def _status(self, path):
+        result = self._results.get(path)
+        if result is None:
+            return STATUS_UNKNOWN
+        return STATUS_AVAILABLE if result[0] else STATUS_MISSING
+
+    def statuses(self, paths, wait_time=0.5):
+        """
+        Return the status of each path without blocking on slow storage.
+
+        Args:
+            paths: Backup file paths
+            wait_time: Seconds to wait for paths never checked before
+
+        Returns:
+            dict: path -> 'available', 'missing' or 'unknown'
+        """
+        paths = list(paths)
+        self._refresh(paths, self.ttl)
+
+        with self._lock:
+            unknown = [self._pending[path] for path in paths
+                       if path not in self._results and path in self._pending]
+        if unknown and wait_time:
+            wait(unknown, timeout=wait_time)
+
+        with self._lock:
+            return {path: self._status(path) for path in paths}
+
+    def check_all(self, paths, max_age=None):
+        """
+        Check paths concurrently and wait for the results.
+
+        Args:
+            paths: Backup file paths
+            max_age: Reuse results younger than this (defaults to the TTL,
+                     0 forces a fresh check)
+
+        Returns:
+            dict: path -> bool (exists)
+        """
+        paths = list(paths)
+        futures = self._refresh(paths, self.ttl if max_age is None else max_age)
+
+        results = {}
+        with self._lock:
+            for path in paths:
+                if path not in futures and path in self._results:
+                    results[path] = self._results[path][0]
+        for path in paths:
+            if path in futures:
+                results[path] = futures[path].result()
+            elif path not in results:
+                # Invalidated while checking the others
+                results[path] = self._check(path)
+        return results
+
+    def record(self, path, exists):
+        """Store a result already known to the caller."""
+        with self._lock:
+            self._results[path] = (exists, time.monotonic())
+
+    def invalidate(self, path=None):
+        """Forget the result for one path, or for all paths."""
+        with self._lock:
+            if path is None:
+                self._results.clear()
+            else:
+                self._results.pop(path, None)
@@ -4,17 +4,123 @@ Handles restoration of files from compressed backups.
 """
 
 import os
+import stat
+import zlib
+import struct
 import zipfile
 import tarfile
 import shutil
+import threading
+import time
+from bisect import bisect_left, bisect_right
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
-from utils import ensure_directory_exists
+from utils import (ensure_directory_exists, copy_file_range, get_archive_name, hash_content_chunk,
+                   combine_content_hashes, CONTENT_HASH_CHUNK_SIZE)
+from catalog_manager import CatalogManager
+from tar_index import TarIndex, open_tar_stream
+from dedup_store import DedupStore, load_manifest, MANIFEST_SUFFIX
+from listing_cache import listing_entry
+
+# Entries per page of list_backup_contents
+DEFAULT_PAGE_SIZE = 500
+
+# zlib releases the GIL while inflating, so ZIP members restore in parallel
+DEFAULT_RESTORE_WORKERS = os.cpu_count() or 1
+
+# Each worker takes this many runs of consecutive members, at least
+_RESTORE_BATCHES_PER_WORKER = 8
+
+# Fixed part of a ZIP local file header; the name and extra field follow
+_ZIP_LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')
+
+# Members are read by offset with os.pread, so threads share one parsed
+# central directory instead of a ZipFile each (where os.pread is missing,
+# e.g. on Windows, every worker still opens its own ZipFile)
+_POSITIONAL_READS = hasattr(os, 'pread')
+
+# Compressed bytes read (and uncompressed bytes written) per step
+_ZIP_READ_SIZE = 1024 * 1024
+
+# What restore_files does with existing files: keep them, rewrite them, or
+# rewrite only those that differ from the backup
+RESTORE_MODES = ('skip', 'overwrite', 'delta')
+
+def _hash_file_piece(path, offset):
+    """Digest of the content hash piece of a file starting at offset."""
+    with open(path, 'rb', buffering=0) as f:
+        f.seek(offset)
+        return hash_content_chunk(f.read(CONTENT_HASH_CHUNK_SIZE))
+
+def _crc32_file(path):
+    """CRC-32 of a whole file."""
+    crc = 0
+    with open(path, 'rb', buffering=0) as f:
+        for block in iter(lambda: f.read(CONTENT_HASH_CHUNK_SIZE), b''):
+            crc = zlib.crc32(block, crc)
+    return crc
+
+def _destination_of(destination_path, file_name, preserve_structure):
+    """Path a member is restored to."""
+    if preserve_structure:
+        return os.path.join(destination_path, file_name)
+    return os.path.join(destination_path, os.path.basename(file_name))
+
+def _create_directories(directories, created):
+    """
+    Create directories and their missing parents, each with a single mkdir.
+    
+    Directories already in the created set are skipped and new ones are
+    added to it. A directory that cannot be created is left out (with
+    everything below it); restoring the files inside then fails with the
+    reason.
+    """
+    pending = set()
+    for directory in directories:
+        while directory not in created and directory not in pending:
+            pending.add(directory)
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                break
+            directory = parent
+    
+    # Sorted, every directory comes after its parents
+    for directory in sorted(pending):
+        parent = os.path.dirname(directory)
+        if parent != directory and parent not in created:
+            continue
+        try:
+            os.mkdir(directory)
+        except FileExistsError:
+            if not os.path.isdir(directory):
+                continue
+        except OSError:
+            continue
+        created.add(directory)
+
+def _created_directories(destination_path):
+    """Created-directories set for a restore, starting with its existing destination."""
+    return {os.path.dirname(os.path.join(destination_path, ''))}
+
+def _after_directory(directory):
+    """Smallest name sorting after every member below directory ('a/b/' -> 'a/b0')."""
+    return directory[:-1] + chr(ord('/') + 1)
 
 class RestoreManager:
-    def __init__(self):
-        pass
+    def __init__(self, catalog_manager=None, restore_workers=DEFAULT_RESTORE_WORKERS, verify_crc=True):
+        self._catalog_manager = catalog_manager
+        self.restore_workers = restore_workers
+        # Check the CRC of stored ZIP members copied without decompression
+        self.verify_crc = verify_crc
+    
+    @property
+    def catalog_manager(self):
+        """Catalog used to resolve backup names (created on first use)."""
+        if self._catalog_manager is None:
+            self._catalog_manager = CatalogManager()
+        return self._catalog_manager
     
     def get_backup_contents(self, backup_path):
         """
@@ -29,17 +135,110 @@ class RestoreManager:
         if not os.path.exists(backup_path):
             raise Exception(f"Backup file not found: {backup_path}")
         
+        # Listings are cached per archive version; only the first call scans
+        listing_cache = self.catalog_manager.listing_cache
+        contents = listing_cache.get(backup_path)
+        if contents is not None:
+            return contents
+        
         try:
             if backup_path.endswith('.zip'):
-                return self._get_zip_contents(backup_path)
+                contents = self._get_zip_contents(backup_path)
             elif backup_path.endswith('.tar.gz'):
-                return self._get_tar_contents(backup_path)
+                contents = self._get_tar_contents(backup_path)
+            elif backup_path.endswith(MANIFEST_SUFFIX):
+                contents = self._get_dedup_contents(backup_path)
             else:
                 raise Exception(f"Unsupported backup format: {backup_path}")
+            
+            try:
+                listing_cache.put(backup_path, contents)
+            except OSError:
+                pass
+            return contents
                 
         except Exception as e:
             raise Exception(f"Failed to read backup contents: {str(e)}")
     
+    def _get_listing_index(self, backup_path):
+        """Sorted (names, entries) member index of a backup, scanning it once if needed."""
+        index = self.catalog_manager.listing_cache.get_index(backup_path)
+        if index is None:
+            contents = self.get_backup_contents(backup_path)
+            index = self.catalog_manager.listing_cache.get_index(backup_path)
+            if index is None:
+                # Listing could not be cached
+                entries = [(item['name'], item['size'], item['compressed_size'], item['modified'].timestamp())
+                           for item in contents]
+                index = ([entry[0] for entry in entries], entries)
+        return index
+    
+    def list_backup_contents(self, backup_path, prefix='', cursor=None, limit=DEFAULT_PAGE_SIZE,
+                             recursive=False):
+        """
+        Get one page of the contents of a backup file, in name order.
+        
+        Unless recursive, members inside a subdirectory of the prefix are
+        folded into one directory entry, so a tree can be expanded a level
+        at a time; skipping a directory costs a binary search, not a scan.
+        
+        Args:
+            backup_path: Path to the backup file
+            prefix: Only list members whose name starts with this (usually a
+                    directory such as 'docs/')
+            cursor: 'next_cursor' returned with the previous page
+            limit: Maximum number of entries on the page
+            recursive: List every file below the prefix instead of one level
+            
+        Returns:
+            dict: 'entries' - files as in get_backup_contents plus
+                  'type': 'file', directories with 'type': 'directory',
+                  'name', 'path' and 'file_count'; and 'next_cursor',
+                  None on the last page
+        """
+        if not os.path.exists(backup_path):
+            raise Exception(f"Backup file not found: {backup_path}")
+        
+        names, entries = self._get_listing_index(backup_path)
+        limit = max(1, int(limit))
+        
+        start = bisect_left(names, prefix)
+        if cursor:
+            # A directory cursor continues after everything below it
+            after = bisect_left(names, _after_directory(cursor)) if cursor.endswith('/') else bisect_right(names, cursor)
+            start = max(start, after)
+        
+        page = []
+        index = start
+        while index < len(names) and len(page) < limit:
+            name = names[index]
+            if not name.startswith(prefix):
+                break
+            
+            slash = -1 if recursive else name.find('/', len(prefix))
+            if slash >= 0:
+                directory = name[:slash + 1]
+                end = bisect_left(names, _after_directory(directory), index)
+                page.append({
+                    'type': 'directory',
+                    'name': directory,
+                    'path': directory,
+                    'file_count': end - index
+                })
+                index = end
+            else:
+                name, size, compressed_size, modified = entries[index]
+                entry = listing_entry(name, size, compressed_size, datetime.fromtimestamp(modified))
+                entry['type'] = 'file'
+                page.append(entry)
+                index += 1
+        
+        more = index < len(names) and names[index].startswith(prefix)
+        return {
+            'entries': page,
+            'next_cursor': page[-1]['path'] if more else None
+        }
+    
     def _get_zip_contents(self, backup_path):
         """Get contents of ZIP backup."""
         contents = []
@@ -61,6 +260,19 @@ class RestoreManager:
         """Get contents of TAR.GZ backup."""
         contents = []
         
+        # The sidecar index lists every file without decompressing anything
+        index = TarIndex.load(backup_path)
+        if index is not None:
+            for entry in index.entries:
+                contents.append({
+                    'name': entry.name,
+                    'size': entry.size,
+                    'compressed_size': entry.size,
+                    'modified': datetime.fromtimestamp(entry.mtime),
+                    'path': entry.name
+                })
+            return sorted(contents, key=lambda x: x['name'])
+        
         with tarfile.open(backup_path, 'r:gz') as tarf:
             for member in tarf.getmembers():
                 if member.isfile():  # Skip directories
@@ -74,8 +286,23 @@ class RestoreManager:
         
         return sorted(contents, key=lambda x: x['name'])
     
+    def _get_dedup_contents(self, backup_path):
+        """Get contents of a deduplicated backup from its manifest."""
+        contents = []
+        
+        for entry in load_manifest(backup_path)['files']:
+            contents.append({
+                'name': entry['name'],
+                'size': entry['size'],
+                'compressed_size': entry['size'],  # Chunks are shared between backups
+                'modified': datetime.fromtimestamp(entry['mtime_ns'] / 1e9),
+                'path': entry['name']
+            })
+        
+        return sorted(contents, key=lambda x: x['name'])
+    
     def restore_files(self, backup_path, file_names, destination_path, 
-                     preserve_structure=True, overwrite_existing=False):
+                     preserve_structure=True, overwrite_existing=False, mode=None):
         """
         Restore specific files from backup.
         
@@ -85,10 +312,19 @@ class RestoreManager:
             destination_path: Destination directory for restored files
             preserve_structure: Whether to preserve directory structure
             overwrite_existing: Whether to overwrite existing files
+            mode: 'skip' or 'overwrite' existing files (defaults to the
+                  overwrite_existing choice), or 'delta' to rewrite only the
+                  files that differ from the backup
             
         Returns:
-            dict: Results of restore operation
+            dict: Results of restore operation; in delta mode also the
+                  'unchanged' files and the 'bytes_avoided' by not rewriting them
         """
+        if mode is None:
+            mode = 'overwrite' if overwrite_existing else 'skip'
+        if mode not in RESTORE_MODES:
+            raise Exception(f"Unsupported restore mode: {mode}")
+        
         if not os.path.exists(backup_path):
             raise Exception(f"Backup file not found: {backup_path}")
         
@@ -96,62 +332,160 @@ class RestoreManager:
             raise Exception(f"Destination path not found: {destination_path}")
         
         try:
-            if backup_path.endswith('.zip'):
-                return self._restore_from_zip(backup_path, file_names, destination_path, 
-                                            preserve_structure, overwrite_existing)
-            elif backup_path.endswith('.tar.gz'):
-                return self._restore_from_tar(backup_path, file_names, destination_path, 
-                                            preserve_structure, overwrite_existing)
-            else:
-                raise Exception(f"Unsupported backup format: {backup_path}")
+            if mode == 'delta':
+                return self._restore_delta(backup_path, file_names, destination_path, preserve_structure)
+            return self._restore_archive(backup_path, file_names, destination_path, 
+                                         preserve_structure, mode == 'overwrite')
                 
         except Exception as e:
             raise Exception(f"Restore failed: {str(e)}")
     
+    def _restore_archive(self, backup_path, file_names, destination_path, 
+                         preserve_structure, overwrite_existing):
+        """Restore files with the reader of the backup's format."""
+        if backup_path.endswith('.zip'):
+            return self._restore_from_zip(backup_path, file_names, destination_path, 
+                                          preserve_structure, overwrite_existing)
+        elif backup_path.endswith('.tar.gz'):
+            return self._restore_from_tar(backup_path, file_names, destination_path, 
+                                          preserve_structure, overwrite_existing)
+        elif backup_path.endswith(MANIFEST_SUFFIX):
+            return self._restore_from_dedup(backup_path, file_names, destination_path, 
+                                            preserve_structure, overwrite_existing)
+        else:
+            raise Exception(f"Unsupported backup format: {backup_path}")
+    
+    def _restore_delta(self, backup_path, file_names, destination_path, preserve_structure):
+        """
+        Restore only the files whose destination copy differs from the backup.
+        
+        A destination file with the recorded size and modification time is
+        taken as unchanged without reading it. One with the recorded size
+        but another time is hashed and compared with the recorded content
+        hash (or ZIP CRC-32); without either it is restored. Restored and
+        matching files get the recorded modification time, so the next
+        delta restore of the same tree reads nothing.
+        """
+        expected = self._expected_members(backup_path)
+        destinations = {}  # destination path -> member
+        to_restore = []
+        to_check = []      # (member, destination path, size)
+        unchanged = []
+        
+        for file_name in (dict.fromkeys(file_names) if file_names else expected):
+            if file_name not in expected:
+                # Reported as missing by the format's restore
+                to_restore.append(file_name)
+                continue
+            
+            if preserve_structure:
+                dest_file_path = os.path.join(destination_path, file_name)
+            else:
+                dest_file_path = os.path.join(destination_path, os.path.basename(file_name))
+            destinations[dest_file_path] = file_name
+            size, content_hash, crc, mtime_ns = expected[file_name]
+            
+            try:
+                st = os.stat(dest_file_path)
+            except OSError:
+                to_restore.append(file_name)
+                continue
+            
+            if not stat.S_ISREG(st.st_mode) or st.st_size != size:
+                to_restore.append(file_name)
+            elif mtime_ns is not None and st.st_mtime_ns == mtime_ns:
+                unchanged.append(dest_file_path)
+            elif content_hash is not None or crc is not None:
+                to_check.append((file_name, dest_file_path, size))
+            else:
+                to_restore.append(file_name)
+        
+        actuals = self._check_contents([(dest_file_path, size, expected[file_name][1] is not None)
+                                        for file_name, dest_file_path, size in to_check])
+        for (file_name, dest_file_path, size), actual in zip(to_check, actuals):
+            size, content_hash, crc, mtime_ns = expected[file_name]
+            if actual == (content_hash if content_hash is not None else crc):
+                unchanged.append(dest_file_path)
+                self._set_mtime(dest_file_path, mtime_ns)
+            else:
+                to_restore.append(file_name)
+        
+        if to_restore:
+            results = self._restore_archive(backup_path, to_restore, destination_path, 
+                                            preserve_structure, True)
+        else:
+            results = {'restored': [], 'skipped': [], 'errors': [], 'total_restored': 0}
+        
+        for dest_file_path in results['restored']:
+            if dest_file_path in destinations:
+                self._set_mtime(dest_file_path, expected[destinations[dest_file_path]][3])
+        
+        results['unchanged'] = unchanged
+        results['bytes_avoided'] = sum(expected[destinations[path]][0] for path in unchanged)
+        return results
+    
+    def _set_mtime(self, path, mtime_ns):
+        """Give a restored file the modification time recorded in the backup."""
+        if mtime_ns is None:
+            return
+        try:
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+        except OSError:
+            pass  # Only speeds up the next delta restore
+    
     def _restore_from_zip(self, backup_path, file_names, destination_path, 
                          preserve_structure, overwrite_existing):
-        """Restore files from ZIP backup."""
+        """Restore files from ZIP backup, using restore_workers threads."""
         restored_files = []
         skipped_files = []
         errors = []
         
         with zipfile.ZipFile(backup_path, 'r') as zipf:
+            # Resolve names through one name -> ZipInfo map built up front
+            members = {info.filename: info for info in zipf.infolist() if not info.is_dir()}
+            
             # Get list of files to restore
             if not file_names:  # Restore all files
-                files_to_restore = [info.filename for info in zipf.infolist() if not info.is_dir()]
+                files_to_restore = list(members.values())
             else:
-                files_to_restore = file_names
-            
-            for file_name in files_to_restore:
-                try:
+                files_to_restore = []
+                for file_name in dict.fromkeys(file_names):
                     # Check if file exists in backup
-                    if file_name not in zipf.namelist():
+                    if file_name not in members:
                         errors.append(f"File not found in backup: {file_name}")
-                        continue
-                    
-                    # Determine destination file path
-                    if preserve_structure:
-                        dest_file_path = os.path.join(destination_path, file_name)
                     else:
-                        dest_file_path = os.path.join(destination_path, os.path.basename(file_name))
-                    
-                    # Check if file already exists
-                    if os.path.exists(dest_file_path) and not overwrite_existing:
-                        skipped_files.append(f"File already exists: {dest_file_path}")
-                        continue
-                    
-                    # Ensure destination directory exists
-                    dest_dir = os.path.dirname(dest_file_path)
-                    ensure_directory_exists(dest_dir)
-                    
-                    # Extract file
-                    with zipf.open(file_name) as source, open(dest_file_path, 'wb') as target:
-                        shutil.copyfileobj(source, target)
-                    
-                    restored_files.append(dest_file_path)
-                    
-                except Exception as e:
-                    errors.append(f"Error restoring {file_name}: {str(e)}")
+                        files_to_restore.append(members[file_name])
+            
+            # Extract in archive order so the file is read sequentially
+            files_to_restore.sort(key=lambda info: info.header_offset)
+            
+            if preserve_structure:
+                destinations = [os.path.join(destination_path, info.filename) for info in files_to_restore]
+            else:
+                destinations = [os.path.join(destination_path, os.path.basename(info.filename))
+                                for info in files_to_restore]
+            selection = list(zip(files_to_restore, destinations))
+            
+            # Create every destination directory once, before extracting
+            _create_directories((os.path.dirname(path) for path in destinations),
+                                _created_directories(destination_path))
+            
+            # Flattened selections may map several members to one path; keep
+            # those sequential so the first one wins as before
+            workers = max(1, int(self.restore_workers))
+            if workers > 1 and len(selection) > 1 and len(set(destinations)) == len(destinations):
+                outcomes = self._restore_zip_parallel(backup_path, selection, workers, overwrite_existing)
+            else:
+                outcomes = [self._restore_zip_member(zipf, info, dest_file_path, overwrite_existing)
+                            for info, dest_file_path in selection]
+        
+        for kind, message in outcomes:
+            if kind == 'restored':
+                restored_files.append(message)
+            elif kind == 'skipped':
+                skipped_files.append(message)
+            else:
+                errors.append(message)
         
         return {
             'restored': restored_files,
@@ -160,63 +494,313 @@ class RestoreManager:
             'total_restored': len(restored_files)
         }
     
+    def _reads_by_offset(self, info):
+        """Whether a member can be extracted with positional reads instead of ZipFile.open."""
+        return (_POSITIONAL_READS and not info.flag_bits & 0x1 and
+                info.compress_type in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED))
+    
+    def _restore_zip_member(self, zipf, info, dest_file_path, overwrite_existing, fd=None):
+        """
+        Extract one ZIP member; returns ('restored' | 'skipped' | 'error', path or message).
+        
+        Stored and deflated members are read with os.pread from fd (by
+        default zipf's descriptor), others through zipf; zipf may be None
+        if every member is read by offset.
+        """
+        try:
+            # Check if file already exists
+            if os.path.exists(dest_file_path) and not overwrite_existing:
+                return 'skipped', f"File already exists: {dest_file_path}"
+            
+            # Extract file (the directories were created up front)
+            if self._reads_by_offset(info):
+                if fd is None:
+                    fd = zipf.fp.fileno()
+                if info.compress_type == zipfile.ZIP_STORED:
+                    self._copy_stored_member(fd, info, dest_file_path)
+                else:
+                    self._inflate_member(fd, info, dest_file_path)
+            else:
+                with zipf.open(info) as source, open(dest_file_path, 'wb') as target:
+                    shutil.copyfileobj(source, target)
+            
+            return 'restored', dest_file_path
+            
+        except Exception as e:
+            return 'error', f"Error restoring {info.filename}: {str(e)}"
+    
+    def _member_data_offset(self, fd, info):
+        """Offset of a ZIP member's data, read from its local header."""
+        header = os.pread(fd, _ZIP_LOCAL_HEADER.size, info.header_offset)
+        if len(header) != _ZIP_LOCAL_HEADER.size or header[:4] != b'PK\x03\x04':
+            raise Exception(f"Bad local header for {info.filename}")
+        
+        # The data follows the local header, whose extra field may differ
+        # from the central directory's
+        name_length, extra_length = _ZIP_LOCAL_HEADER.unpack(header)[-2:]
+        return info.header_offset + _ZIP_LOCAL_HEADER.size + name_length + extra_length
+    
+    def _copy_stored_member(self, fd, info, dest_file_path):
+        """Copy an uncompressed ZIP member's bytes straight from the archive (kernel-side where possible)."""
+        data_offset = self._member_data_offset(fd, info)
+        
+        with open(dest_file_path, 'wb') as target:
+            copy_file_range(fd, target.fileno(), data_offset, info.file_size)
+        
+        if self.verify_crc:
+            crc = 0
+            with open(dest_file_path, 'rb') as restored:
+                for block in iter(lambda: restored.read(1024 * 1024), b''):
+                    crc = zlib.crc32(block, crc)
+            if crc != info.CRC:
+                raise Exception(f"Bad CRC-32 for file {info.filename!r}")
+    
+    def _inflate_member(self, fd, info, dest_file_path):
+        """Decompress a deflated ZIP member read with os.pread, checking its CRC-32 like ZipFile."""
+        offset = self._member_data_offset(fd, info)
+        remaining = info.compress_size
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        crc = 0
+        size = 0
+        
+        with open(dest_file_path, 'wb') as target:
+            while remaining:
+                block = os.pread(fd, min(remaining, _ZIP_READ_SIZE), offset)
+                if not block:
+                    raise Exception(f"Truncated ZIP member: {info.filename}")
+                offset += len(block)
+                remaining -= len(block)
+                
+                # Bound the output of each step so highly compressed data
+                # is not inflated in one piece
+                while block:
+                    data = decompressor.decompress(block, _ZIP_READ_SIZE)
+                    block = decompressor.unconsumed_tail
+                    target.write(data)
+                    crc = zlib.crc32(data, crc)
+                    size += len(data)
+            
+            data = decompressor.flush()
+            target.write(data)
+            crc = zlib.crc32(data, crc)
+            size += len(data)
+        
+        if size != info.file_size or crc != info.CRC:
+            raise Exception(f"Bad CRC-32 for file {info.filename!r}")
+    
+    def _restore_zip_parallel(self, backup_path, members, workers, overwrite_existing):
+        """
+        Extract ZIP members on a pool of worker threads.
+        
+        The members come from the central directory parsed once by the
+        caller; each worker only opens a plain file descriptor and reads
+        local headers and data with os.pread. If some member can't be read
+        that way (no os.pread, encryption, other methods) every worker opens
+        its own ZipFile instead. Workers take runs of consecutive members,
+        so each still reads mostly forward. Outcomes are returned in archive
+        order.
+        """
+        by_offset = all(self._reads_by_offset(info) for info, dest_file_path in members)
+        batch_size = max(1, -(-len(members) // (workers * _RESTORE_BATCHES_PER_WORKER)))
+        batches = [members[start:start + batch_size] for start in range(0, len(members), batch_size)]
+        workers = min(workers, len(batches))
+        outcomes = [None] * len(batches)
+        pending = iter(range(len(batches)))
+        lock = threading.Lock()
+        
+        def work():
+            if by_offset:
+                handle, fd = None, os.open(backup_path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+            else:
+                handle, fd = zipfile.ZipFile(backup_path, 'r'), None
+            try:
+                while True:
+                    with lock:
+                        index = next(pending, None)
+                    if index is None:
+                        return
+                    outcomes[index] = [self._restore_zip_member(handle, info, dest_file_path, overwrite_existing, fd)
+                                       for info, dest_file_path in batches[index]]
+            finally:
+                if handle is not None:
+                    handle.close()
+                else:
+                    os.close(fd)
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='restore') as pool:
+            futures = [pool.submit(work) for worker in range(workers)]
+            for future in futures:
+                future.result()
+        
+        return [outcome for batch in outcomes for outcome in batch]
+    
     def _restore_from_tar(self, backup_path, file_names, destination_path, 
                          preserve_structure, overwrite_existing):
         """Restore files from TAR.GZ backup."""
         restored_files = []
         skipped_files = []
         errors = []
+        results = (restored_files, skipped_files, errors)
+        created_dirs = _created_directories(destination_path)
         
-        with tarfile.open(backup_path, 'r:gz') as tarf:
-            # Get list of files to restore
-            if not file_names:  # Restore all files
-                files_to_restore = [member.name for member in tarf.getmembers() if member.isfile()]
+        index = TarIndex.load(backup_path)
+        if index is not None:
+            # Seek straight to the gzip members holding the requested files
+            files_to_restore = file_names or [entry.name for entry in index.entries]
+            for file_name in files_to_restore:
+                if file_name not in index:
+                    errors.append(f"File not found in backup: {file_name}")
+            
+            # Create every destination directory once, before extracting
+            _create_directories((os.path.dirname(_destination_of(destination_path, file_name, preserve_structure))
+                                 for file_name in files_to_restore if file_name in index), created_dirs)
+            
+            with open(backup_path, 'rb') as archive:
+                for member, tarf in index.iter_members(archive, files_to_restore):
+                    self._restore_tar_member(tarf, member, destination_path, 
+                                           preserve_structure, overwrite_existing, results, created_dirs)
+        else:
+            # No index: read the archive once, extracting matches as they pass;
+            # directories are created as they first appear
+            remaining = set(file_names) if file_names else None
+            with open(backup_path, 'rb') as archive, open_tar_stream(archive) as tarf:
+                for member in self._iter_tar_stream(tarf, remaining):
+                    self._restore_tar_member(tarf, member, destination_path, 
+                                           preserve_structure, overwrite_existing, results, created_dirs)
+            
+            if remaining:
+                for file_name in dict.fromkeys(file_names):
+                    if file_name in remaining:
+                        errors.append(f"File not found in backup: {file_name}")
+        
+        return {
+            'restored': restored_files,
+            'skipped': skipped_files,
+            'errors': errors,
+            'total_restored': len(restored_files)
+        }
+    
+    def _iter_tar_stream(self, tarf, remaining=None):
+        """
+        Yield the file members of a streamed TAR in archive order.
+        
+        Args:
+            tarf: TAR opened with open_tar_stream; extract each member
+                  before advancing the generator
+            remaining: Set of names to yield (all files if None); found
+                       names are removed and reading stops once it is empty
+        """
+        if remaining is not None and not remaining:
+            return
+        
+        for member in tarf:
+            if not member.isfile():
+                continue
+            if remaining is None:
+                yield member
+            elif member.name in remaining:
+                remaining.discard(member.name)
+                yield member
+                if not remaining:
+                    # Everything found: skip decompressing the rest
+                    return
+    
+    def _restore_tar_member(self, tarf, member, destination_path, 
+                           preserve_structure, overwrite_existing, results, created_dirs):
+        """
+        Extract one TAR member, recording the outcome in (restored, skipped, errors).
+        
+        created_dirs is the restore's set of directories known to exist.
+        """
+        restored_files, skipped_files, errors = results
+        file_name = member.name
+        
+        try:
+            if not member.isfile():
+                return
+            
+            # Determine destination file path
+            if preserve_structure:
+                dest_file_path = os.path.join(destination_path, file_name)
             else:
-                files_to_restore = file_names
+                dest_file_path = os.path.join(destination_path, os.path.basename(file_name))
             
-            for file_name in files_to_restore:
+            # Check if file already exists
+            if os.path.exists(dest_file_path) and not overwrite_existing:
+                skipped_files.append(f"File already exists: {dest_file_path}")
+                return
+            
+            # Ensure destination directory exists
+            _create_directories((os.path.dirname(dest_file_path),), created_dirs)
+            
+            # Extract file
+            extracted_file = tarf.extractfile(member)
+            if extracted_file:
+                with extracted_file as source, open(dest_file_path, 'wb') as target:
+                    shutil.copyfileobj(source, target)
+            
+            # Preserve file permissions
+            try:
+                os.chmod(dest_file_path, member.mode)
+            except:
+                pass  # Ignore permission errors
+            
+            restored_files.append(dest_file_path)
+            
+        except Exception as e:
+            errors.append(f"Error restoring {file_name}: {str(e)}")
+    
+    def _restore_from_dedup(self, backup_path, file_names, destination_path, 
+                           preserve_structure, overwrite_existing):
+        """Restore files from a deduplicated backup by reassembling their chunks."""
+        restored_files = []
+        skipped_files = []
+        errors = []
+        
+        store = DedupStore.for_manifest(backup_path)
+        entries = {entry['name']: entry for entry in load_manifest(backup_path)['files']}
+        
+        # Get list of files to restore
+        files_to_restore = file_names or list(entries)
+        
+        # Create every destination directory once, before extracting
+        _create_directories((os.path.dirname(_destination_of(destination_path, file_name, preserve_structure))
+                             for file_name in files_to_restore if file_name in entries),
+                            _created_directories(destination_path))
+        
+        for file_name in files_to_restore:
+            try:
+                # Check if file exists in backup
+                entry = entries.get(file_name)
+                if entry is None:
+                    errors.append(f"File not found in backup: {file_name}")
+                    continue
+                
+                # Determine destination file path
+                if preserve_structure:
+                    dest_file_path = os.path.join(destination_path, file_name)
+                else:
+                    dest_file_path = os.path.join(destination_path, os.path.basename(file_name))
+                
+                # Check if file already exists
+                if os.path.exists(dest_file_path) and not overwrite_existing:
+                    skipped_files.append(f"File already exists: {dest_file_path}")
+                    continue
+                
+                # Rebuild file from its chunks (the directories were created up front)
+                with open(dest_file_path, 'wb') as target:
+                    store.write_file(entry, target)
+                
+                # Preserve file permissions
                 try:
-                    # Check if file exists in backup
-                    try:
-                        member = tarf.getmember(file_name)
-                    except KeyError:
-                        errors.append(f"File not found in backup: {file_name}")
-                        continue
-                    
-                    if not member.isfile():
-                        continue
-                    
-                    # Determine destination file path
-                    if preserve_structure:
-                        dest_file_path = os.path.join(destination_path, file_name)
-                    else:
-                        dest_file_path = os.path.join(destination_path, os.path.basename(file_name))
-                    
-                    # Check if file already exists
-                    if os.path.exists(dest_file_path) and not overwrite_existing:
-                        skipped_files.append(f"File already exists: {dest_file_path}")
-                        continue
-                    
-                    # Ensure destination directory exists
-                    dest_dir = os.path.dirname(dest_file_path)
-                    ensure_directory_exists(dest_dir)
-                    
-                    # Extract file
-                    extracted_file = tarf.extractfile(member)
-                    if extracted_file:
-                        with extracted_file as source, open(dest_file_path, 'wb') as target:
-                            shutil.copyfileobj(source, target)
-                    
-                    # Preserve file permissions
-                    try:
-                        os.chmod(dest_file_path, member.mode)
-                    except:
-                        pass  # Ignore permission errors
-                    
-                    restored_files.append(dest_file_path)
-                    
-                except Exception as e:
-                    errors.append(f"Error restoring {file_name}: {str(e)}")
+                    os.chmod(dest_file_path, entry['mode'] & 0o7777)
+                except:
+                    pass  # Ignore permission errors
+                
+                restored_files.append(dest_file_path)
+                
+            except Exception as e:
+                errors.append(f"Error restoring {file_name}: {str(e)}")
         
         return {
             'restored': restored_files,
@@ -225,7 +809,7 @@ class RestoreManager:
             'total_restored': len(restored_files)
         }
     
-    def restore_all_files(self, backup_path, destination_path, overwrite_existing=False):
+    def restore_all_files(self, backup_path, destination_path, overwrite_existing=False, mode=None):
         """
         Restore all files from backup to destination.
         
@@ -233,10 +817,66 @@ class RestoreManager:
             backup_path: Path to the backup file
             destination_path: Destination directory
             overwrite_existing: Whether to overwrite existing files
+            mode: Restore mode, as for restore_files
         """
         return self.restore_files(backup_path, [], destination_path, 
                                 preserve_structure=True, 
-                                overwrite_existing=overwrite_existing)
+                                overwrite_existing=overwrite_existing,
+                                mode=mode)
+    
+    def restore_point(self, backup_name, destination_path, overwrite_existing=False, mode=None):
+        """
+        Restore the state of the source folders at the time of a backup.
+        
+        A full backup is restored as is. A differential backup is restored
+        together with its base full backup: every file of the differential,
+        then the files of the base it did not replace or record as deleted.
+        Only these two archives are read.
+        
+        Args:
+            backup_name: Name of a full or differential backup in the catalog
+            destination_path: Destination directory
+            overwrite_existing: Whether to overwrite existing files
+            mode: Restore mode, as for restore_files
+            
+        Returns:
+            dict: Results of restore operation
+        """
+        backup_info = self.catalog_manager.get_backup_info(backup_name)
+        if not backup_info:
+            raise Exception(f"Backup not found in catalog: {backup_name}")
+        
+        if backup_info.get('incremental'):
+            raise Exception(f"Point-in-time restore requires a full or differential backup: {backup_name}")
+        
+        base_name = backup_info.get('base_backup')
+        if not base_name:
+            return self.restore_all_files(backup_info['path'], destination_path, overwrite_existing, mode)
+        
+        base_info = self.catalog_manager.get_backup_info(base_name)
+        if not base_info:
+            raise Exception(f"Base backup not found in catalog: {base_name}")
+        
+        results = self.restore_all_files(backup_info['path'], destination_path, overwrite_existing, mode)
+        
+        replaced = {item['name'] for item in self.get_backup_contents(backup_info['path'])}
+        replaced.update(backup_info.get('deleted_files', []))
+        base_files = [item['name'] for item in self.get_backup_contents(base_info['path'])
+                      if item['name'] not in replaced]
+        
+        if base_files:
+            base_results = self.restore_files(base_info['path'], base_files, destination_path, 
+                                              preserve_structure=True, 
+                                              overwrite_existing=overwrite_existing,
+                                              mode=mode)
+            for key in ('restored', 'skipped', 'errors', 'unchanged'):
+                if key in base_results:
+                    results[key].extend(base_results[key])
+            if 'bytes_avoided' in base_results:
+                results['bytes_avoided'] += base_results['bytes_avoided']
+            results['total_restored'] = len(results['restored'])
+        
+        return results
     
     def extract_single_file(self, backup_path, file_name, destination_path):
         """
@@ -261,12 +901,32 @@ class RestoreManager:
                         shutil.copyfileobj(source, target)
             
             elif backup_path.endswith('.tar.gz'):
-                with tarfile.open(backup_path, 'r:gz') as tarf:
-                    member = tarf.getmember(file_name)
-                    extracted_file = tarf.extractfile(member)
-                    if extracted_file:
-                        with extracted_file as source, open(destination_path, 'wb') as target:
-                            shutil.copyfileobj(source, target)
+                index = TarIndex.load(backup_path)
+                if index is not None:
+                    # Decompress only the gzip member holding the file
+                    if file_name not in index:
+                        raise KeyError(f"filename {file_name!r} not found")
+                    with open(backup_path, 'rb') as archive:
+                        for member, tarf in index.iter_members(archive, [file_name]):
+                            extracted_file = tarf.extractfile(member)
+                            if extracted_file:
+                                with extracted_file as source, open(destination_path, 'wb') as target:
+                                    shutil.copyfileobj(source, target)
+                else:
+                    remaining = {file_name}
+                    with open(backup_path, 'rb') as archive, open_tar_stream(archive) as tarf:
+                        for member in self._iter_tar_stream(tarf, remaining):
+                            with tarf.extractfile(member) as source, open(destination_path, 'wb') as target:
+                                shutil.copyfileobj(source, target)
+                    if remaining:
+                        raise KeyError(f"filename {file_name!r} not found")
+            
+            elif backup_path.endswith(MANIFEST_SUFFIX):
+                entries = {entry['name']: entry for entry in load_manifest(backup_path)['files']}
+                if file_name not in entries:
+                    raise KeyError(f"filename {file_name!r} not found")
+                with open(destination_path, 'wb') as target:
+                    DedupStore.for_manifest(backup_path).write_file(entries[file_name], target)
             
             else:
                 raise Exception(f"Unsupported backup format: {backup_path}")
@@ -274,56 +934,174 @@ class RestoreManager:
         except Exception as e:
             raise Exception(f"Failed to extract file {file_name}: {str(e)}")
     
-    def verify_restore(self, backup_path, restored_files):
+    def verify_restore(self, backup_path, restored_files, destination_path=None, workers=None):
         """
         Verify that restored files match the backup contents.
         
+        Each restored file is matched to its archive member exactly: by its
+        path relative to destination_path when given, otherwise by the
+        longest member name its path ends with. Contents are compared with
+        the content hash recorded when the backup was written; members
+        without one are compared by CRC-32 (ZIP) or size only. Files are
+        hashed in CONTENT_HASH_CHUNK_SIZE pieces on a thread pool.
+        
         Args:
             backup_path: Path to the backup file
             restored_files: List of restored file paths
+            destination_path: Folder the files were restored into
+            workers: Hashing threads (defaults to restore_workers)
             
         Returns:
-            dict: Verification results
+            dict: Verification results - 'verified', 'mismatches' (dicts with
+                  'file', 'member' and the expected and actual size or hash),
+                  'missing', plus 'bytes_verified', 'elapsed' (seconds) and
+                  'throughput' (bytes per second)
         """
         verification_results = {
             'verified': [],
             'mismatches': [],
-            'missing': []
+            'missing': [],
+            'bytes_verified': 0,
+            'elapsed': 0.0,
+            'throughput': 0.0
         }
         
         try:
-            backup_contents = self.get_backup_contents(backup_path)
-            backup_files = {item['name']: item for item in backup_contents}
+            started = time.perf_counter()
+            expected = self._expected_members(backup_path)
             
+            # (restored file, member, size) of the files whose content is read
+            to_check = []
             for restored_file in restored_files:
-                file_name = os.path.basename(restored_file)
-                
-                # Find corresponding backup file
-                backup_file = None
-                for name, info in backup_files.items():
-                    if os.path.basename(name) == file_name:
-                        backup_file = info
-                        break
-                
-                if not backup_file:
+                member = self._match_member(restored_file, expected, destination_path)
+                if member is None or not os.path.isfile(restored_file):
                     verification_results['missing'].append(restored_file)
                     continue
                 
-                # Check file size
-                if os.path.exists(restored_file):
-                    restored_size = os.path.getsize(restored_file)
-                    if restored_size == backup_file['size']:
-                        verification_results['verified'].append(restored_file)
-                    else:
-                        verification_results['mismatches'].append({
-                            'file': restored_file,
-                            'expected_size': backup_file['size'],
-                            'actual_size': restored_size
-                        })
+                expected_size, expected_hash, expected_crc, expected_mtime = expected[member]
+                restored_size = os.path.getsize(restored_file)
+                if restored_size != expected_size:
+                    verification_results['mismatches'].append({
+                        'file': restored_file,
+                        'member': member,
+                        'expected_size': expected_size,
+                        'actual_size': restored_size
+                    })
+                elif expected_hash is not None or expected_crc is not None:
+                    to_check.append((restored_file, member, restored_size))
                 else:
-                    verification_results['missing'].append(restored_file)
+                    verification_results['verified'].append(restored_file)
+            
+            actuals = self._check_contents([(restored_file, size, expected[member][1] is not None)
+                                            for restored_file, member, size in to_check], workers)
+            for (restored_file, member, size), actual in zip(to_check, actuals):
+                if expected[member][1] is not None:
+                    self._record_check(verification_results, restored_file, member, size,
+                                       'expected_hash', expected[member][1], 'actual_hash', actual)
+                else:
+                    self._record_check(verification_results, restored_file, member, size,
+                                       'expected_crc', expected[member][2], 'actual_crc', actual)
+            
+            elapsed = time.perf_counter() - started
+            verification_results['elapsed'] = elapsed
+            if elapsed > 0:
+                verification_results['throughput'] = verification_results['bytes_verified'] / elapsed
             
         except Exception as e:
             raise Exception(f"Verification failed: {str(e)}")
         
         return verification_results
+    
+    def _check_contents(self, files, workers=None):
+        """
+        Content hash or CRC-32 of files, computed on a thread pool.
+        
+        Args:
+            files: (path, size, use_hash) tuples - the content hash is
+                   computed when use_hash is true, the CRC-32 otherwise
+            workers: Threads (defaults to restore_workers)
+        
+        Returns:
+            list: Hex content hash or CRC-32 of each file, in order
+        """
+        workers = max(1, int(self.restore_workers if workers is None else workers))
+        results = []
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='verify') as pool:
+            # Every piece of every file is an independent job
+            pieces = [(path, offset) for path, size, use_hash in files if use_hash
+                      for offset in range(0, max(size, 1), CONTENT_HASH_CHUNK_SIZE)]
+            digests = pool.map(_hash_file_piece, [path for path, offset in pieces],
+                               [offset for path, offset in pieces])
+            crcs = pool.map(_crc32_file, [path for path, size, use_hash in files if not use_hash])
+            
+            for path, size, use_hash in files:
+                if use_hash:
+                    count = max(1, -(-size // CONTENT_HASH_CHUNK_SIZE))
+                    results.append(combine_content_hashes([next(digests) for _ in range(count)]))
+                else:
+                    results.append(next(crcs))
+        return results
+    
+    def _record_check(self, results, restored_file, member, size, expected_key, expected, actual_key, actual):
+        """Add the outcome of a content comparison to verification results."""
+        results['bytes_verified'] += size
+        if actual == expected:
+            results['verified'].append(restored_file)
+        else:
+            results['mismatches'].append({
+                'file': restored_file,
+                'member': member,
+                expected_key: expected,
+                actual_key: actual
+            })
+    
+    def _expected_members(self, backup_path):
+        """
+        Map member name -> (size, content hash, CRC-32, mtime_ns) of a backup.
+        
+        Content hashes and exact modification times come from the catalog
+        or the dedup manifest, CRC-32 values from the ZIP central directory;
+        any of them may be None.
+        """
+        expected = {item['name']: [item['size'], None, None, None]
+                    for item in self.get_backup_contents(backup_path)}
+        
+        if backup_path.endswith(MANIFEST_SUFFIX):
+            for entry in load_manifest(backup_path)['files']:
+                if entry['name'] in expected:
+                    expected[entry['name']][1] = entry.get('hash')
+                    expected[entry['name']][3] = entry.get('mtime_ns')
+        
+        backup_info = self.catalog_manager.get_backup_info_by_path(backup_path)
+        if backup_info:
+            source_folders = backup_info.get('source_folders', [])
+            for file_info in backup_info.get('files', []):
+                name = get_archive_name(file_info['name'], source_folders)
+                if name not in expected:
+                    continue
+                if file_info.get('hash'):
+                    expected[name][1] = file_info['hash']
+                if file_info.get('mtime_ns') is not None:
+                    expected[name][3] = file_info['mtime_ns']
+        
+        if backup_path.endswith('.zip') and any(values[1] is None for values in expected.values()):
+            with zipfile.ZipFile(backup_path, 'r') as zipf:
+                for info in zipf.infolist():
+                    if info.filename in expected:
+                        expected[info.filename][2] = info.CRC
+        
+        return {name: tuple(values) for name, values in expected.items()}
+    
+    def _match_member(self, restored_file, expected, destination_path):
+        """Archive member a restored file was extracted from, or None."""
+        if destination_path is not None:
+            relative = os.path.relpath(restored_file, destination_path).replace(os.sep, '/')
+            return relative if relative in expected else None
+        
+        # Without the destination, the longest member name the path ends with
+        parts = os.path.abspath(restored_file).replace(os.sep, '/').split('/')
+        for start in range(1, len(parts)):
+            candidate = '/'.join(parts[start:])
+            if candidate in expected:
+                return candidate
+        return None
@@ -0,0 +1,188 @@
+"""
+TAR.GZ Index for Desktop Backup Application
+Sidecar index that makes tar.gz backups seekable by member name.
+"""
+
+import os
+import json
+import gzip
+import tarfile
+from collections import namedtuple
+
+from utils import replace_file_durably
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = '.index'
+
+# Start a new gzip member once the current one holds this much tar data
+DEFAULT_MEMBER_SIZE = 4 * 1024 * 1024
+
+IndexEntry = namedtuple('IndexEntry', ['name', 'member', 'header_offset', 'size', 'mtime'])
+
+
+def index_path_for(archive_path):
+    """Path of the sidecar index belonging to an archive."""
+    return f"{archive_path}{INDEX_SUFFIX}"
+
+
+def open_tar_stream(fileobj):
+    """
+    Open a tar.gz for a single forward pass over all of its gzip members.
+
+    tarfile's own 'r|gz' mode stops at the end of the first gzip member, so
+    on archives written as several members it silently sees only the first
+    files. GzipFile reads across member boundaries.
+
+    Args:
+        fileobj: Archive opened in binary mode
+
+    Returns:
+        tarfile.TarFile: Stream-mode tar reader (extract each member before
+                         advancing)
+    """
+    return tarfile.open(fileobj=gzip.GzipFile(fileobj=fileobj, mode='rb'), mode='r|')
+
+
+class TarIndex:
+    """
+    Offsets of every file inside a tar.gz written as independent gzip members.
+
+    ``members`` holds (compressed_offset, uncompressed_offset) for each gzip
+    member; each entry records which member its tar header falls in and the
+    header's offset in the uncompressed tar stream. A reader can seek to the
+    member's compressed offset and decompress only from there, while plain
+    gzip/tar readers still see one ordinary (multi-member) tar.gz.
+    """
+
+    def __init__(self, members, entries, archive_size=None):
+        self.members = members
+        self.entries = entries
+        self.archive_size = archive_size
+        self._by_name = {entry.name: entry for entry in entries}
+
+    def __contains__(self, name):
+        return name in self._by_name
+
+    def get(self, name):
+        """Return the IndexEntry for a member name, or None."""
+        return self._by_name.get(name)
+
+    def save(self, archive_path):
+        """Write the index next to the archive (atomically and durably)."""
+        data = {
+            'version': INDEX_VERSION,
+            'archive_size': os.path.getsize(archive_path),
+            'members': self.members,
+            'entries': [list(entry) for entry in self.entries]
+        }
+
+        index_path = index_path_for(archive_path)
+        temp_path = f"{index_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        replace_file_durably(temp_path, index_path)
+
+    @classmethod
+    def load(cls, archive_path):
+        """
+        Load the sidecar index of an archive.
+
+        Returns:
+            TarIndex: The index, or None if missing or not matching the archive
+        """
+        index_path = index_path_for(archive_path)
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # An index only describes the exact archive it was written with
+        if data.get('version') != INDEX_VERSION:
+            return None
+        if data.get('archive_size') != os.path.getsize(archive_path):
+            return None
+
+        members = [tuple(member) for member in data['members']]
+        entries = [IndexEntry(*entry) for entry in data['entries']]
+        return cls(members, entries, data['archive_size'])
+
+    def iter_members(self, fileobj, names):
+        """
+        Yield the requested members, seeking over gzip members not needed.
+
+        Members are visited in archive order. Consecutive requests inside the
+        same region are streamed; a jump to a later gzip member seeks there
+        directly instead of decompressing everything in between. Entries not
+        found where the index places them (name mismatch, stream ending
+        early) are looked up afterwards by a full pass over the archive.
+
+        Args:
+            fileobj: Archive opened in binary mode (must be seekable)
+            names: Iterable of member names
+
+        Yields:
+            tuple: (tarinfo, tarfile) - extract with tarfile.extractfile(tarinfo)
+                   before advancing the generator
+
+        Raises:
+            Exception: If an indexed member is not in the archive at all
+        """
+        wanted = sorted((self._by_name[name] for name in set(names) if name in self._by_name),
+                        key=lambda entry: entry.header_offset)
+
+        missed = []
+        tarf = None
+        base = 0
+        for position, entry in enumerate(wanted):
+            member_offset, member_start = self.members[entry.member]
+
+            try:
+                # Reopen at the entry's gzip member if the current stream is not
+                # already positioned before it within reach
+                if tarf is None or base + tarf.offset > entry.header_offset or member_start > base + tarf.offset:
+                    fileobj.seek(member_offset)
+                    gz = gzip.GzipFile(fileobj=fileobj, mode='rb')
+                    skip = entry.header_offset - member_start
+                    while skip > 0:
+                        skipped = len(gz.read(min(skip, 1024 * 1024)))
+                        if not skipped:
+                            raise EOFError('archive ends before the indexed offset')
+                        skip -= skipped
+                    tarf = tarfile.open(fileobj=gz, mode='r|')
+                    base = entry.header_offset
+
+                while True:
+                    tarinfo = tarf.next()
+                    if tarinfo is None:
+                        raise EOFError('archive ends before the indexed offset')
+                    if base + tarinfo.offset >= entry.header_offset:
+                        break
+            except (EOFError, tarfile.ReadError):
+                # The rest of the index can't be trusted either
+                missed.extend(wanted[position:])
+                break
+
+            if base + tarinfo.offset == entry.header_offset and tarinfo.name == entry.name:
+                yield tarinfo, tarf
+            else:
+                missed.append(entry)
+
+        if missed:
+            yield from self._scan_members(fileobj, {entry.name for entry in missed})
+
+    def _scan_members(self, fileobj, names):
+        """Yield the named members found by one pass over the whole archive."""
+        remaining = set(names)
+        fileobj.seek(0)
+        with open_tar_stream(fileobj) as tarf:
+            for tarinfo in tarf:
+                if tarinfo.name in remaining:
+                    remaining.discard(tarinfo.name)
+                    yield tarinfo, tarf
+                    if not remaining:
+                        return
+
+        if remaining:
+            raise Exception(f"{len(remaining)} indexed member(s) missing from the archive, "
+                            f"e.g. {sorted(remaining)[0]}")
@@ -0,0 +1,164 @@
+"""
+Testes de criação e consolidação de backups
+"""
+import os
+import tarfile
+import time
+import zipfile
+
+import pytest
+
+import backup_manager
+from backup_manager import BackupManager
+from file_scanner import FileRecord
+from restore_manager import RestoreManager
+from tar_index import index_path_for
+
+
+def test_synthesize_tar_without_base_index(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    # Membros gzip pequenos para que poucos arquivos ocupem vários membros
+    monkeypatch.setattr(backup_manager, 'DEFAULT_MEMBER_SIZE', 16 * 1024)
+
+    source = tmp_path / 'origem'
+    source.mkdir()
+    for number in range(40):
+        (source / f'arquivo{number}.bin').write_bytes(os.urandom(4096))
+
+    destination = tmp_path / 'backups'
+    destination.mkdir()
+    manager = BackupManager()
+    base = manager.create_backup([str(source)], str(destination), 'tar.gz', backup_title='base')
+    os.remove(index_path_for(manager.catalog_manager.get_backup_info(base)['path']))
+
+    (source / 'novo.bin').write_bytes(os.urandom(4096))
+    incremental = manager.create_backup([str(source)], str(destination), 'tar.gz',
+                                        backup_title='inc', incremental=True)
+
+    name = manager.synthesize_full(base, [incremental])
+    info = manager.catalog_manager.get_backup_info(name)
+
+    with tarfile.open(info['path'], 'r:gz') as tarf:
+        members = [member.name for member in tarf.getmembers() if member.isfile()]
+    assert len(members) == 41
+    assert info['file_count'] == 41
+    assert len(info['files']) == 41
+
+
+def test_tar_headers_from_scan(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    source = tmp_path / 'origem'
+    source.mkdir()
+    script = source / 'script.sh'
+    script.write_bytes(os.urandom(3000))
+    script.chmod(0o750)
+    os.utime(script, ns=(1_700_000_000_000_000_000, 1_700_000_000_000_000_000))
+
+    destination = tmp_path / 'backups'
+    destination.mkdir()
+    manager = BackupManager()
+    name = manager.create_backup([str(source)], str(destination), 'tar.gz', backup_title='teste')
+
+    with tarfile.open(manager.catalog_manager.get_backup_info(name)['path'], 'r:gz') as tarf:
+        member = tarf.getmember('origem/script.sh')
+        assert member.isreg()
+        assert member.size == 3000
+        assert member.mode == 0o750
+        assert member.mtime == 1_700_000_000
+        assert tarf.extractfile(member).read() == script.read_bytes()
+
+
+def test_dedup_backup_detects_rewrite_with_preserved_mtime(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    source = tmp_path / 'origem'
+    source.mkdir()
+    document = source / 'documento.bin'
+    document.write_bytes(b'a' * 5000)
+    original = os.stat(document)
+
+    destination = tmp_path / 'backups'
+    destination.mkdir()
+    manager = BackupManager()
+    manager.create_backup([str(source)], str(destination), 'dedup', backup_title='base')
+
+    # Mesmo tamanho e mesmo mtime, conteúdo diferente (ctime muda)
+    time.sleep(0.05)
+    document.write_bytes(b'b' * 5000)
+    os.utime(document, ns=(original.st_atime_ns, original.st_mtime_ns))
+
+    name = manager.create_backup([str(source)], str(destination), 'dedup', backup_title='inc', incremental=True)
+
+    target = tmp_path / 'restaurado'
+    target.mkdir()
+    restore = RestoreManager(manager.catalog_manager)
+    results = restore.restore_all_files(manager.catalog_manager.get_backup_info(name)['path'], str(target))
+    assert results['errors'] == []
+    assert (target / 'origem' / 'documento.bin').read_bytes() == b'b' * 5000
+
+
+def test_tar_stays_readable_when_file_shrinks(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    source = tmp_path / 'origem'
+    source.mkdir()
+    records = []
+    for name in ('a.bin', 'encolheu.bin', 'c.bin'):
+        path = source / name
+        path.write_bytes(os.urandom(5000))
+        st = os.stat(path)
+        records.append(FileRecord(str(path), st.st_size, st.st_mtime_ns, st.st_mode, st.st_ino, st.st_ctime_ns))
+    # O arquivo diminuiu entre a varredura e a leitura
+    (source / 'encolheu.bin').write_bytes(b'x' * 100)
+
+    manager = BackupManager()
+    backup_path = str(tmp_path / 'teste.tar.gz')
+    assert manager._create_tar_backup(backup_path, records, [str(source)], None, None)
+
+    assert [record.path for record in manager.skipped_files] == [records[1].path]
+    assert [entry['name'] for entry in manager._listing] == ['origem/a.bin', 'origem/c.bin']
+    with tarfile.open(backup_path, 'r:gz') as tarf:
+        assert tarf.getnames() == ['origem/a.bin', 'origem/encolheu.bin', 'origem/c.bin']
+        assert tarf.extractfile('origem/c.bin').read() == (source / 'c.bin').read_bytes()
+
+
+@pytest.fixture
+def differential_backup(tmp_path, monkeypatch):
+    """Backup completo, um incremental e um diferencial contra o completo."""
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    source = tmp_path / 'origem'
+    source.mkdir()
+    (source / 'alterado.txt').write_text('versão 1')
+    (source / 'removido.txt').write_text('será removido')
+    (source / 'intacto.txt').write_text('nunca muda')
+
+    destination = tmp_path / 'backups'
+    destination.mkdir()
+    manager = BackupManager()
+    base = manager.create_backup([str(source)], str(destination), 'zip', backup_title='base')
+
+    time.sleep(0.05)
+    (source / 'alterado.txt').write_text('versão 2 (maior)')
+    manager.create_backup([str(source)], str(destination), 'zip', backup_title='inc', incremental=True)
+    (source / 'removido.txt').unlink()
+    (source / 'novo.txt').write_text('novo')
+
+    name = manager.create_backup([str(source)], str(destination), 'zip', backup_title='dif',
+                                 differential=True, base_backup=base)
+    return manager, base, name, source
+
+
+def test_differential_backup_against_base(differential_backup):
+    manager, base, name, source = differential_backup
+    info = manager.catalog_manager.get_backup_info(name)
+
+    assert info['differential'] and info['base_backup'] == base
+    # Alterações desde o completo, mesmo as já salvas pelo incremental
+    with zipfile.ZipFile(info['path']) as zipf:
+        assert sorted(zipf.namelist()) == ['origem/alterado.txt', 'origem/novo.txt']
+    assert info['deleted_files'] == ['origem/removido.txt']
+
+
+def test_differential_requires_full_base(differential_backup, tmp_path):
+    manager, base, name, source = differential_backup
+    with pytest.raises(Exception, match='completo'):
+        manager.create_backup([str(source)], str(tmp_path / 'backups'), 'zip', backup_title='x',
+                              differential=True, base_backup=name)
@@ -0,0 +1,169 @@
+"""
+Testes da busca de arquivos no catálogo
+"""
+import json
+import os
+
+import catalog_manager
+from backup_manager import BackupManager
+from catalog_manager import CatalogManager
+from restore_manager import RestoreManager
+
+
+def test_search_returns_member_paths(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    # Lotes pequenos para que o índice seja gravado em várias transações
+    monkeypatch.setattr(catalog_manager, '_PATH_INDEX_BATCH', 7)
+
+    source = tmp_path / 'origem'
+    (source / 'docs').mkdir(parents=True)
+    for number in range(20):
+        (source / 'docs' / f'relatorio{number}.txt').write_text(f'conteúdo {number}')
+
+    destination = tmp_path / 'backups'
+    destination.mkdir()
+    manager = BackupManager()
+    name = manager.create_backup([str(source)], str(destination), 'zip', backup_title='teste')
+
+    results = manager.catalog_manager.search_files('*/relatorio1*')
+    assert sorted(result['path'] for result in results) == sorted(
+        ['origem/docs/relatorio1.txt'] + [f'origem/docs/relatorio{number}.txt' for number in range(10, 20)])
+    assert all(result['source'] == str(source / result['path'][len('origem/'):]) for result in results)
+
+    # Os caminhos encontrados servem diretamente para a restauração
+    target = tmp_path / 'restaurado'
+    target.mkdir()
+    backup_path = manager.catalog_manager.get_backup_info(name)['path']
+    restored = RestoreManager(manager.catalog_manager).restore_files(
+        backup_path, [results[0]['path']], str(target))
+    assert restored['errors'] == []
+    assert (target / results[0]['path']).exists()
+
+
+def test_interrupted_indexing_resumes_on_open(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    source = tmp_path / 'origem'
+    source.mkdir()
+    (source / 'planilha.ods').write_bytes(os.urandom(64))
+
+    destination = tmp_path / 'backups'
+    destination.mkdir()
+    manager = BackupManager()
+    manager.create_backup([str(source)], str(destination), 'zip', backup_title='teste')
+    catalog = manager.catalog_manager
+
+    # Simula uma queda antes de o índice ser preenchido
+    with catalog._conn:
+        catalog._conn.execute('DELETE FROM backup_paths')
+        catalog._conn.execute('INSERT INTO path_index_pending SELECT id FROM backups')
+    assert catalog.search_files('planilha') == []
+
+    reopened = CatalogManager(catalog.catalog_dir)
+    assert [result['path'] for result in reopened.search_files('planilha')] == ['origem/planilha.ods']
+
+
+def test_compaction_failure_does_not_fail_the_write(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    monkeypatch.setattr(catalog_manager, 'COMPACT_INTERVAL', 1)
+    catalog = CatalogManager(tmp_path / 'catalogo')
+
+    def failing_backup(*args):
+        raise OSError('disco cheio')
+    monkeypatch.setattr(catalog_manager, 'replace_file_durably', failing_backup)
+
+    archive = tmp_path / 'backup.zip'
+    archive.write_bytes(b'PK')
+    catalog.add_catalog_entry({'name': 'teste', 'filename': 'backup.zip', 'path': str(archive),
+                               'date': '2026-01-01T00:00:00', 'size': 2, 'compression': 'zip', 'files': []})
+    catalog._compaction_thread.join()
+
+    assert catalog.get_backup_info('teste') is not None
+
+
+def test_integrity_checked_only_after_unclean_shutdown(tmp_path, monkeypatch):
+    checks = []
+    monkeypatch.setattr(CatalogManager, 'check_integrity', lambda self, full=False: checks.append(full))
+
+    CatalogManager(tmp_path / 'catalogo').close()
+    CatalogManager(tmp_path / 'catalogo').close()
+    assert checks == []
+
+    # Um log de escrita que sobrou indica que o processo não fechou o catálogo
+    (tmp_path / 'catalogo' / 'backup_catalog.db-wal').write_bytes(b'')
+    CatalogManager(tmp_path / 'catalogo').close()
+    assert checks == [False]
+
+
+def test_paths_stored_once_across_backups(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    source = tmp_path / 'origem'
+    source.mkdir()
+    for number in range(5):
+        (source / f'nota{number}.txt').write_text(f'nota {number}')
+
+    destination = tmp_path / 'backups'
+    destination.mkdir()
+    manager = BackupManager()
+    first = manager.create_backup([str(source)], str(destination), 'zip', backup_title='um')
+    (source / 'extra.txt').write_text('extra')
+    manager.create_backup([str(source)], str(destination), 'zip', backup_title='dois')
+    catalog = manager.catalog_manager
+
+    results = catalog.search_files('nota3')
+    assert len(results) == 2
+    assert all(result['source'] == str(source / 'nota3.txt') for result in results)
+
+    def count(table):
+        return catalog._conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    assert count('paths') == 6
+    assert count('backup_paths') == 11
+
+    # Caminhos só do backup removido deixam de existir; os compartilhados ficam
+    catalog.delete_catalog_entry(first)
+    assert count('paths') == 6
+    assert count('backup_paths') == 6
+    catalog.delete_catalog_entry(catalog.search_files('extra')[0]['backup'])
+    assert count('paths') == 0
+    assert catalog.search_files('nota') == []
+
+
+def test_json_catalog_migrated_once(tmp_path):
+    catalog_dir = tmp_path / 'catalogo'
+    catalog_dir.mkdir()
+    archive = tmp_path / 'antigo.zip'
+    archive.write_bytes(b'PK')
+    legacy = {
+        'version': '1.0',
+        'created': '2024-05-01T10:00:00',
+        'backups': [
+            {'id': 'backup_1', 'name': 'antigo', 'filename': 'antigo.zip', 'path': str(archive),
+             'date': '2024-05-01T10:00:00', 'size': 2, 'compression': 'zip',
+             'source_folders': ['/home/usuario/docs'],
+             'files': [{'name': '/home/usuario/docs/carta.txt', 'size': 10},
+                       {'name': '/home/usuario/docs/foto.jpg', 'size': 2048}]},
+            {'id': 'backup_2', 'name': 'sem_arquivos', 'filename': 'outro.zip', 'path': str(tmp_path / 'outro.zip'),
+             'date': '2024-04-01T10:00:00', 'size': 0, 'compression': 'zip', 'source_folders': []}
+        ]
+    }
+    (catalog_dir / 'backup_catalog.json').write_text(json.dumps(legacy), encoding='utf-8')
+
+    catalog = CatalogManager(catalog_dir)
+    assert not (catalog_dir / 'backup_catalog.json').exists()
+    assert (catalog_dir / 'backup_catalog.json.migrated').exists()
+
+    entry = catalog.get_backup_info('antigo')
+    assert entry['id'] == 'backup_1'
+    assert entry['source_folders'] == ['/home/usuario/docs']
+    assert entry['file_count'] == 2
+    assert [(f['name'], f['size']) for f in entry['files']] == [
+        ('/home/usuario/docs/carta.txt', 10), ('/home/usuario/docs/foto.jpg', 2048)]
+    assert catalog.get_backup_info('sem_arquivos')['files'] == []
+    assert [result['path'] for result in catalog.search_files('carta')] == ['docs/carta.txt']
+    catalog.close()
+
+    # Um JSON que reaparece (ex.: restaurado de uma cópia) não duplica entradas
+    (catalog_dir / 'backup_catalog.json').write_text(json.dumps(legacy), encoding='utf-8')
+    reopened = CatalogManager(catalog_dir)
+    assert reopened._conn.execute('SELECT COUNT(*) FROM backups').fetchone()[0] == 2
+    assert len(reopened.search_files('carta')) == 1
+    reopened.close()
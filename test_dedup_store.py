@@ -0,0 +1,29 @@
+"""
+Testes do repositório de blocos deduplicados
+"""
+import os
+
+from dedup_store import DedupStore
+
+
+def test_put_chunk_rewrites_empty_chunk(tmp_path):
+    store = DedupStore(tmp_path / 'dedup_store')
+    data = os.urandom(1024)
+
+    chunk_id, written = store.put_chunk(data)
+    assert written > 0
+    assert store.put_chunk(data) == (chunk_id, 0)
+
+    # Como fica um bloco renomeado cujo conteúdo não chegou ao disco
+    store.chunk_path(chunk_id).write_bytes(b'')
+    assert store.put_chunk(data)[1] == written
+    assert store.get_chunk(chunk_id) == data
+
+
+def test_sync_covers_new_directories(tmp_path):
+    store = DedupStore(tmp_path / 'dedup_store')
+    chunk_id, _ = store.put_chunk(b'conteudo')
+
+    assert store._unsynced_dirs == {tmp_path, store.root, store.chunks_dir, store.chunk_path(chunk_id).parent}
+    store.sync()
+    assert store._unsynced_dirs == set()
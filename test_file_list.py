@@ -0,0 +1,75 @@
+"""
+Testes das listas de arquivos por backup
+"""
+import hashlib
+
+import pytest
+
+from file_list import RESTART_INTERVAL, FileList, write_file_list
+
+
+def _files(count):
+    # Prefixos compartilhados atravessando vários pontos de reinício
+    files = []
+    for number in range(count):
+        entry = {'name': f'/home/usuário/projetos/modulo{number // 10}/arquivo{number}.txt', 'size': number * 100}
+        if number % 3:
+            entry['mtime_ns'] = 1_700_000_000_000_000_000 + number
+        if number % 5 == 0:
+            entry['hash'] = hashlib.sha256(str(number).encode()).hexdigest()
+        files.append(entry)
+    return files
+
+
+def test_round_trip(tmp_path):
+    files = _files(RESTART_INTERVAL * 3 + 5)
+    path = tmp_path / 'lista.files'
+    write_file_list(path, files)
+
+    file_list = FileList(str(path))
+    assert len(file_list) == len(files)
+    assert list(file_list) == files
+    assert list(file_list.names()) == [entry['name'] for entry in files]
+
+    # Acesso direto, sem decodificar a lista toda
+    for index in (0, RESTART_INTERVAL - 1, RESTART_INTERVAL, RESTART_INTERVAL * 2 + 7, -1):
+        assert file_list[index] == files[index]
+    assert file_list[RESTART_INTERVAL - 2:RESTART_INTERVAL + 2] == files[RESTART_INTERVAL - 2:RESTART_INTERVAL + 2]
+    with pytest.raises(IndexError):
+        file_list[len(files)]
+
+    # Depois de fechada, a lista é mapeada de novo no próximo acesso
+    file_list.close()
+    assert file_list[1] == files[1]
+    file_list.close()
+
+
+def test_entries_without_optional_fields(tmp_path):
+    path = tmp_path / 'lista.files'
+    write_file_list(path, [{'name': 'a.txt', 'size': 0}, {'name': 'b.txt', 'size': 7, 'mtime_ns': 0}])
+
+    file_list = FileList(str(path))
+    assert list(file_list) == [{'name': 'a.txt', 'size': 0}, {'name': 'b.txt', 'size': 7, 'mtime_ns': 0}]
+    file_list.close()
+
+
+def test_empty_list(tmp_path):
+    path = tmp_path / 'vazia.files'
+    write_file_list(path, [])
+
+    file_list = FileList(str(path))
+    assert len(file_list) == 0
+    assert list(file_list) == []
+    assert list(file_list.names()) == []
+    file_list.close()
+
+
+def test_invalid_file_rejected(tmp_path):
+    path = tmp_path / 'lista.files'
+    write_file_list(path, _files(3))
+    data = bytearray(path.read_bytes())
+    data[:4] = b'XXXX'
+    path.write_bytes(bytes(data))
+
+    with pytest.raises(Exception, match='Invalid file list'):
+        len(FileList(str(path)))
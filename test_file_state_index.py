@@ -0,0 +1,101 @@
+"""
+Testes do índice de estado dos arquivos (detecção de alterações)
+"""
+import os
+import time
+
+import pytest
+
+from file_scanner import FileRecord
+from file_state_index import FileStateIndex
+
+
+def _record(path):
+    st = os.stat(path)
+    return FileRecord(str(path), st.st_size, st.st_mtime_ns, st.st_mode, st.st_ino, st.st_ctime_ns)
+
+
+@pytest.fixture
+def state(tmp_path):
+    source = tmp_path / 'origem'
+    source.mkdir()
+    (source / 'a.txt').write_text('original')
+    (source / 'b.txt').write_text('outro')
+
+    index = FileStateIndex(tmp_path / 'file_state.db')
+    index.begin_run()
+    for name in ('a.txt', 'b.txt'):
+        assert index.check(str(source), _record(source / name))
+    index.commit_run([str(source)])
+    yield index, source
+    index.close()
+
+
+def test_unchanged_file_is_not_read(state, monkeypatch):
+    index, source = state
+    monkeypatch.setattr('file_state_index.calculate_content_hash',
+                        lambda path: pytest.fail('arquivo inalterado não deve ser lido'))
+    index.begin_run()
+    assert not index.check(str(source), _record(source / 'a.txt'))
+
+
+def test_touched_file_with_same_content_is_unchanged(state):
+    index, source = state
+    # Sem hash registrado, a primeira mudança de data ainda conta como alteração
+    index.begin_run()
+    time.sleep(0.01)
+    os.utime(source / 'a.txt')
+    assert index.check(str(source), _record(source / 'a.txt'))
+    index.commit_run([str(source)], prune=False)
+
+    # Com o hash registrado, só a data mudou: arquivo inalterado
+    index.begin_run()
+    time.sleep(0.01)
+    os.utime(source / 'a.txt')
+    assert not index.check(str(source), _record(source / 'a.txt'))
+
+
+def test_rewritten_file_is_changed(state):
+    index, source = state
+    original = os.stat(source / 'a.txt')
+    # Mesmo tamanho e mtime; só o ctime denuncia a reescrita
+    time.sleep(0.05)
+    (source / 'a.txt').write_text('alterado')
+    os.utime(source / 'a.txt', ns=(original.st_atime_ns, original.st_mtime_ns))
+
+    index.begin_run()
+    assert index.check(str(source), _record(source / 'a.txt'))
+
+
+def test_uncommitted_run_is_discarded(tmp_path):
+    source = tmp_path / 'origem'
+    source.mkdir()
+    (source / 'b.txt').write_text('outro')
+    index = FileStateIndex(tmp_path / 'file_state.db')
+    index.begin_run()
+    index.check(str(source), _record(source / 'b.txt'))
+    index.commit_run([str(source)])
+
+    (source / 'b.txt').write_text('mudou')
+    index.begin_run()
+    assert index.check(str(source), _record(source / 'b.txt'))
+    # Backup falho ou cancelado: fechado sem commit_run
+    index.close()
+
+    reopened = FileStateIndex(tmp_path / 'file_state.db')
+    reopened.begin_run()
+    assert reopened.check(str(source), _record(source / 'b.txt'))
+    reopened.close()
+
+
+def test_commit_forgets_deleted_files(state):
+    index, source = state
+    os.remove(source / 'b.txt')
+    index.begin_run()
+    index.check(str(source), _record(source / 'a.txt'))
+    index.commit_run([str(source)])
+
+    assert index.has_state(str(source))
+    (source / 'b.txt').write_text('outro')
+    index.begin_run()
+    assert index.check(str(source), _record(source / 'b.txt'))
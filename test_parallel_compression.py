@@ -0,0 +1,95 @@
+"""
+Testes dos compressores paralelos ZIP e GZIP
+"""
+import gzip
+import os
+import zipfile
+import zlib
+
+import pytest
+
+from file_scanner import FileRecord
+from parallel_compression import ParallelZipWriter, ParallelGzipWriter, ZIP_STORED, ZIP_DEFLATED
+
+
+def _record(path):
+    st = os.stat(path)
+    return FileRecord(str(path), st.st_size, st.st_mtime_ns, st.st_mode, st.st_ino, st.st_ctime_ns)
+
+
+@pytest.fixture
+def source_files(tmp_path):
+    """Arquivos vazios, pequenos, em vários blocos e já comprimidos."""
+    source = tmp_path / 'origem'
+    source.mkdir()
+    (source / 'vazio.txt').write_bytes(b'')
+    (source / 'texto.txt').write_text('linha de texto\n' * 1000)
+    # Vários blocos de 64 KiB, com trechos repetidos que cruzam os limites
+    (source / 'grande.bin').write_bytes((os.urandom(20 * 1024) * 3 + b'z' * 50000) * 4)
+    (source / 'foto.jpg').write_bytes(os.urandom(100 * 1024))
+    return source
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_zip_round_trip(source_files, tmp_path, workers):
+    archive = tmp_path / 'teste.zip'
+    paths = sorted(source_files.iterdir())
+    completed = []
+    with ParallelZipWriter(str(archive), workers=workers, chunk_size=64 * 1024) as zipw:
+        for path in paths:
+            completed += zipw.add(_record(path), f'origem/{path.name}')
+        completed += zipw.finish()
+
+    assert [error for record, error in completed] == [None] * len(paths)
+    with zipfile.ZipFile(archive) as zipf:
+        assert zipf.testzip() is None
+        assert zipf.namelist() == [f'origem/{path.name}' for path in paths]
+        for path in paths:
+            assert zipf.read(f'origem/{path.name}') == path.read_bytes()
+        assert zipf.getinfo('origem/foto.jpg').compress_type == ZIP_STORED
+        assert zipf.getinfo('origem/grande.bin').compress_type == ZIP_DEFLATED
+
+
+def test_zip_skips_unreadable_file(source_files, tmp_path):
+    archive = tmp_path / 'teste.zip'
+    record = _record(source_files / 'texto.txt')
+    os.remove(source_files / 'texto.txt')
+
+    with ParallelZipWriter(str(archive), workers=2) as zipw:
+        completed = zipw.add(_record(source_files / 'grande.bin'), 'grande.bin')
+        completed += zipw.add(record, 'texto.txt')
+        completed += zipw.finish()
+
+    errors = {record.path: error for record, error in completed}
+    assert errors[str(source_files / 'grande.bin')] is None
+    assert isinstance(errors[record.path], OSError)
+    with zipfile.ZipFile(archive) as zipf:
+        assert zipf.namelist() == ['grande.bin']
+        assert zipf.testzip() is None
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_gzip_round_trip_with_members(tmp_path, workers):
+    archive = tmp_path / 'teste.gz'
+    pieces = [os.urandom(5000) * 20, b'', b'abc' * 70000, os.urandom(123457)]
+
+    with ParallelGzipWriter(str(archive), workers=workers, block_size=32 * 1024) as gz:
+        for number, piece in enumerate(pieces):
+            if number:
+                # Sem efeito depois da parte vazia: o membro atual ainda está vazio
+                gz.new_member()
+            gz.write(piece)
+        assert gz.tell() == sum(len(piece) for piece in pieces)
+    # Os deslocamentos comprimidos só ficam completos depois de fechar
+    members = gz.members
+
+    data = archive.read_bytes()
+    expected = b''.join(pieces)
+    # Leitores comuns veem um único fluxo gzip (com vários membros)
+    assert gzip.decompress(data) == expected
+
+    # Cada membro pode ser lido a partir do seu próprio deslocamento
+    assert len(members) == 3
+    for compressed_offset, uncompressed_offset in members:
+        decompressor = zlib.decompressobj(31)
+        assert expected[uncompressed_offset:].startswith(decompressor.decompress(data[compressed_offset:]))
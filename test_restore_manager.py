@@ -0,0 +1,303 @@
+"""
+Testes de restauração de backups TAR.GZ e ZIP
+"""
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+import backup_manager
+import restore_manager
+from backup_manager import BackupManager
+from restore_manager import RestoreManager
+from tar_index import TarIndex, index_path_for
+
+original_restore_zip_parallel = RestoreManager._restore_zip_parallel
+
+
+@pytest.fixture
+def multi_member_backup(tmp_path, monkeypatch):
+    """Backup TAR.GZ com vários membros gzip, com o índice removido."""
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    # Membros gzip pequenos para que poucos arquivos ocupem vários membros
+    monkeypatch.setattr(backup_manager, 'DEFAULT_MEMBER_SIZE', 16 * 1024)
+
+    source = tmp_path / 'origem'
+    for folder in range(3):
+        (source / f'pasta{folder}').mkdir(parents=True)
+        for number in range(20):
+            (source / f'pasta{folder}' / f'arquivo{number}.bin').write_bytes(os.urandom(4096 + number))
+
+    destination = tmp_path / 'backups'
+    destination.mkdir()
+    manager = BackupManager()
+    name = manager.create_backup([str(source)], str(destination), 'tar.gz', backup_title='teste')
+    backup_path = manager.catalog_manager.get_backup_info(name)['path']
+
+    index_path = index_path_for(backup_path)
+    assert os.path.exists(index_path)
+    os.remove(index_path)
+
+    with tarfile.open(backup_path, 'r:gz') as tarf:
+        names = [member.name for member in tarf.getmembers() if member.isfile()]
+    assert len(names) == 60
+    return manager.catalog_manager, backup_path, names, source
+
+
+def test_restore_all_without_index(multi_member_backup, tmp_path):
+    catalog, backup_path, names, source = multi_member_backup
+    target = tmp_path / 'restaurado'
+    target.mkdir()
+
+    results = RestoreManager(catalog).restore_all_files(backup_path, str(target))
+
+    assert results['errors'] == []
+    assert results['total_restored'] == len(names)
+    for name in names:
+        original = source.parent / name
+        assert (target / name).read_bytes() == original.read_bytes()
+
+
+def test_restore_selection_from_last_member_without_index(multi_member_backup, tmp_path):
+    catalog, backup_path, names, source = multi_member_backup
+    target = tmp_path / 'restaurado'
+    target.mkdir()
+
+    results = RestoreManager(catalog).restore_files(backup_path, [names[-1]], str(target))
+
+    assert results['errors'] == []
+    assert (target / names[-1]).read_bytes() == (source.parent / names[-1]).read_bytes()
+
+
+def test_extract_single_file_without_index(multi_member_backup, tmp_path):
+    catalog, backup_path, names, source = multi_member_backup
+    target = tmp_path / 'extraido.bin'
+
+    RestoreManager(catalog).extract_single_file(backup_path, names[-1], str(target))
+
+    assert target.read_bytes() == (source.parent / names[-1]).read_bytes()
+
+
+def test_restore_with_stale_index_entries(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    monkeypatch.setattr(backup_manager, 'DEFAULT_MEMBER_SIZE', 16 * 1024)
+    source = tmp_path / 'origem'
+    source.mkdir()
+    for number in range(30):
+        (source / f'arquivo{number}.bin').write_bytes(os.urandom(4096))
+
+    destination = tmp_path / 'backups'
+    destination.mkdir()
+    manager = BackupManager()
+    name = manager.create_backup([str(source)], str(destination), 'tar.gz', backup_title='teste')
+    backup_path = manager.catalog_manager.get_backup_info(name)['path']
+
+    # Um índice que não descreve mais o arquivo: posições trocadas e uma
+    # posição além do fim do fluxo
+    index = TarIndex.load(backup_path)
+    entries = list(index.entries)
+    entries[3], entries[20] = (entries[3]._replace(header_offset=entries[20].header_offset),
+                               entries[20]._replace(header_offset=entries[3].header_offset))
+    entries[-1] = entries[-1]._replace(header_offset=10 ** 9)
+    TarIndex(index.members, entries).save(backup_path)
+
+    target = tmp_path / 'restaurado'
+    target.mkdir()
+    results = RestoreManager(manager.catalog_manager).restore_all_files(backup_path, str(target))
+
+    assert results['errors'] == []
+    assert results['total_restored'] == 30
+    for path in source.iterdir():
+        assert (target / 'origem' / path.name).read_bytes() == path.read_bytes()
+
+
+def _all_pages(restore, backup_path, **kwargs):
+    entries, cursor = [], None
+    while True:
+        page = restore.list_backup_contents(backup_path, cursor=cursor, **kwargs)
+        entries.extend(page['entries'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return entries
+
+
+def test_list_contents_by_directory(multi_member_backup):
+    catalog, backup_path, names, source = multi_member_backup
+    restore = RestoreManager(catalog)
+
+    top = restore.list_backup_contents(backup_path)
+    assert top == {'entries': [{'type': 'directory', 'name': 'origem/', 'path': 'origem/', 'file_count': 60}],
+                   'next_cursor': None}
+
+    # Um cursor de diretório continua depois de tudo o que está dentro dele
+    first = restore.list_backup_contents(backup_path, prefix='origem/', limit=2)
+    assert [entry['path'] for entry in first['entries']] == ['origem/pasta0/', 'origem/pasta1/']
+    assert first['next_cursor'] == 'origem/pasta1/'
+    second = restore.list_backup_contents(backup_path, prefix='origem/', cursor=first['next_cursor'], limit=2)
+    assert [entry['path'] for entry in second['entries']] == ['origem/pasta2/']
+    assert second['next_cursor'] is None
+
+    files = _all_pages(restore, backup_path, prefix='origem/pasta1/', limit=7)
+    assert [entry['name'] for entry in files] == sorted(name for name in names if name.startswith('origem/pasta1/'))
+    assert all(entry['type'] == 'file' for entry in files)
+    assert files[0]['size'] == os.path.getsize(source / 'pasta1' / 'arquivo0.bin')
+
+
+def test_list_contents_recursive(multi_member_backup):
+    catalog, backup_path, names, source = multi_member_backup
+    restore = RestoreManager(catalog)
+
+    entries = _all_pages(restore, backup_path, prefix='origem/', limit=25, recursive=True)
+    assert [entry['name'] for entry in entries] == sorted(names)
+    assert restore.list_backup_contents(backup_path, prefix='inexistente/') == {'entries': [], 'next_cursor': None}
+
+
+@pytest.fixture
+def zip_backup(tmp_path, monkeypatch):
+    """Backup ZIP com membros comprimidos, armazenados, vazios e em vários blocos."""
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    source = tmp_path / 'origem'
+    (source / 'sub').mkdir(parents=True)
+    for number in range(30):
+        (source / f'texto{number}.txt').write_text(f'linha {number}\n' * (number * 100))
+    (source / 'sub' / 'foto.jpg').write_bytes(os.urandom(300 * 1024))
+    (source / 'sub' / 'grande.bin').write_bytes(b'abc' * (3 * 1024 * 1024) + os.urandom(1024))
+    (source / 'vazio.txt').write_bytes(b'')
+
+    destination = tmp_path / 'backups'
+    destination.mkdir()
+    manager = BackupManager()
+    name = manager.create_backup([str(source)], str(destination), 'zip', backup_title='teste')
+    return manager.catalog_manager, manager.catalog_manager.get_backup_info(name)['path'], source
+
+
+@pytest.mark.parametrize('positional_reads', [True, False])
+@pytest.mark.parametrize('workers', [1, 4])
+def test_restore_zip(zip_backup, tmp_path, monkeypatch, workers, positional_reads):
+    catalog, backup_path, source = zip_backup
+    # Sem os.pread (Windows) cada thread lê pelo seu próprio ZipFile
+    monkeypatch.setattr(restore_manager, '_POSITIONAL_READS', positional_reads)
+    parallel = []
+    monkeypatch.setattr(RestoreManager, '_restore_zip_parallel',
+                        lambda self, *args: parallel.append(args) or
+                        original_restore_zip_parallel(self, *args))
+    target = tmp_path / 'restaurado'
+    target.mkdir()
+
+    results = RestoreManager(catalog, restore_workers=workers).restore_all_files(backup_path, str(target))
+
+    assert results['errors'] == []
+    assert results['total_restored'] == 33
+    assert len(parallel) == (workers > 1)
+    for path in source.rglob('*'):
+        if path.is_file():
+            assert (target / 'origem' / path.relative_to(source)).read_bytes() == path.read_bytes()
+
+
+def test_restore_zip_detects_corrupted_member(zip_backup, tmp_path):
+    catalog, backup_path, source = zip_backup
+    with zipfile.ZipFile(backup_path) as zipf:
+        info = zipf.getinfo('origem/texto29.txt')
+    assert info.compress_type == zipfile.ZIP_DEFLATED
+
+    # Troca o CRC registrado no diretório central
+    with open(backup_path, 'r+b') as archive:
+        data = archive.read()
+        # O diretório central fica depois dos dados: a última ocorrência do nome
+        header = data.rindex(b'PK\x01\x02', 0, data.rindex(b'origem/texto29.txt'))
+        archive.seek(header + 16)
+        archive.write(((info.CRC ^ 1) & 0xFFFFFFFF).to_bytes(4, 'little'))
+
+    target = tmp_path / 'restaurado'
+    target.mkdir()
+    results = RestoreManager(catalog, restore_workers=4).restore_all_files(backup_path, str(target))
+
+    assert len(results['errors']) == 1
+    assert 'texto29.txt' in results['errors'][0]
+
+
+def test_restore_point_of_differential(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    source = tmp_path / 'origem'
+    source.mkdir()
+    (source / 'alterado.txt').write_text('versão 1')
+    (source / 'removido.txt').write_text('será removido')
+    (source / 'intacto.txt').write_text('nunca muda')
+
+    destination = tmp_path / 'backups'
+    destination.mkdir()
+    manager = BackupManager()
+    base = manager.create_backup([str(source)], str(destination), 'tar.gz', backup_title='base')
+    (source / 'alterado.txt').write_text('versão 2 (maior)')
+    (source / 'removido.txt').unlink()
+    (source / 'novo.txt').write_text('novo')
+    name = manager.create_backup([str(source)], str(destination), 'tar.gz', backup_title='dif',
+                                 differential=True, base_backup=base)
+
+    target = tmp_path / 'restaurado'
+    target.mkdir()
+    results = RestoreManager(manager.catalog_manager).restore_point(name, str(target))
+
+    assert results['errors'] == []
+    restored = {path.name: path.read_text() for path in (target / 'origem').iterdir()}
+    assert restored == {path.name: path.read_text() for path in source.iterdir()}
+
+
+def test_verify_restore(zip_backup, tmp_path):
+    catalog, backup_path, source = zip_backup
+    target = tmp_path / 'restaurado'
+    target.mkdir()
+    restore = RestoreManager(catalog, restore_workers=4)
+    restored = restore.restore_all_files(backup_path, str(target))['restored']
+    assert len(restored) == 33
+
+    results = restore.verify_restore(backup_path, restored, str(target))
+    assert sorted(results['verified']) == sorted(restored)
+    assert results['mismatches'] == [] and results['missing'] == []
+    assert results['bytes_verified'] == sum(os.path.getsize(path) for path in restored)
+    # Sem a pasta de destino, cada arquivo é associado pelo final do caminho
+    assert sorted(restore.verify_restore(backup_path, restored)['verified']) == sorted(restored)
+
+    # Mesmo tamanho, conteúdo diferente: só a comparação do conteúdo percebe
+    changed = target / 'origem' / 'sub' / 'grande.bin'
+    with open(changed, 'r+b') as f:
+        f.seek(1024 * 1024)
+        f.write(b'xyz')
+    removed = target / 'origem' / 'texto5.txt'
+    removed.unlink()
+
+    results = restore.verify_restore(backup_path, restored, str(target))
+    assert [mismatch['file'] for mismatch in results['mismatches']] == [str(changed)]
+    assert results['mismatches'][0]['member'] == 'origem/sub/grande.bin'
+    assert results['missing'] == [str(removed)]
+    assert len(results['verified']) == 31
+
+
+def test_delta_restore(zip_backup, tmp_path):
+    catalog, backup_path, source = zip_backup
+    target = tmp_path / 'restaurado'
+    target.mkdir()
+    restore = RestoreManager(catalog)
+
+    first = restore.restore_files(backup_path, [], str(target), mode='delta')
+    assert first['errors'] == [] and first['total_restored'] == 33
+    assert first['unchanged'] == [] and first['bytes_avoided'] == 0
+    # Os arquivos restaurados recebem a data registrada no backup
+    restored_big = target / 'origem' / 'sub' / 'grande.bin'
+    assert restored_big.stat().st_mtime_ns == (source / 'sub' / 'grande.bin').stat().st_mtime_ns
+
+    # Mesmo tamanho e conteúdo diferente; outro só com a data alterada
+    with open(restored_big, 'r+b') as f:
+        f.write(b'xyz')
+    touched = target / 'origem' / 'texto7.txt'
+    os.utime(touched, ns=(0, 0))
+
+    second = restore.restore_files(backup_path, [], str(target), mode='delta')
+    assert second['errors'] == []
+    assert second['restored'] == [str(restored_big)]
+    assert len(second['unchanged']) == 32 and str(touched) in second['unchanged']
+    assert second['bytes_avoided'] == sum(path.stat().st_size for path in source.rglob('*') if path.is_file()) - \
+        restored_big.stat().st_size
+    assert restored_big.read_bytes() == (source / 'sub' / 'grande.bin').read_bytes()
+    assert touched.stat().st_mtime_ns == (source / 'texto7.txt').stat().st_mtime_ns
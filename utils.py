@@ -216,6 +216,136 @@ def calculate_file_hash(file_path, algorithm='md5'):
     except Exception as e:
         raise Exception(f"Failed to calculate hash: {str(e)}")
 
+# Files are hashed in pieces of this size; see calculate_content_hash
+CONTENT_HASH_CHUNK_SIZE = 4 * 1024 * 1024
+
+def hash_content_chunk(data):
+    """
+    Hash one piece of file content for calculate_content_hash.
+    
+    Args:
+        data: Bytes of one CONTENT_HASH_CHUNK_SIZE piece (the last may be shorter)
+        
+    Returns:
+        bytes: Raw digest of the piece
+    """
+    return hashlib.blake2b(data, digest_size=32).digest()
+
+def combine_content_hashes(chunk_digests):
+    """
+    Combine piece digests into the content hash of a whole file.
+    
+    Args:
+        chunk_digests: List of digests from hash_content_chunk, in file order
+        
+    Returns:
+        str: Hex content hash
+    """
+    if len(chunk_digests) == 1:
+        return chunk_digests[0].hex()
+    return hashlib.blake2b(b''.join(chunk_digests), digest_size=32, person=b'backup-tree').hexdigest()
+
+def calculate_content_hash(file_path):
+    """
+    Calculate the content hash used by incremental backups and verification.
+    
+    The file is hashed with BLAKE2b-256 in CONTENT_HASH_CHUNK_SIZE pieces and
+    the piece digests are combined, so the same value can be computed
+    piece-by-piece in parallel while compressing or verifying.
+    
+    Args:
+        file_path: Path to the file
+        
+    Returns:
+        str: Hex content hash
+    """
+    try:
+        digests = []
+        with open(file_path, 'rb') as f:
+            while True:
+                data = f.read(CONTENT_HASH_CHUNK_SIZE)
+                if not data and digests:
+                    break
+                digests.append(hash_content_chunk(data))
+                if len(data) < CONTENT_HASH_CHUNK_SIZE:
+                    break
+        
+        return combine_content_hashes(digests)
+    except Exception as e:
+        raise Exception(f"Failed to calculate hash: {str(e)}")
+
+class ContentHasher:
+    """
+    Incremental form of calculate_content_hash, for data read elsewhere.
+    
+    Feed the whole file content in order with update(); hexdigest() returns
+    the same value calculate_content_hash gives for the file.
+    """
+    
+    def __init__(self):
+        self._digests = []
+        self._piece = hashlib.blake2b(digest_size=32)
+        self._filled = 0
+    
+    def update(self, data):
+        view = memoryview(data)
+        while view:
+            take = min(len(view), CONTENT_HASH_CHUNK_SIZE - self._filled)
+            self._piece.update(view[:take])
+            self._filled += take
+            view = view[take:]
+            if self._filled == CONTENT_HASH_CHUNK_SIZE:
+                self._digests.append(self._piece.digest())
+                self._piece = hashlib.blake2b(digest_size=32)
+                self._filled = 0
+    
+    def hexdigest(self):
+        digests = list(self._digests)
+        if self._filled or not digests:
+            digests.append(self._piece.digest())
+        return combine_content_hashes(digests)
+
+def get_archive_name(file_path, source_folders):
+    """
+    Name of a backed-up file inside the archive.
+    
+    Args:
+        file_path: Source path of the file
+        source_folders: Source folders of the backup
+    
+    Returns:
+        str: Path relative to its source folder, prefixed with the folder's
+             name and using '/' separators
+    """
+    # Find which source folder this file belongs to
+    for source_folder in source_folders:
+        if file_path.startswith(source_folder):
+            # Get relative path from source folder
+            rel_path = os.path.relpath(file_path, source_folder)
+            # Prefix with source folder name to avoid conflicts
+            folder_name = os.path.basename(source_folder.rstrip(os.sep))
+            return os.path.join(folder_name, rel_path).replace(os.sep, '/')
+    
+    # Fallback: use just the filename
+    return os.path.basename(file_path)
+
+def get_source_path(archive_name, source_folders):
+    """
+    Source path a member name was created from (inverse of get_archive_name).
+    
+    Args:
+        archive_name: Member name inside the archive
+        source_folders: Source folders of the backup
+    
+    Returns:
+        str: Original path, or None if no source folder matches
+    """
+    folder_name, _, rel_path = archive_name.partition('/')
+    for source_folder in source_folders:
+        if os.path.basename(source_folder.rstrip(os.sep)) == folder_name:
+            return os.path.join(source_folder, *rel_path.split('/')) if rel_path else source_folder
+    return None
+
 def copy_file_with_progress(src, dst, progress_callback=None):
     """
     Copy a file with progress reporting.
@@ -253,6 +383,75 @@ def copy_file_with_progress(src, dst, progress_callback=None):
     except Exception as e:
         raise Exception(f"Failed to copy file: {str(e)}")
 
+def copy_file_range(src_fd, dst_fd, offset, count):
+    """
+    Copy a byte range between open files without passing it through Python.
+    
+    Uses os.copy_file_range, then os.sendfile, where the platform and file
+    systems support them, and falls back to pread/write otherwise. The
+    source's file position is neither used nor changed, so several threads
+    may copy from one descriptor.
+    
+    Args:
+        src_fd: Source file descriptor
+        dst_fd: Destination file descriptor (written at its current position)
+        offset: Offset of the range in the source
+        count: Number of bytes to copy
+    """
+    end = offset + count
+    
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while offset < end:
+                copied = os.copy_file_range(src_fd, dst_fd, end - offset, offset)
+                if not copied:
+                    break
+                offset += copied
+        except OSError:
+            pass  # e.g. unsupported across these file systems
+    
+    if offset < end and hasattr(os, 'sendfile'):
+        try:
+            while offset < end:
+                sent = os.sendfile(dst_fd, src_fd, offset, end - offset)
+                if not sent:
+                    break
+                offset += sent
+        except OSError:
+            pass  # e.g. the destination must be a socket on this platform
+    
+    while offset < end:
+        data = os.pread(src_fd, min(1024 * 1024, end - offset), offset)
+        if not data:
+            raise Exception("Unexpected end of file while copying")
+        view = memoryview(data)
+        while view:
+            view = view[os.write(dst_fd, view):]
+        offset += len(data)
+
+def replace_file_durably(temp_path, target_path):
+    """
+    Move a fully written temporary file over its target, crash-safely.
+    
+    The data is flushed to disk before the rename, and the rename itself
+    (on POSIX) by syncing the directory, so after a crash the target holds
+    either the old or the new content, never a partial file.
+    
+    Args:
+        temp_path: Temporary file in the same directory as the target
+        target_path: Final path
+    """
+    with open(temp_path, 'r+b') as f:
+        os.fsync(f.fileno())
+    os.replace(temp_path, target_path)
+    
+    if os.name != 'nt':
+        dir_fd = os.open(os.path.dirname(os.path.abspath(target_path)), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
 def validate_backup_name(name):
     """
     Validate a backup name.
@@ -317,7 +516,7 @@ def is_backup_file(file_path):
     Returns:
         bool: True if it's a backup file, False otherwise
     """
-    backup_extensions = ['.zip', '.tar.gz', '.tar', '.7z']
+    backup_extensions = ['.zip', '.tar.gz', '.tar', '.7z', '.dedup']
     
     file_path_lower = file_path.lower()
     return any(file_path_lower.endswith(ext) for ext in backup_extensions)
@@ -330,7 +529,7 @@ def get_backup_type(file_path):
         file_path: Path to the backup file
         
     Returns:
-        str: Backup type ('zip', 'tar.gz', 'unknown')
+        str: Backup type ('zip', 'tar.gz', 'tar', 'dedup', 'unknown')
     """
     file_path_lower = file_path.lower()
     
@@ -340,6 +539,8 @@ def get_backup_type(file_path):
         return 'tar.gz'
     elif file_path_lower.endswith('.tar'):
         return 'tar'
+    elif file_path_lower.endswith('.dedup'):
+        return 'dedup'
     else:
         return 'unknown'
 
@@ -14,7 +14,7 @@ import zipfile
 import tarfile
 
 from backup_manager import BackupManager
-from restore_manager import RestoreManager
+from restore_manager import RestoreManager, DEFAULT_PAGE_SIZE
 from catalog_manager import CatalogManager
 from utils import format_size, format_time
 
@@ -23,8 +23,8 @@ app.secret_key = 'backup_manager_secret_key'
 
 # Global instances
 backup_manager = BackupManager()
-restore_manager = RestoreManager()
 catalog_manager = CatalogManager()
+restore_manager = RestoreManager(catalog_manager)
 
 # Global status for tracking operations
 backup_status = {
@@ -221,6 +221,10 @@ def get_backup_info(backup_name):
     try:
         info = catalog_manager.get_backup_info(backup_name)
         if info:
+            # The file list can be huge; only send it when asked for
+            files = info.pop('files', [])
+            if request.args.get('files'):
+                info['files'] = list(files)
             return jsonify(info)
         else:
             return jsonify({'error': 'Backup not found'}), 404
@@ -229,17 +233,46 @@ def get_backup_info(backup_name):
 
 @app.route('/api/backup/<backup_name>/contents')
 def get_backup_contents(backup_name):
-    """Get contents of a backup file."""
+    """
+    Get contents of a backup file.
+    
+    With any of ?prefix=, ?cursor= or ?limit= one page is returned (see
+    RestoreManager.list_backup_contents); ?recursive=1 lists every file
+    below the prefix instead of one directory level.
+    """
     try:
         backup_info = catalog_manager.get_backup_info(backup_name)
         if not backup_info:
             return jsonify({'error': 'Backup not found'}), 404
         
+        if any(arg in request.args for arg in ('prefix', 'cursor', 'limit')):
+            page = restore_manager.list_backup_contents(
+                backup_info['path'],
+                prefix=request.args.get('prefix', ''),
+                cursor=request.args.get('cursor') or None,
+                limit=request.args.get('limit', DEFAULT_PAGE_SIZE, type=int),
+                recursive=bool(request.args.get('recursive')))
+            return jsonify(page)
+        
         contents = restore_manager.get_backup_contents(backup_info['path'])
         return jsonify(contents)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/search')
+def search_files():
+    """Find which backups contain files matching a path substring or glob."""
+    try:
+        query = request.args.get('q', '')
+        if not query:
+            return jsonify({'error': 'No search query provided'}), 400
+        
+        limit = request.args.get('limit', 100, type=int)
+        results = catalog_manager.search_files(query, limit=limit or None)
+        return jsonify(results)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/restore', methods=['POST'])
 def restore_files():
     """Restore files from backup."""
@@ -250,6 +283,7 @@ def restore_files():
         destination_path = data.get('destination_path')
         preserve_structure = data.get('preserve_structure', True)
         overwrite_existing = data.get('overwrite_existing', False)
+        mode = data.get('mode')
         
         if not backup_name:
             return jsonify({'error': 'No backup specified'}), 400
@@ -266,7 +300,8 @@ def restore_files():
             file_names,
             destination_path,
             preserve_structure,
-            overwrite_existing
+            overwrite_existing,
+            mode
         )
         
         return jsonify(result)
@@ -532,6 +567,8 @@ if __name__ == '__main__':
         .error { color: red; }
         .success { color: green; }
         .log { background-color: #f8f9fa; padding: 10px; height: 200px; overflow-y: auto; font-family: monospace; }
+        .contents-dir { cursor: pointer; font-weight: bold; }
+        .contents-children { margin-left: 20px; }
     </style>
 </head>
 <body>
@@ -576,6 +613,7 @@ if __name__ == '__main__':
                     <select id="compression">
                         <option value="zip">ZIP</option>
                         <option value="tar.gz">TAR.GZ</option>
+                        <option value="dedup">DEDUP (deduplicado)</option>
                     </select>
                 </div>
                 <div class="form-group">
@@ -653,6 +691,7 @@ if __name__ == '__main__':
     <script>
         let selectedFolders = [];
         let selectedBackup = null;
+        const CONTENTS_PAGE_SIZE = 500;
         let statusInterval = null;
         let currentPath = null;
         let browsing = false;
@@ -904,18 +943,69 @@ if __name__ == '__main__':
             document.querySelectorAll('.backup-item').forEach(item => item.classList.remove('selected'));
             event.target.classList.add('selected');
             
-            // Load backup contents
-            fetch(`/api/backup/${backup.name}/contents`)
+            // Load the top level of the backup; folders are fetched when expanded
+            const contentsDiv = document.getElementById('backup-contents');
+            contentsDiv.innerHTML = '<h4>Arquivos:</h4>';
+            const tree = document.createElement('div');
+            contentsDiv.appendChild(tree);
+            loadContentsPage(backup.name, '', null, tree);
+        }
+
+        function loadContentsPage(backupName, prefix, cursor, container) {
+            let url = `/api/backup/${encodeURIComponent(backupName)}/contents?limit=${CONTENTS_PAGE_SIZE}&prefix=${encodeURIComponent(prefix)}`;
+            if (cursor) {
+                url += `&cursor=${encodeURIComponent(cursor)}`;
+            }
+            
+            fetch(url)
                 .then(response => response.json())
-                .then(contents => {
-                    const contentsDiv = document.getElementById('backup-contents');
-                    contentsDiv.innerHTML = '<h4>Arquivos:</h4>';
+                .then(page => {
+                    if (page.error) {
+                        log(`Erro ao listar arquivos: ${page.error}`);
+                        return;
+                    }
                     
-                    contents.forEach(file => {
+                    page.entries.forEach(entry => {
+                        const label = entry.path.slice(prefix.length);
                         const div = document.createElement('div');
-                        div.innerHTML = `${file.name} (${file.size} bytes)`;
-                        contentsDiv.appendChild(div);
+                        
+                        if (entry.type === 'directory') {
+                            const header = document.createElement('div');
+                            header.className = 'contents-dir';
+                            const children = document.createElement('div');
+                            children.className = 'contents-children';
+                            children.style.display = 'none';
+                            const setLabel = () => {
+                                const arrow = children.style.display === 'none' ? '+' : '-';
+                                header.textContent = `${arrow} ${label} (${entry.file_count} arquivos)`;
+                            };
+                            header.onclick = () => {
+                                if (!children.dataset.loaded) {
+                                    children.dataset.loaded = '1';
+                                    loadContentsPage(backupName, entry.path, null, children);
+                                }
+                                children.style.display = children.style.display === 'none' ? 'block' : 'none';
+                                setLabel();
+                            };
+                            setLabel();
+                            div.appendChild(header);
+                            div.appendChild(children);
+                        } else {
+                            div.textContent = `${label} (${entry.size} bytes)`;
+                        }
+                        container.appendChild(div);
                     });
+                    
+                    if (page.next_cursor) {
+                        const more = document.createElement('button');
+                        more.className = 'browse-button';
+                        more.textContent = 'Carregar mais...';
+                        more.onclick = () => {
+                            more.remove();
+                            loadContentsPage(backupName, prefix, page.next_cursor, container);
+                        };
+                        container.appendChild(more);
+                    }
                 });
         }
 